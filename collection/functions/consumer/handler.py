@@ -5,6 +5,7 @@ from functions.utils.logger import logger as log
 from functions.consumer import position
 from functions.consumer import candle_stick
 from functions.utils.common import Env
+from functions.utils import s3_metrics
 
 
 def data_collection_handler(event, context):
@@ -72,7 +73,14 @@ def data_collection_handler(event, context):
         }
 
     try:
-        data_collection_func(provider, product_id, data_to_collect, correlation_id)
+        with s3_metrics.invocation(
+            "data_collection",
+            correlation_id=correlation_id,
+            provider=provider,
+            product_id=product_id,
+            data_collection_type=data_collection_type,
+        ):
+            data_collection_func(provider, product_id, data_to_collect, correlation_id)
     except Exception as e:
         logger.info("DATA_COLLECTION_ERROR", message=str(e))
         return {
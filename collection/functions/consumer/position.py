@@ -1,16 +1,15 @@
-import boto3
-import boto3.session
 import json
 
 import datetime
 from functions.utils.logger import logger as log
 from functions.utils.common import Env
+from functions.utils.aws import get_client
 
 
 def read_object(key):
     """Reads an object from S3"""
 
-    s3_client = boto3.client("s3")
+    s3_client = get_client("s3")
     obj = s3_client.get_object(Bucket=Env.DATA_COLLECTION_BUCKET_NAME, Key=key)
     return obj["Body"].read().decode("utf-8")
 
@@ -56,7 +55,7 @@ def collect_data(provider, product_id, orders, correlation_id):
 
     dataset_directory = get_data_dir()
 
-    s3_client = boto3.client("s3")
+    s3_client = get_client("s3")
     s3_base_key = f"{provider}/{product_id}/{dataset_directory}"
 
     response = s3_client.list_objects_v2(
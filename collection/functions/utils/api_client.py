@@ -1,5 +1,4 @@
 import json
-import requests
 
 from http import HTTPStatus
 from requests.exceptions import RequestException
@@ -11,6 +10,8 @@ from functions.utils.exceptions import (
     SendAssistantMessageException,
 )
 from functions.utils.oauth import generate_oauth_token
+from functions.utils.http_session import get_session, default_timeout
+from functions.utils.sqs import send_message_to_queue
 
 AUTH0_OAUTH_URL = Env.AUTH0_OAUTH_URL
 AUTH0_OAUTH_HEADERS = {"content-type": "application/json"}
@@ -50,11 +51,11 @@ class AssistantClient:
         }
 
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 f"{self.domain}{endpoint}",
                 headers=self.headers,
                 json=payload,
-                timeout=5,
+                timeout=default_timeout(),
             )
         except RequestException as e:
             raise AssistantSendMessageException(str(e))
@@ -62,11 +63,11 @@ class AssistantClient:
         return resp.json()
 
 
-def notify_assistant(correlation_id, message):
+def send_notification(correlation_id, message, channel="general"):
     assistant_client = AssistantClient(correlation_id=correlation_id)
 
     try:
-        assistant_client.send_message(message=message, channel="general")
+        assistant_client.send_message(message=message, channel=channel)
     except SendAssistantMessageException as e:
         logger.error(
             "SEND_ASSISTANT_MESSAGE_EXCEPTION",
@@ -74,3 +75,19 @@ def notify_assistant(correlation_id, message):
             error=str(e),
         )
         raise e
+
+
+def enqueue_notification(correlation_id, message, channel="general"):
+    """Queues a message for the notification consumer, which posts it as part of a digest."""
+    send_message_to_queue(
+        Env.NOTIFICATION_QUEUE_URL,
+        {"correlation_id": correlation_id, "message": message, "channel": channel},
+    )
+
+
+def notify_assistant(correlation_id, message, channel="general"):
+    # Posting inline is kept for deployments without a notification queue
+    if Env.NOTIFICATION_QUEUE_URL:
+        enqueue_notification(correlation_id, message, channel=channel)
+    else:
+        send_notification(correlation_id, message, channel=channel)
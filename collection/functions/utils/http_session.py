@@ -0,0 +1,68 @@
+import random
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from functions.utils.common import Env
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class JitterRetry(Retry):
+    """
+    Retry policy that applies full jitter to the exponential backoff. Non-idempotent
+    methods are also retried on 429, and on 503 with Retry-After: the server refused
+    those requests without acting on them, so resending cannot deliver them twice.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if super().is_retry(method, status_code, has_retry_after):
+            return True
+        return status_code == 429 or (status_code == 503 and has_retry_after)
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+
+def default_timeout():
+    """Returns the (connect, read) timeout used for outgoing requests."""
+    return (Env.HTTP_CONNECT_TIMEOUT, Env.HTTP_READ_TIMEOUT)
+
+
+def build_session(pool_size=None, max_retries=None, backoff_factor=None):
+    """
+    Builds a keep-alive session with a bounded connection pool.
+    :param pool_size: Connections kept open per host.
+    :param max_retries: Retries for connection errors, and for read errors and 429/5xx
+        responses to idempotent methods. A POST is retried when it never reached the server
+        or was refused (see JitterRetry), not after a read timeout or another 5xx, as the
+        server may have acted on it.
+    :param backoff_factor: Base of the exponential backoff between retries, in seconds.
+    """
+    pool_size = pool_size or Env.HTTP_POOL_SIZE
+    retry = JitterRetry(
+        total=Env.HTTP_MAX_RETRIES if max_retries is None else max_retries,
+        backoff_factor=Env.HTTP_BACKOFF_FACTOR if backoff_factor is None else backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Returns the session shared by every client in this container."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
@@ -0,0 +1,161 @@
+import time
+import threading
+
+from contextlib import contextmanager
+from botocore.utils import determine_content_length
+from functions.utils.common import Env
+from functions.utils.logger import logger
+
+CONTEXT_START_KEY = "s3_metrics_start"
+CONTEXT_BYTES_KEY = "s3_metrics_bytes_sent"
+MAX_LATENCY_SAMPLES = 100  # CloudWatch EMF accepts at most 100 values per metric
+
+
+class OperationStats:
+    __slots__ = ("calls", "errors", "retries", "bytes_sent", "bytes_received", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latencies = []
+
+
+class S3Metrics:
+    """Collects S3 call counts, latency, retries and payload bytes per operation."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, latency_ms, retries=0, bytes_sent=0, bytes_received=0, error=False):
+        with self._lock:
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = OperationStats()
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.retries += retries
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            if len(stats.latencies) < MAX_LATENCY_SAMPLES:
+                stats.latencies.append(round(latency_ms, 3))
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def summary(self, service, **properties):
+        """Returns one CloudWatch Embedded Metric Format document per S3 operation."""
+        with self._lock:
+            stats = dict(self._stats)
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for operation, op in sorted(stats.items()):
+            documents.append(
+                {
+                    "_aws": {
+                        "Timestamp": timestamp,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": Env.S3_METRICS_NAMESPACE,
+                                "Dimensions": [["Service", "Operation"]],
+                                "Metrics": [
+                                    {"Name": "Calls", "Unit": "Count"},
+                                    {"Name": "Errors", "Unit": "Count"},
+                                    {"Name": "Retries", "Unit": "Count"},
+                                    {"Name": "BytesSent", "Unit": "Bytes"},
+                                    {"Name": "BytesReceived", "Unit": "Bytes"},
+                                    {"Name": "Latency", "Unit": "Milliseconds"},
+                                ],
+                            }
+                        ],
+                    },
+                    "Service": service,
+                    "Operation": operation,
+                    "Calls": op.calls,
+                    "Errors": op.errors,
+                    "Retries": op.retries,
+                    "BytesSent": op.bytes_sent,
+                    "BytesReceived": op.bytes_received,
+                    "Latency": op.latencies,
+                    **properties,
+                }
+            )
+        return documents
+
+
+metrics = S3Metrics()
+
+
+def _content_length(headers):
+    try:
+        return int(headers.get("Content-Length") or headers.get("content-length") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _before_call(params, context, **kwargs):
+    context[CONTEXT_START_KEY] = time.perf_counter()
+    body = params.get("body")
+    size = determine_content_length(body) if body is not None else None
+    context[CONTEXT_BYTES_KEY] = size if size is not None else _content_length(params.get("headers") or {})
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    start = context.pop(CONTEXT_START_KEY, None)
+    if start is None:
+        return
+    metrics.record(
+        model.name,
+        (time.perf_counter() - start) * 1000,
+        retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+        bytes_sent=context.pop(CONTEXT_BYTES_KEY, 0),
+        bytes_received=_content_length(http_response.headers),
+        # 304 answers a conditional GET and 3xx redirects are retried by botocore, neither is a failure
+        error=http_response.status_code >= 400,
+    )
+
+
+def _after_call_error(exception, context, event_name, **kwargs):
+    start = context.pop(CONTEXT_START_KEY, None)
+    if start is None:
+        return
+    metrics.record(
+        event_name.rsplit(".", 1)[-1],
+        (time.perf_counter() - start) * 1000,
+        bytes_sent=context.pop(CONTEXT_BYTES_KEY, 0),
+        error=True,
+    )
+
+
+def register(client):
+    """Attaches the metric hooks to an S3 client when S3_METRICS_ENABLED is set."""
+    if not Env.S3_METRICS_ENABLED:
+        return client
+    events = client.meta.events
+    events.register("before-call.s3", _before_call, unique_id="s3-metrics-before-call")
+    events.register("after-call.s3", _after_call, unique_id="s3-metrics-after-call")
+    events.register("after-call-error.s3", _after_call_error, unique_id="s3-metrics-after-call-error")
+    return client
+
+
+@contextmanager
+def invocation(service, **properties):
+    """
+    Scopes collected metrics to one handler invocation and logs the summary as EMF on exit.
+    :param service: Value of the Service dimension.
+    :param properties: Extra fields logged with every metric line, e.g. correlation_id.
+    """
+    if not Env.S3_METRICS_ENABLED:
+        yield metrics
+        return
+    metrics.reset()
+    try:
+        yield metrics
+    finally:
+        for document in metrics.summary(service, **properties):
+            logger.info("S3_METRICS", **document)
+        metrics.reset()
@@ -1,14 +1,14 @@
-import boto3
 import json
 
 from ulid import ulid
 from functions.utils.common import DecimalEncoder
+from functions.utils.aws import get_client
 
 
 def send_message_to_queue(
     queue_url: str, message_body: dict, msg_group_id=str(ulid()), msg_attrs={}
 ):
-    sqs = boto3.client("sqs", "us-east-2")
+    sqs = get_client("sqs")
 
     options = {
         "QueueUrl": queue_url,
@@ -15,7 +15,7 @@ def test_read_object(monkeypatch):
     class DummyBody:
         def read(self):
             return b"test-content"
-    monkeypatch.setattr("functions.consumer.position.boto3", type("Boto3", (), {"client": lambda *a, **k: DummyS3()})())
+    monkeypatch.setattr("functions.consumer.position.get_client", lambda *a, **k: DummyS3())
     from functions.consumer.position import read_object
     assert read_object("some/key") == b"test-content"
 
@@ -0,0 +1,62 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from urllib3.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+import functions.utils.http_session as http_session
+
+
+def test_build_session_configures_pool_and_retries():
+    session = http_session.build_session(pool_size=4, max_retries=2, backoff_factor=0.1)
+    adapter = session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+def test_jitter_retry_stays_within_backoff():
+    retry = http_session.JitterRetry(total=5, backoff_factor=1)
+    for _ in range(3):
+        retry = retry.increment(method="GET", url="/")
+    for _ in range(20):
+        assert 0 <= retry.get_backoff_time() <= 4
+
+
+def test_get_session_is_shared():
+    assert http_session.get_session() is http_session.get_session()
+
+
+def test_post_is_only_retried_before_it_reaches_the_server():
+    retry = http_session.build_session(max_retries=2).get_adapter("https://example.com").max_retries
+    assert retry.increment(method="POST", url="/", error=ConnectTimeoutError()).total == 1
+    assert retry.increment(method="GET", url="/", error=ReadTimeoutError(None, "/", "timed out")).total == 1
+    with pytest.raises(ReadTimeoutError):
+        retry.increment(method="POST", url="/", error=ReadTimeoutError(None, "/", "timed out"))
+
+
+def test_post_is_retried_after_a_429():
+    statuses = [429, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = http_session.build_session(max_retries=2, backoff_factor=0)
+        response = session.post(f"http://127.0.0.1:{server.server_port}/notifications", json={"message": "hello"})
+        assert response.status_code == 200 and statuses == []
+    finally:
+        server.shutdown()
+    retry = session.get_adapter("http://").max_retries
+    assert retry.is_retry("POST", 503, has_retry_after=True)
+    assert not retry.is_retry("POST", 500)
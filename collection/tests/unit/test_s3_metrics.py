@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import patch
+
+from functions.utils import aws, s3_metrics
+from functions.utils.common import Env
+
+BUCKET = Env.DATA_COLLECTION_BUCKET_NAME
+
+
+@pytest.fixture
+def instrumented_s3(monkeypatch, mock_aws_s3):
+    monkeypatch.setattr(Env, "S3_METRICS_ENABLED", True)
+    aws.reset_clients()
+    s3_metrics.metrics.reset()
+    yield aws.get_client("s3")
+    aws.reset_clients()
+    s3_metrics.metrics.reset()
+
+
+def _by_operation(documents):
+    return {d["Operation"]: d for d in documents}
+
+
+def test_hooks_record_calls_and_bytes(instrumented_s3):
+    instrumented_s3.put_object(Bucket=BUCKET, Key="a.csv", Body=b"x" * 1024)
+    instrumented_s3.get_object(Bucket=BUCKET, Key="a.csv")["Body"].read()
+    instrumented_s3.list_objects_v2(Bucket=BUCKET, Prefix="a")
+    stats = _by_operation(s3_metrics.metrics.summary("test"))
+    assert stats["PutObject"]["Calls"] == 1
+    assert stats["PutObject"]["BytesSent"] == 1024
+    assert stats["GetObject"]["BytesReceived"] == 1024
+    assert stats["ListObjectsV2"]["Calls"] == 1
+    assert len(stats["GetObject"]["Latency"]) == 1
+
+
+def test_hooks_record_errors(instrumented_s3):
+    with pytest.raises(Exception):
+        instrumented_s3.get_object(Bucket=BUCKET, Key="missing.csv")
+    stats = _by_operation(s3_metrics.metrics.summary("test"))
+    assert stats["GetObject"]["Errors"] == 1
+
+
+def test_not_modified_is_not_an_error(instrumented_s3):
+    etag = instrumented_s3.put_object(Bucket=BUCKET, Key="a.csv", Body=b"abc")["ETag"]
+    with pytest.raises(Exception):
+        instrumented_s3.get_object(Bucket=BUCKET, Key="a.csv", IfNoneMatch=etag)
+    stats = _by_operation(s3_metrics.metrics.summary("test"))
+    assert stats["GetObject"]["Calls"] == 1
+    assert stats["GetObject"]["Errors"] == 0
+
+
+def test_summary_is_embedded_metric_format(instrumented_s3):
+    instrumented_s3.put_object(Bucket=BUCKET, Key="a.csv", Body=b"abc")
+    document = s3_metrics.metrics.summary("test", correlation_id="cid")[0]
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Service", "Operation"]]
+    assert {m["Name"] for m in directive["Metrics"]} <= set(document)
+    assert document["Service"] == "test"
+    assert document["correlation_id"] == "cid"
+
+
+def test_invocation_logs_summary_and_resets(instrumented_s3):
+    with patch("functions.utils.s3_metrics.logger") as mock_logger:
+        with s3_metrics.invocation("test", correlation_id="cid"):
+            instrumented_s3.put_object(Bucket=BUCKET, Key="a.csv", Body=b"abc")
+    mock_logger.info.assert_called_once()
+    assert mock_logger.info.call_args.args == ("S3_METRICS",)
+    assert s3_metrics.metrics.summary("test") == []
+
+
+def test_disabled_by_default(monkeypatch, mock_aws_s3):
+    monkeypatch.setattr(Env, "S3_METRICS_ENABLED", False)
+    aws.reset_clients()
+    s3_metrics.metrics.reset()
+    aws.get_client("s3").put_object(Bucket=BUCKET, Key="a.csv", Body=b"abc")
+    with patch("functions.utils.s3_metrics.logger") as mock_logger:
+        with s3_metrics.invocation("test"):
+            pass
+    mock_logger.info.assert_not_called()
+    assert s3_metrics.metrics.summary("test") == []
+    aws.reset_clients()
@@ -0,0 +1,82 @@
+import json
+
+from collections import OrderedDict
+
+from utils.logger import logger
+from utils.common import Env
+from utils.api_client import AssistantClient
+
+DIGEST_SEPARATOR = "\n\n"
+
+
+def group_by_channel(records):
+    """Groups queued notifications by channel, keeping the order they arrived in."""
+    channels = OrderedDict()
+    for record in records:
+        body = json.loads(record.get("body") or "{}")
+        channel = body.get("channel") or "general"
+        channels.setdefault(channel, []).append(
+            {
+                "message_id": record.get("messageId"),
+                "correlation_id": body.get("correlation_id"),
+                "message": body.get("message") or "",
+            }
+        )
+    return channels
+
+
+def build_digests(notifications, max_chars=None):
+    """
+    Packs notifications into as few digests as possible without exceeding max_chars.
+    A single message longer than max_chars is sent on its own rather than split.
+    """
+    max_chars = max_chars or Env.NOTIFICATION_DIGEST_MAX_CHARS
+    digests = []
+    current, size = [], 0
+    for notification in notifications:
+        length = len(notification["message"])
+        if current and size + len(DIGEST_SEPARATOR) + length > max_chars:
+            digests.append(current)
+            current, size = [], 0
+        size += length + (len(DIGEST_SEPARATOR) if current else 0)
+        current.append(notification)
+    if current:
+        digests.append(current)
+    return digests
+
+
+def notification_handler(event, context):
+    """
+    Posts the notifications collected in the SQS batching window as one digest per channel.
+    Records from digests that could not be delivered are reported back to SQS for a retry.
+    """
+    records = event.get("Records", [])
+    failed_ids = []
+
+    for channel, notifications in group_by_channel(records).items():
+        for digest in build_digests(notifications):
+            correlation_id = digest[0]["correlation_id"]
+            try:
+                client = AssistantClient(correlation_id=correlation_id)
+                client.send_message(
+                    message=DIGEST_SEPARATOR.join(n["message"] for n in digest),
+                    channel=channel,
+                )
+            except Exception as e:
+                logger.error(
+                    "SEND_NOTIFICATION_DIGEST_EXCEPTION",
+                    message="Could not send notification digest to assistant",
+                    channel=channel,
+                    correlation_ids=[n["correlation_id"] for n in digest],
+                    error=str(e),
+                )
+                failed_ids.extend(n["message_id"] for n in digest)
+                continue
+            logger.info(
+                "NOTIFICATION_DIGEST_SENT",
+                channel=channel,
+                size=len(digest),
+                correlation_ids=[n["correlation_id"] for n in digest],
+            )
+
+    return {"batchItemFailures": [{"itemIdentifier": i} for i in failed_ids]}
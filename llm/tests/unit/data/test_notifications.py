@@ -0,0 +1,92 @@
+import json
+import pytest
+from unittest.mock import patch
+
+from utils import api_client
+from utils.common import Env
+from consumer.notifications import (
+    build_digests,
+    group_by_channel,
+    notification_handler,
+)
+
+
+def _record(message_id, message, channel="general", correlation_id="cid"):
+    return {
+        "messageId": message_id,
+        "body": json.dumps(
+            {"correlation_id": correlation_id, "message": message, "channel": channel}
+        ),
+    }
+
+
+@pytest.mark.unit_tests
+def test_notify_assistant_enqueues_when_queue_configured(monkeypatch, mock_aws_sqs):
+    queue_url = mock_aws_sqs.get_queue_url(QueueName="train-queue")["QueueUrl"]
+    monkeypatch.setattr(Env, "NOTIFICATION_QUEUE_URL", queue_url)
+    with patch("utils.api_client.AssistantClient") as mock_client:
+        api_client.notify_assistant(correlation_id="cid", message="BTC is up")
+    mock_client.assert_not_called()
+    messages = mock_aws_sqs.receive_message(QueueUrl=queue_url)["Messages"]
+    assert json.loads(messages[0]["Body"]) == {
+        "correlation_id": "cid",
+        "message": "BTC is up",
+        "channel": "general",
+    }
+
+
+@pytest.mark.unit_tests
+def test_notify_assistant_posts_inline_without_queue(monkeypatch):
+    monkeypatch.setattr(Env, "NOTIFICATION_QUEUE_URL", None)
+    with patch("utils.api_client.AssistantClient") as mock_client:
+        api_client.notify_assistant(correlation_id="cid", message="BTC is up")
+    mock_client.return_value.send_message.assert_called_once_with(
+        message="BTC is up", channel="general"
+    )
+
+
+@pytest.mark.unit_tests
+def test_group_by_channel():
+    records = [_record("1", "a"), _record("2", "b", channel="alerts"), _record("3", "c")]
+    channels = group_by_channel(records)
+    assert list(channels) == ["general", "alerts"]
+    assert [n["message_id"] for n in channels["general"]] == ["1", "3"]
+
+
+@pytest.mark.unit_tests
+def test_build_digests_respects_max_chars():
+    notifications = [{"message": "x" * 10} for _ in range(5)]
+    digests = build_digests(notifications, max_chars=25)
+    assert [len(d) for d in digests] == [2, 2, 1]
+
+
+@pytest.mark.unit_tests
+def test_build_digests_keeps_oversized_message_whole():
+    notifications = [{"message": "x" * 50}, {"message": "y"}]
+    digests = build_digests(notifications, max_chars=25)
+    assert [len(d) for d in digests] == [1, 1]
+
+
+@pytest.mark.unit_tests
+@patch("consumer.notifications.AssistantClient")
+def test_notification_handler_coalesces_per_channel(mock_client):
+    event = {"Records": [_record("1", "a"), _record("2", "b"), _record("3", "c", channel="alerts")]}
+    response = notification_handler(event, {})
+    assert response == {"batchItemFailures": []}
+    sent = mock_client.return_value.send_message.call_args_list
+    assert len(sent) == 2
+    assert sent[0].kwargs == {"message": "a\n\nb", "channel": "general"}
+    assert sent[1].kwargs == {"message": "c", "channel": "alerts"}
+
+
+@pytest.mark.unit_tests
+@patch("consumer.notifications.AssistantClient")
+def test_notification_handler_reports_failed_digests(mock_client):
+    def send_message(message, channel):
+        if channel == "alerts":
+            raise Exception("boom")
+
+    mock_client.return_value.send_message.side_effect = send_message
+    event = {"Records": [_record("1", "a"), _record("2", "b", channel="alerts")]}
+    response = notification_handler(event, {})
+    assert response == {"batchItemFailures": [{"itemIdentifier": "2"}]}
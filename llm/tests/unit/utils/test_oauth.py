@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+import utils.oauth as oauth
+
+
+@pytest.fixture(autouse=True)
+def token_cache():
+    oauth.token_cache.clear()
+    yield oauth.token_cache
+    oauth.token_cache.clear()
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = MagicMock()
+    table.get_item.return_value = {}
+    monkeypatch.setattr(oauth, "get_cache_table", lambda: table)
+    return table
+
+
+@pytest.fixture
+def token_request(monkeypatch):
+    request = MagicMock(return_value=("fresh-token", 3600))
+    monkeypatch.setattr(oauth, "request_oauth_token", request)
+    return request
+
+
+@pytest.mark.unit_tests
+def test_generate_oauth_token_served_from_memory(table, token_request):
+    assert oauth.generate_oauth_token("id", "secret", "aud") == "fresh-token"
+    assert oauth.generate_oauth_token("id", "secret", "aud") == "fresh-token"
+    token_request.assert_called_once()
+    table.put_item.assert_called_once()
+
+
+@pytest.mark.unit_tests
+def test_generate_oauth_token_uses_dynamodb_tier(table, token_request):
+    expiration = datetime.utcnow() + timedelta(hours=1)
+    table.get_item.return_value = {"Item": {"token": "shared-token", "expiration": expiration.isoformat()}}
+    assert oauth.generate_oauth_token("id", "secret", "aud") == "shared-token"
+    token_request.assert_not_called()
+
+
+@pytest.mark.unit_tests
+def test_request_oauth_token_caps_ttl(requests_mock, monkeypatch):
+    monkeypatch.setattr(oauth.Env, "AUTH0_OAUTH_URL", "https://auth.example.com/oauth/token")
+    requests_mock.post(
+        "https://auth.example.com/oauth/token",
+        json={"access_token": "abc", "expires_in": oauth.CACHE_TTL * 2},
+    )
+    assert oauth.request_oauth_token("id", "secret", "aud", "client_credentials") == ("abc", oauth.CACHE_TTL)
+
+
+@pytest.mark.unit_tests
+def test_short_lived_token_is_reused(table, token_request):
+    # a token that lives less than the refresh margin is still served until halfway
+    token_request.return_value = ("short-token", 120)
+    assert oauth.generate_oauth_token("id", "secret", "aud") == "short-token"
+    assert oauth.generate_oauth_token("id", "secret", "aud") == "short-token"
+    token_request.assert_called_once()
+    assert table.put_item.call_args.kwargs["Item"]["ttl"] == 120
+    assert oauth.token_cache.margin(120) == 60
+    assert oauth.token_cache.margin(3600) == oauth.REFRESH_MARGIN
@@ -23,6 +23,21 @@ class Env:
     NODE_GROUP_MAX_SIZE = int(os.environ.get("NODE_GROUP_MAX_SIZE") or 2)
     NODE_GROUP_DESIRED_SIZE = int(os.environ.get("NODE_GROUP_DESIRED_SIZE") or 1)
 
+    # AWS CLIENTS
+    AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS") or 25)
+    AWS_MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS") or 5)
+
+    # HTTP CLIENT
+    HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE") or 10)
+    HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES") or 3)
+    HTTP_BACKOFF_FACTOR = float(os.environ.get("HTTP_BACKOFF_FACTOR") or 0.5)
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT") or 3.05)
+    HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT") or 5)
+
+    # NOTIFICATIONS
+    NOTIFICATION_QUEUE_URL = os.environ.get("NOTIFICATION_QUEUE_URL")
+    NOTIFICATION_DIGEST_MAX_CHARS = int(os.environ.get("NOTIFICATION_DIGEST_MAX_CHARS") or 4000)
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
@@ -38,13 +53,10 @@ def multipart_upload(data_stream, bucket_name, most_recent_obj_key):
     :param bucket_name: The name of the S3 bucket.
     :param most_recent_obj_key: The key for the object in S3.
     """
-    # Example of multipart upload
     from boto3.s3.transfer import TransferConfig
+    from utils.aws import get_client
 
-    import boto3
-    
-    # Create a boto3 S3 client
-    s3_client = boto3.client("s3")
+    s3_client = get_client("s3")
     config = TransferConfig(multipart_threshold=5 * 1024 * 1024)  # 5 MB threshold
     s3_client.upload_fileobj(
         Fileobj=data_stream,
@@ -1,14 +1,11 @@
 import json
-import boto3
 import os
 from utils.logger import logger as log
 from utils.common import Env
+from utils.aws import get_client
 from datetime import datetime, date
 
 
-ECS_CLIENT = boto3.client("ecs", region_name=os.getenv("REGION"))
-
-
 TASK_DEFINITIONS = {
     "data_processing": "ecs-task-def-data-processing.json.template",
 }
@@ -37,7 +34,7 @@ def run_task(cluster, task_type, task_def_arn, overrides=None):
     """Run a task of the given type."""
     log.info("RUN_TASK", cluster=cluster, task_type=task_type, task_def_arn=task_def_arn)
     try:
-        run_response = ECS_CLIENT.run_task(
+        run_response = get_client("ecs").run_task(
             cluster=cluster,
             taskDefinition=task_def_arn,
             overrides=overrides or {},
@@ -58,6 +55,34 @@ def run_task(cluster, task_type, task_def_arn, overrides=None):
         }
 
 
+def json_value(value):
+    """A PREDICTION_MANIFEST or SEARCH_SPACE given as JSON in the message is passed on as JSON text."""
+    if not value:
+        return ""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def optional_value(value):
+    """Passes 0 on as "0", only a missing value becomes "" and falls back to the task default."""
+    return "" if value is None else str(value)
+
+
+def list_value(values):
+    """A list given in the message (e.g. INCREMENTAL_CLASSES) is passed on comma separated."""
+    if values is None:
+        return ""
+    return ",".join(str(v) for v in values) if isinstance(values, (list, tuple)) else str(values)
+
+
+def dataset_cache_env_vars(**kwargs):
+    """DATASET_CACHE_* settings, read by tasks.dataset_cache in both training and prediction."""
+    return [
+        {"name": "DATASET_CACHE_DIR", "value": kwargs.get("dataset_cache_dir") or ""},
+        {"name": "DATASET_CACHE_MAX_BYTES", "value": str(kwargs.get("dataset_cache_max_bytes") or "")},
+        {"name": "DATASET_CACHE_S3_SIDECAR", "value": "true" if str(kwargs.get("dataset_cache_s3_sidecar")).lower() == "true" else "false"},
+    ]
+
+
 def build_env_vars(module, s3_bucket, **kwargs):
     """Builds the environment variables for the ECS task."""
     if module == "feature_engineering.py":
@@ -65,18 +90,57 @@ def build_env_vars(module, s3_bucket, **kwargs):
             {"name": "S3_BUCKET", "value": s3_bucket},
             {"name": "S3_CSV_KEY", "value": kwargs.get("s3_csv_key")},
             {"name": "S3_LIBSVM_KEY", "value": kwargs.get("s3_libsvm_key")},
-            {"name": "DATA_TYPE", "value": kwargs.get("data_type")}
+            {"name": "DATA_TYPE", "value": kwargs.get("data_type")},
+            {"name": "FEATURE_ENGINEERING_MODE", "value": kwargs.get("feature_engineering_mode") or "buffered"},
+            {"name": "CONVERSION_ENGINE", "value": kwargs.get("conversion_engine") or "vectorized"},
+            {"name": "OUTPUT_LAYOUT", "value": kwargs.get("output_layout") or "concatenated"},
+            {"name": "TECHNICAL_FEATURES", "value": kwargs.get("technical_features") or ""},
+            {"name": "LABEL_HORIZONS", "value": kwargs.get("label_horizons") or ""},
+            {"name": "LABEL_TARGET_HORIZON", "value": optional_value(kwargs.get("label_target_horizon"))},
+            {"name": "LABEL_FLAT_THRESHOLD", "value": optional_value(kwargs.get("label_flat_threshold"))},
+            {"name": "BINARY_OUTPUT", "value": "true" if str(kwargs.get("binary_output")).lower() == "true" else "false"},
+            {"name": "INCREMENTAL", "value": "true" if str(kwargs.get("incremental")).lower() == "true" else "false"},
         ]
     elif module == "train_scikit.py":
         return [
             {"name": "S3_BUCKET", "value": s3_bucket},
             {"name": "S3_KEY", "value": kwargs.get("s3_key")},
-        ]
+            {"name": "TRAINING_MODE", "value": kwargs.get("training_mode") or "full"},
+            {"name": "ESTIMATOR", "value": kwargs.get("estimator") or "random_forest"},
+            {"name": "SEARCH_STRATEGY", "value": kwargs.get("search_strategy") or "random"},
+            {"name": "SEARCH_CANDIDATES", "value": str(kwargs.get("search_candidates") or "")},
+            {"name": "SEARCH_FACTOR", "value": str(kwargs.get("search_factor") or "")},
+            {"name": "SEARCH_SPACE", "value": json_value(kwargs.get("search_space"))},
+            {"name": "WALK_FORWARD_SPLITS", "value": str(kwargs.get("walk_forward_splits") or "")},
+            {"name": "WALK_FORWARD_WINDOW", "value": kwargs.get("walk_forward_window") or "expanding"},
+            {"name": "WALK_FORWARD_GAP", "value": optional_value(kwargs.get("walk_forward_gap"))},
+            {"name": "WALK_FORWARD_MAX_TRAIN_SIZE", "value": str(kwargs.get("walk_forward_max_train_size") or "")},
+            {"name": "INCREMENTAL_ESTIMATOR", "value": kwargs.get("incremental_estimator") or "sgd"},
+            {"name": "INCREMENTAL_CHUNK_ROWS", "value": str(kwargs.get("incremental_chunk_rows") or "")},
+            {"name": "INCREMENTAL_CLASSES", "value": list_value(kwargs.get("incremental_classes"))},
+            {"name": "INCREMENTAL_N_FEATURES", "value": str(kwargs.get("incremental_n_features") or "")},
+            {"name": "INCREMENTAL_EPOCHS", "value": str(kwargs.get("incremental_epochs") or "")},
+            {"name": "INCREMENTAL_TREES_PER_CHUNK", "value": str(kwargs.get("incremental_trees_per_chunk") or "")},
+            {"name": "MODEL_ARTIFACT_FORMAT", "value": kwargs.get("model_artifact_format") or ""},
+            {"name": "EXPORT_FLAT_MODEL", "value": "true" if str(kwargs.get("export_flat_model")).lower() == "true" else "false"},
+        ] + dataset_cache_env_vars(**kwargs)
     elif module == "predict_scikit.py":
         return [
             {"name": "S3_BUCKET", "value": s3_bucket},
             {"name": "S3_KEY", "value": kwargs.get("s3_key")},
-        ]
+            {"name": "MODEL_S3_KEY", "value": kwargs.get("model_s3_key") or ""},
+            {"name": "MODEL_CACHE_DIR", "value": kwargs.get("model_cache_dir") or ""},
+            {"name": "FLAT_MODEL_S3_PREFIX", "value": kwargs.get("flat_model_s3_prefix") or ""},
+            {"name": "DATA_TYPE", "value": kwargs.get("data_type") or ""},
+            {"name": "PREDICTION_MODE", "value": kwargs.get("prediction_mode") or "file"},
+            {"name": "INPUT_DATA_S3_KEY", "value": kwargs.get("input_data_s3_key") or ""},
+            {"name": "OUTPUT_S3_KEY", "value": kwargs.get("output_s3_key") or ""},
+            {"name": "PREDICTION_OUTPUT_FORMAT", "value": kwargs.get("prediction_output_format") or "npy"},
+            {"name": "PREDICTION_CHUNK_ROWS", "value": str(kwargs.get("prediction_chunk_rows") or "")},
+            {"name": "PREDICT_KEY_COLUMN", "value": optional_value(kwargs.get("predict_key_column"))},
+            {"name": "PREDICTION_MANIFEST", "value": json_value(kwargs.get("prediction_manifest"))},
+            {"name": "PREDICTION_MANIFEST_S3_KEY", "value": kwargs.get("prediction_manifest_s3_key") or ""},
+        ] + dataset_cache_env_vars(**kwargs)
 
 
 def stop_task(cluster, task_arn, correlation_id=None):
@@ -89,9 +153,8 @@ def stop_task(cluster, task_arn, correlation_id=None):
         task_arn=task_arn,
         correlation_id=correlation_id,
     )
-    ecs_client = boto3.client("ecs", region_name=Env.REGION)
     try:
-        response = ecs_client.stop_task(
+        response = get_client("ecs").stop_task(
             cluster=cluster,
             task=task_arn,
             reason="Stopped by orchestrator"
@@ -136,6 +199,47 @@ def sqs_record_handler(event, context):
         s3_csv_key = body.get("S3_CSV_KEY")
         s3_libsvm_key = body.get("S3_LIBSVM_KEY")
         data_type = body.get("DATA_TYPE")
+        feature_engineering_mode = body.get("FEATURE_ENGINEERING_MODE")
+        conversion_engine = body.get("CONVERSION_ENGINE")
+        output_layout = body.get("OUTPUT_LAYOUT")
+        incremental = body.get("INCREMENTAL")
+        technical_features = body.get("TECHNICAL_FEATURES")
+        label_horizons = body.get("LABEL_HORIZONS")
+        label_target_horizon = body.get("LABEL_TARGET_HORIZON")
+        label_flat_threshold = body.get("LABEL_FLAT_THRESHOLD")
+        binary_output = body.get("BINARY_OUTPUT")
+        training_mode = body.get("TRAINING_MODE")
+        estimator = body.get("ESTIMATOR")
+        search_strategy = body.get("SEARCH_STRATEGY")
+        search_candidates = body.get("SEARCH_CANDIDATES")
+        search_factor = body.get("SEARCH_FACTOR")
+        search_space = body.get("SEARCH_SPACE")
+        walk_forward_splits = body.get("WALK_FORWARD_SPLITS")
+        walk_forward_window = body.get("WALK_FORWARD_WINDOW")
+        walk_forward_gap = body.get("WALK_FORWARD_GAP")
+        walk_forward_max_train_size = body.get("WALK_FORWARD_MAX_TRAIN_SIZE")
+        incremental_estimator = body.get("INCREMENTAL_ESTIMATOR")
+        incremental_chunk_rows = body.get("INCREMENTAL_CHUNK_ROWS")
+        incremental_classes = body.get("INCREMENTAL_CLASSES")
+        incremental_n_features = body.get("INCREMENTAL_N_FEATURES")
+        incremental_epochs = body.get("INCREMENTAL_EPOCHS")
+        incremental_trees_per_chunk = body.get("INCREMENTAL_TREES_PER_CHUNK")
+        model_artifact_format = body.get("MODEL_ARTIFACT_FORMAT")
+        model_s3_key = body.get("MODEL_S3_KEY")
+        model_cache_dir = body.get("MODEL_CACHE_DIR")
+        export_flat_model = body.get("EXPORT_FLAT_MODEL")
+        flat_model_s3_prefix = body.get("FLAT_MODEL_S3_PREFIX")
+        prediction_mode = body.get("PREDICTION_MODE")
+        input_data_s3_key = body.get("INPUT_DATA_S3_KEY")
+        output_s3_key = body.get("OUTPUT_S3_KEY")
+        prediction_output_format = body.get("PREDICTION_OUTPUT_FORMAT")
+        prediction_chunk_rows = body.get("PREDICTION_CHUNK_ROWS")
+        predict_key_column = body.get("PREDICT_KEY_COLUMN")
+        prediction_manifest = body.get("PREDICTION_MANIFEST")
+        prediction_manifest_s3_key = body.get("PREDICTION_MANIFEST_S3_KEY")
+        dataset_cache_dir = body.get("DATASET_CACHE_DIR")
+        dataset_cache_max_bytes = body.get("DATASET_CACHE_MAX_BYTES")
+        dataset_cache_s3_sidecar = body.get("DATASET_CACHE_S3_SIDECAR")
         # CPU = body.get("CPU") or os.environ.get("CPU", "256")
         # MEMORY = body.get("MEMORY") or os.environ.get("MEMORY", "512")
 
@@ -145,6 +249,47 @@ def sqs_record_handler(event, context):
             s3_csv_key=s3_csv_key, 
             s3_libsvm_key=s3_libsvm_key, 
             data_type=data_type, 
+            feature_engineering_mode=feature_engineering_mode,
+            conversion_engine=conversion_engine,
+            output_layout=output_layout,
+            incremental=incremental,
+            technical_features=technical_features,
+            label_horizons=label_horizons,
+            label_target_horizon=label_target_horizon,
+            label_flat_threshold=label_flat_threshold,
+            binary_output=binary_output,
+            training_mode=training_mode,
+            estimator=estimator,
+            search_strategy=search_strategy,
+            search_candidates=search_candidates,
+            search_factor=search_factor,
+            search_space=search_space,
+            walk_forward_splits=walk_forward_splits,
+            walk_forward_window=walk_forward_window,
+            walk_forward_gap=walk_forward_gap,
+            walk_forward_max_train_size=walk_forward_max_train_size,
+            incremental_estimator=incremental_estimator,
+            incremental_chunk_rows=incremental_chunk_rows,
+            incremental_classes=incremental_classes,
+            incremental_n_features=incremental_n_features,
+            incremental_epochs=incremental_epochs,
+            incremental_trees_per_chunk=incremental_trees_per_chunk,
+            model_artifact_format=model_artifact_format,
+            model_s3_key=model_s3_key,
+            model_cache_dir=model_cache_dir,
+            export_flat_model=export_flat_model,
+            flat_model_s3_prefix=flat_model_s3_prefix,
+            prediction_mode=prediction_mode,
+            input_data_s3_key=input_data_s3_key,
+            output_s3_key=output_s3_key,
+            prediction_output_format=prediction_output_format,
+            prediction_chunk_rows=prediction_chunk_rows,
+            predict_key_column=predict_key_column,
+            prediction_manifest=prediction_manifest,
+            prediction_manifest_s3_key=prediction_manifest_s3_key,
+            dataset_cache_dir=dataset_cache_dir,
+            dataset_cache_max_bytes=dataset_cache_max_bytes,
+            dataset_cache_s3_sidecar=dataset_cache_s3_sidecar,
             s3_key=f"{provider}/{product_id}"
         )
         container_overrides = {
@@ -0,0 +1,146 @@
+"""
+Streaming batch prediction from S3 shards to S3.
+
+Input shards under a prefix are read a fixed number of rows at a time, the next chunk
+being read and parsed on a background thread while the current one is scored. Each
+prediction is written with its row key as a binary .npy record array or CSV uploaded in
+parts as it grows. Memory stays bounded by the chunk size, however large the dataset.
+
+The key is the row's position across the shards unless a key column is given. Candle
+datasets default to their first feature column, the candle start; order datasets have
+no timestamp feature, so their rows are keyed by position.
+"""
+import io
+import logging
+import sys
+
+from contextlib import contextmanager
+from itertools import chain
+
+import numpy as np
+
+from sklearn.datasets import load_svmlight_file
+
+from tasks.incremental import iter_binary_chunks, list_shards
+from tasks.matrix_io import NpyWriter
+from tasks.parallel import prefetch
+from tasks.s3_io import DEFAULT_PART_SIZE, MultipartWriter, iter_chunks, iter_s3_lines
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_KEY_COLUMN = None
+# feature column holding the candle start, see feature_engineering.CANDLE_FEATURE_KEYS
+CANDLE_KEY_COLUMN = 0
+KEY_NAME = "start"
+OUTPUT_FORMATS = ("npy", "csv")
+PREDICTION_DTYPE = np.dtype([(KEY_NAME, "<i8"), ("prediction", "<f8")])
+
+
+def score(model, X):
+    """Probability of the positive class, or the predicted label for models without predict_proba."""
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(X)[:, 1]
+    return model.predict(X)
+
+
+def default_key_column(data_type="order"):
+    """The candle start for candle data, row position (None) for any other data type."""
+    return CANDLE_KEY_COLUMN if data_type == "candle" else DEFAULT_KEY_COLUMN
+
+
+def parse_key_column(value, data_type="order"):
+    """
+    Parses PREDICT_KEY_COLUMN: a zero-based feature column, or "none" to key rows by
+    position. Unset, it defaults to default_key_column(data_type).
+    """
+    if value is None or not value.strip():
+        return default_key_column(data_type)
+    if value.strip().lower() == "none":
+        return None
+    return int(value)
+
+
+def iter_keyed_chunks(s3_client, bucket, shards, chunk_rows=DEFAULT_CHUNK_ROWS, n_features=None, key_column=DEFAULT_KEY_COLUMN):
+    """
+    Yields (keys, X) chunks over shards, list_shards' (key, has binary) pairs. Keys are
+    read from libsvm text parsed as float64: the float32 binary matrices cannot hold
+    epoch-second candle starts exactly, so they are only used when rows are keyed by
+    position.
+    """
+    offset = 0
+    for key, binary in shards:
+        if binary and key_column is None:
+            chunks = (X for X, _ in iter_binary_chunks(s3_client, bucket, key, chunk_rows))
+        else:
+            lines = (line for line in iter_s3_lines(s3_client, bucket, key) if line.strip())
+            chunks = (
+                load_svmlight_file(io.BytesIO("\n".join(chunk).encode("utf-8")), n_features=n_features)[0]
+                for chunk in iter_chunks(lines, chunk_rows)
+            )
+        for X in chunks:
+            if key_column is None:
+                keys = np.arange(offset, offset + X.shape[0], dtype=np.int64)
+            else:
+                keys = np.asarray(X[:, key_column].toarray()).ravel().astype(np.int64)
+            offset += X.shape[0]
+            yield keys, X
+
+
+@contextmanager
+def prediction_writer(s3_client, bucket, key, output_format="npy", part_size=DEFAULT_PART_SIZE):
+    """
+    Yields write(keys, predictions). "npy" writes a record array with start and
+    prediction fields, "csv" a start,prediction header and one line per row.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported prediction output format: {output_format}")
+    if output_format == "npy":
+        with NpyWriter(s3_client, bucket, key, PREDICTION_DTYPE, part_size=part_size) as writer:
+
+            def write(keys, predictions):
+                records = np.empty(len(keys), dtype=PREDICTION_DTYPE)
+                records[KEY_NAME] = keys
+                records["prediction"] = predictions
+                writer.append(records)
+
+            yield write
+        return
+    with MultipartWriter(s3_client, bucket, key, part_size=part_size) as writer:
+        writer.write(f"{KEY_NAME},prediction\n")
+
+        def write(keys, predictions):
+            # one format call per chunk, repr floats round-trip exactly
+            writer.write(("{},{!r}\n" * len(keys)).format(*chain.from_iterable(zip(keys.tolist(), predictions.tolist()))))
+
+        yield write
+
+
+def predict_to_s3(
+    s3_client,
+    model,
+    bucket,
+    input_prefix,
+    output_key,
+    output_format="npy",
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    key_column=DEFAULT_KEY_COLUMN,
+):
+    """
+    Scores every shard under input_prefix chunk by chunk and writes keyed predictions to
+    s3://bucket/output_key. Returns the number of rows scored.
+    """
+    logger.info(f"Streaming predictions for s3://{bucket}/{input_prefix} to s3://{bucket}/{output_key} ({output_format})")
+    shards = list_shards(s3_client, bucket, input_prefix)
+    if not shards:
+        raise ValueError(f"No libsvm shards under s3://{bucket}/{input_prefix}")
+    n_features = getattr(model, "n_features_in_", None)
+    chunks = iter_keyed_chunks(s3_client, bucket, shards, chunk_rows, n_features, key_column)
+    rows = 0
+    with prediction_writer(s3_client, bucket, output_key, output_format) as write:
+        for keys, X in prefetch(chunks):
+            write(keys, score(model, X))
+            rows += len(keys)
+    logger.info(f"Predicted {rows} rows")
+    return rows
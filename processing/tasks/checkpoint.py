@@ -0,0 +1,67 @@
+import json
+import logging
+import sys
+
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+# conversion settings recorded in the manifest, changing any of them invalidates it
+SETTINGS = ("data_type", "output_layout", "engine")
+
+
+def manifest_key(s3_libsvm_key):
+    """The manifest lives next to the output, not under it, so shard listings never pick it up."""
+    return f"{s3_libsvm_key.rstrip('/')}.manifest.json"
+
+
+def empty_manifest(data_type, output_layout="concatenated", engine="vectorized"):
+    return {
+        "version": MANIFEST_VERSION,
+        "data_type": data_type,
+        "output_layout": output_layout,
+        "engine": engine,
+        "segments": {},
+    }
+
+
+def load_manifest(s3_client, bucket, key, data_type, output_layout="concatenated", engine="vectorized"):
+    """
+    Returns the checkpoint manifest stored at key, or an empty one when there is none yet
+    or it was written by another manifest version or with other SETTINGS.
+    Segments map source key -> {"etag": ..., "output": ...}.
+    """
+    expected = empty_manifest(data_type, output_layout, engine)
+    try:
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            logger.info(f"No checkpoint manifest at s3://{bucket}/{key}, starting from scratch")
+            return expected
+        raise
+    manifest = json.loads(body)
+    changed = [name for name in ("version",) + SETTINGS if manifest.get(name) != expected[name]]
+    if changed:
+        logger.warning(f"Ignoring checkpoint manifest at s3://{bucket}/{key}, its {', '.join(changed)} changed")
+        return expected
+    return manifest
+
+
+def save_manifest(s3_client, bucket, key, manifest):
+    manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+        ContentType="application/json",
+    )
+    logger.info(f"Checkpoint manifest saved to s3://{bucket}/{key} ({len(manifest['segments'])} segments)")
+
+
+def is_current(manifest, segment):
+    """True when the segment was already converted at its current ETag."""
+    entry = manifest["segments"].get(segment["Key"])
+    return entry is not None and entry["etag"] == segment["ETag"]
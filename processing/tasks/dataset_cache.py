@@ -0,0 +1,205 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from botocore.exceptions import ClientError
+from scipy import sparse
+from tasks.matrix_io import binary_paths, download_matrices
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+META_FILE = "meta.json"
+
+
+def _to_arrays(X, y):
+    """Flattens (X, y) into named arrays, CSR matrices are stored as their components."""
+    if sparse.issparse(X):
+        X = X.tocsr()
+        arrays = {
+            "X_data": X.data,
+            "X_indices": X.indices,
+            "X_indptr": X.indptr,
+            "X_shape": np.array(X.shape, dtype=np.int64),
+        }
+    else:
+        arrays = {"X": np.asarray(X)}
+    arrays["y"] = np.asarray(y)
+    return arrays
+
+
+def _from_arrays(arrays):
+    if "X" in arrays:
+        return arrays["X"], arrays["y"]
+    X = sparse.csr_matrix(
+        (arrays["X_data"], arrays["X_indices"], arrays["X_indptr"]),
+        shape=tuple(int(n) for n in arrays["X_shape"]),
+    )
+    return X, arrays["y"]
+
+
+def _etag(value):
+    return value.strip('"')
+
+
+def _head_etag(s3_client, bucket, key):
+    """The object's ETag, None when it does not exist."""
+    try:
+        return s3_client.head_object(Bucket=bucket, Key=key)["ETag"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404", "403"):
+            return None
+        raise
+
+
+def dataset_etag(s3_client, bucket, key):
+    """
+    The version of the data download_matrices reads for key: the libsvm ETag, joined
+    with the ETags of the .X.npy/.y.npy pair when both exist, since those are read
+    instead of the libsvm and can be rewritten without it.
+    """
+    etag = _etag(s3_client.head_object(Bucket=bucket, Key=key)["ETag"])
+    matrices = [_head_etag(s3_client, bucket, path) for path in binary_paths(key)]
+    if all(matrices):
+        etag = "_".join([etag] + [_etag(matrix) for matrix in matrices])
+    return etag
+
+
+class DatasetCache:
+    """
+    Caches parsed (X, y) datasets on a local volume, keyed by S3 object and ETag, so a
+    dataset that has not changed is neither downloaded nor parsed again. Entries are
+    stored as .npy files and memory-mapped on load. The least recently used entries
+    are evicted once the cache grows past max_bytes. With s3_sidecar set, parsed
+    arrays are also uploaded next to the source object for other tasks to reuse.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, s3_sidecar=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.s3_sidecar = s3_sidecar
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Builds the cache from DATASET_CACHE_* variables, None when DATASET_CACHE_DIR is unset."""
+        directory = os.environ.get("DATASET_CACHE_DIR")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            max_bytes=int(os.environ.get("DATASET_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES),
+            s3_sidecar=os.environ.get("DATASET_CACHE_S3_SIDECAR", "false").lower() == "true",
+        )
+
+    def _entry_dir(self, bucket, key, etag):
+        digest = hashlib.sha256(f"{bucket}/{key}@{_etag(etag)}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, bucket, key, etag):
+        entry = self._entry_dir(bucket, key, etag)
+        if not os.path.exists(os.path.join(entry, META_FILE)):
+            return None
+        # the entry directory's mtime is its last use, which eviction orders by
+        os.utime(entry)
+        arrays = {
+            name[:-len(".npy")]: np.load(os.path.join(entry, name), mmap_mode="r")
+            for name in os.listdir(entry)
+            if name.endswith(".npy")
+        }
+        return _from_arrays(arrays)
+
+    def put(self, bucket, key, etag, X, y):
+        entry = self._entry_dir(bucket, key, etag)
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".staging-")
+        try:
+            for name, array in _to_arrays(X, y).items():
+                np.save(os.path.join(staging, f"{name}.npy"), array)
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump({"bucket": bucket, "key": key, "etag": _etag(etag), "created_at": time.time()}, f)
+            # rename is atomic, readers never see a half written entry
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.rename(staging, entry)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.evict()
+
+    def size(self):
+        return sum(self._entry_size(path) for path in self._entries())
+
+    def _entries(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.directory, name))
+        ]
+
+    @staticmethod
+    def _entry_size(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        total = sum(self._entry_size(path) for path in entries)
+        while entries and total > self.max_bytes:
+            oldest = entries.pop(0)
+            total -= self._entry_size(oldest)
+            shutil.rmtree(oldest, ignore_errors=True)
+            logger.info(f"Evicted dataset cache entry {oldest}")
+
+    @staticmethod
+    def sidecar_key(key, etag):
+        return f"{key}.parsed/{_etag(etag)}.npz"
+
+    def _get_sidecar(self, s3_client, bucket, key, etag):
+        try:
+            body = s3_client.get_object(Bucket=bucket, Key=self.sidecar_key(key, etag))["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404", "403"):
+                return None
+            raise
+        with np.load(io.BytesIO(body)) as npz:
+            return _from_arrays({name: npz[name] for name in npz.files})
+
+    def _put_sidecar(self, s3_client, bucket, key, etag, X, y):
+        buffer = io.BytesIO()
+        np.savez(buffer, **_to_arrays(X, y))
+        s3_client.put_object(Bucket=bucket, Key=self.sidecar_key(key, etag), Body=buffer.getvalue())
+
+    def fetch(self, s3_client, bucket, key, local_path, load):
+        """
+        Returns (X, y) for s3://bucket/key. HEAD requests resolve the current version
+        (see dataset_etag); a cached entry (or S3 sidecar) for it is returned directly,
+        otherwise the data is downloaded to local_path, parsed with load(local_path) and
+        cached.
+        """
+        etag = dataset_etag(s3_client, bucket, key)
+        cached = self.get(bucket, key, etag)
+        if cached is not None:
+            logger.info(f"Dataset cache hit for s3://{bucket}/{key} ({_etag(etag)})")
+            return cached
+        if self.s3_sidecar:
+            parsed = self._get_sidecar(s3_client, bucket, key, etag)
+            if parsed is not None:
+                logger.info(f"Loaded parsed sidecar for s3://{bucket}/{key}")
+                self.put(bucket, key, etag, *parsed)
+                return self.get(bucket, key, etag)
+        logger.info(f"Dataset cache miss for s3://{bucket}/{key}, downloading")
+        download_matrices(s3_client, bucket, key, local_path)
+        X, y = load(local_path)
+        self.put(bucket, key, etag, X, y)
+        if self.s3_sidecar:
+            self._put_sidecar(s3_client, bucket, key, etag, X, y)
+        return self.get(bucket, key, etag) or (X, y)
@@ -0,0 +1,142 @@
+"""
+Estimator registry for train_scikit.
+
+get_config builds XGBoost-style hyperparameters (max_depth, learning_rate,
+subsample, colsample_bytree, n_estimators, early_stopping_rounds); each factory maps
+the ones its engine understands onto the sklearn equivalents and ignores the rest.
+"""
+import logging
+import sys
+
+from scipy import sparse
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import log_loss
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_ESTIMATOR = "random_forest"
+
+
+def to_dense(X):
+    """HistGradientBoosting in sklearn 1.2 only takes dense arrays, libsvm loads CSR."""
+    return X.toarray() if sparse.issparse(X) else X
+
+
+def _random_forest(params):
+    return RandomForestClassifier(
+        n_estimators=params.get("n_estimators", 100),
+        max_depth=params.get("max_depth", 5),
+        max_features=params.get("colsample_bytree", "sqrt"),
+        max_samples=params.get("subsample"),
+        min_samples_leaf=max(1, int(params.get("min_child_weight", 1))),
+        n_jobs=params.get("n_jobs", -1),
+        random_state=params.get("random_state", 42),
+    )
+
+
+def _extra_trees(params):
+    return ExtraTreesClassifier(
+        n_estimators=params.get("n_estimators", 100),
+        max_depth=params.get("max_depth", 5),
+        max_features=params.get("colsample_bytree", "sqrt"),
+        min_samples_leaf=max(1, int(params.get("min_child_weight", 1))),
+        n_jobs=params.get("n_jobs", -1),
+        random_state=params.get("random_state", 42),
+    )
+
+
+def _hist_gradient_boosting(params):
+    max_depth = params.get("max_depth")
+    booster = HistGradientBoostingClassifier(
+        learning_rate=params.get("learning_rate", 0.1),
+        max_iter=params.get("n_estimators", 100),
+        max_depth=max_depth,
+        # like XGBoost, let max_depth alone bound the tree size
+        max_leaf_nodes=None if max_depth else 31,
+        # early stopping runs against the validation set in fit_estimator
+        early_stopping=False,
+        random_state=params.get("random_state", 42),
+    )
+    return make_pipeline(FunctionTransformer(to_dense, accept_sparse=True), booster)
+
+
+ESTIMATORS = {
+    "random_forest": _random_forest,
+    "extra_trees": _extra_trees,
+    "hist_gradient_boosting": _hist_gradient_boosting,
+}
+
+
+def create_estimator(name, hyperparams):
+    """Builds the ESTIMATORS engine called name from get_config hyperparameters."""
+    if name not in ESTIMATORS:
+        raise ValueError(f"Unsupported estimator: {name}")
+    return ESTIMATORS[name](hyperparams)
+
+
+def final_estimator(model):
+    return model[-1] if isinstance(model, Pipeline) else model
+
+
+def best_iteration(model):
+    """Boosting iterations kept, or trees grown for forests; None when the model has neither."""
+    model = final_estimator(model)
+    if hasattr(model, "best_iteration"):
+        return model.best_iteration
+    if hasattr(model, "n_iter_"):
+        return int(model.n_iter_)
+    if hasattr(model, "estimators_"):
+        return len(model.estimators_)
+    return None
+
+
+def early_stopping_iteration(losses, rounds):
+    """
+    Returns the number of iterations to keep, XGBoost style: training stops once the
+    validation loss has not improved for rounds iterations and keeps the best one.
+    """
+    best = 0
+    for i, loss in enumerate(losses):
+        if loss < losses[best]:
+            best = i
+        elif i - best >= rounds:
+            break
+    return best + 1
+
+
+def fit_estimator(model, X_train, y_train, X_val=None, y_val=None, early_stopping_rounds=None):
+    """
+    Fits model. Boosting models given early_stopping_rounds and a validation set are grown
+    with warm_start, scored on the validation set after every iteration, and stop once the
+    loss has not improved for early_stopping_rounds iterations. When the best iteration is
+    not the last one grown, the booster is refit with max_iter set to it.
+    """
+    booster = final_estimator(model)
+    if not (isinstance(booster, HistGradientBoostingClassifier) and early_stopping_rounds and X_val is not None):
+        model.fit(X_train, y_train)
+        return model
+    if isinstance(model, Pipeline):
+        # the preprocessing steps are fit once, only the booster grows
+        X_train = model[:-1].fit_transform(X_train, y_train)
+        X_val = model[:-1].transform(X_val)
+    max_iter, warm_start = booster.max_iter, booster.warm_start
+    losses = []
+    keep = 0
+    booster.set_params(warm_start=True)
+    while len(losses) < max_iter and len(losses) - keep < early_stopping_rounds:
+        # every warm start re-bins the data and rescores the staged losses, so steps grow by half
+        booster.set_params(max_iter=min(len(losses) + max(early_stopping_rounds, len(losses) // 2), max_iter))
+        booster.fit(X_train, y_train)
+        staged = booster.staged_predict_proba(X_val)
+        losses += [log_loss(y_val, proba, labels=booster.classes_) for i, proba in enumerate(staged) if i >= len(losses)]
+        keep = early_stopping_iteration(losses, early_stopping_rounds)
+    logger.info(f"Best validation log loss {losses[keep - 1]:.5f} at iteration {keep} of {len(losses)}")
+    booster.set_params(max_iter=keep, warm_start=False)
+    if keep < booster.n_iter_:
+        # boosting iterations cannot be dropped through the public API, so refit up to the best one
+        booster.fit(X_train, y_train)
+    booster.set_params(warm_start=warm_start)
+    return model
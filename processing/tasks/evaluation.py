@@ -0,0 +1,142 @@
+"""
+Single-pass binary evaluation.
+
+Scores are sorted once; cumulative counts of positives and negatives down that order
+give every threshold's confusion counts, so AUC, accuracy, the confusion matrix and
+threshold curves all come from the same arrays instead of one pass per metric. The
+positive class is up (1); flat rows, when labels have them, count as negatives.
+ScoreHistogram keeps the same counts per score bin for sets scored chunk by chunk.
+"""
+import numpy as np
+
+POSITIVE = 1
+NEGATIVE = 0
+DEFAULT_THRESHOLD = 0.5
+CURVE_THRESHOLDS = tuple(round(t, 2) for t in np.arange(0.05, 1.0, 0.05))
+DEFAULT_SCORE_BINS = 10000
+
+
+def stratified_sample(y, size, random_state=42):
+    """
+    Returns sorted row indices of a sample of about size rows with the class
+    proportions of y, or None when y has no more than size rows.
+    """
+    y = np.asarray(y)
+    if not size or size >= len(y):
+        return None
+    rng = np.random.RandomState(random_state)
+    classes, inverse, counts = np.unique(y, return_inverse=True, return_counts=True)
+    picks = []
+    for i, count in enumerate(counts):
+        take = min(count, max(1, int(round(count * size / len(y)))))
+        picks.append(rng.choice(np.flatnonzero(inverse == i), take, replace=False))
+    return np.sort(np.concatenate(picks))
+
+
+def binary_metrics(y_true, scores, threshold=DEFAULT_THRESHOLD, curve_thresholds=None):
+    """
+    Computes accuracy, ROC AUC and the confusion matrix at threshold (scores above it
+    predict up), plus precision/recall/false positive rate at curve_thresholds when given.
+    AUC is None when y_true holds a single class, as roc_auc_score would refuse it.
+    """
+    y_true = np.asarray(y_true)
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    order = np.argsort(scores, kind="mergesort")[::-1]
+    descending = scores[order]
+    ascending = descending[::-1]
+    labels = y_true[order]
+    tps = np.cumsum(labels == POSITIVE)
+    # negatives counted separately from "not up" so accuracy matches accuracy_score with flat rows
+    downs = np.cumsum(labels == NEGATIVE)
+    fps = np.arange(1, n + 1) - tps
+    positives, negatives = (int(tps[-1]), int(fps[-1])) if n else (0, 0)
+
+    def counts_above(t):
+        k = n - np.searchsorted(ascending, t, side="right")
+        return (int(tps[k - 1]), int(fps[k - 1]), int(downs[k - 1])) if k else (0, 0, 0)
+
+    # one ROC point per distinct score, the same points roc_curve builds
+    last_of_score = np.r_[np.flatnonzero(np.diff(descending)), n - 1] if n else np.array([], dtype=int)
+    if positives and negatives:
+        tpr = np.r_[0, tps[last_of_score]] / positives
+        fpr = np.r_[0, fps[last_of_score]] / negatives
+        auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
+    else:
+        auc = None
+
+    down_total = int(downs[-1]) if n else 0
+    return _summarize(n, positives, negatives, down_total, auc, counts_above, threshold, curve_thresholds)
+
+
+def _summarize(n, positives, negatives, down_total, auc, counts_above, threshold, curve_thresholds):
+    """Builds the metrics dict from class totals and counts_above(t) -> (tp, fp, downs) above t."""
+    tp, fp, downs_above = counts_above(threshold)
+    metrics = {
+        "accuracy": (tp + down_total - downs_above) / n if n else 0.0,
+        "auc": auc,
+        "confusion_matrix": {
+            "true_positive": tp,
+            "true_negative": negatives - fp,
+            "false_positive": fp,
+            "false_negative": positives - tp,
+        },
+        "samples": n,
+    }
+    if curve_thresholds is not None:
+        curve = []
+        for t in curve_thresholds:
+            t_tp, t_fp, _ = counts_above(t)
+            curve.append({
+                "threshold": t,
+                "precision": t_tp / (t_tp + t_fp) if t_tp + t_fp else None,
+                "recall": t_tp / positives if positives else None,
+                "false_positive_rate": t_fp / negatives if negatives else None,
+            })
+        metrics["threshold_curve"] = curve
+    return metrics
+
+
+class ScoreHistogram:
+    """
+    Streaming counterpart of binary_metrics for scores in [0, 1]. Rows are counted per
+    fixed-width score bin as chunks arrive, so memory does not grow with the rows scored.
+    Bin i holds scores in (i/bins, (i+1)/bins], so counts above a threshold on a bin
+    edge (0.5 and every CURVE_THRESHOLDS value) are exact; AUC treats the scores within
+    a bin as ties.
+    """
+
+    def __init__(self, bins=DEFAULT_SCORE_BINS):
+        self.bins = bins
+        self.totals = np.zeros(bins, dtype=np.int64)
+        self.ups = np.zeros(bins, dtype=np.int64)
+        self.downs = np.zeros(bins, dtype=np.int64)
+
+    def add(self, y_true, scores):
+        y_true = np.asarray(y_true)
+        index = np.ceil(np.asarray(scores, dtype=np.float64) * self.bins).astype(np.int64) - 1
+        index = np.clip(index, 0, self.bins - 1)
+        self.totals += np.bincount(index, minlength=self.bins)
+        self.ups += np.bincount(index[y_true == POSITIVE], minlength=self.bins)
+        self.downs += np.bincount(index[y_true == NEGATIVE], minlength=self.bins)
+
+    def metrics(self, threshold=DEFAULT_THRESHOLD, curve_thresholds=None):
+        """The binary_metrics dict for every row added so far."""
+        # cumulative counts from the highest bin down, as binary_metrics goes down sorted scores
+        tps = np.cumsum(self.ups[::-1])
+        fps = np.cumsum((self.totals - self.ups)[::-1])
+        downs = np.cumsum(self.downs[::-1])
+        positives, negatives = int(tps[-1]), int(fps[-1])
+
+        def counts_above(t):
+            k = min(max(self.bins - int(round(t * self.bins)), 0), self.bins)
+            return (int(tps[k - 1]), int(fps[k - 1]), int(downs[k - 1])) if k else (0, 0, 0)
+
+        if positives and negatives:
+            tpr = np.r_[0, tps] / positives
+            fpr = np.r_[0, fps] / negatives
+            auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
+        else:
+            auc = None
+        n = positives + negatives
+        return _summarize(n, positives, negatives, int(downs[-1]), auc, counts_above, threshold, curve_thresholds)
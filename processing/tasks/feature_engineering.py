@@ -1,10 +1,29 @@
 import csv
 import boto3
 import io
+import numpy as np
 import os
 import sys
 import logging
 
+from botocore.exceptions import ClientError
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from tasks.checkpoint import empty_manifest, is_current, load_manifest, manifest_key, save_manifest
+from tasks.matrix_io import FEATURE_DTYPE, LABEL_DTYPE, NpyWriter, binary_paths
+from tasks.labels import DEFAULT_FLAT_THRESHOLD, classify, forward_labels, label_columns, parse_horizons
+from tasks.parallel import available_cpus, ordered_map
+from tasks.profiling import StageProfiler, profile_stage
+from tasks.technical_features import compute_features, resolve_features
+from tasks.s3_io import (
+    DEFAULT_PART_SIZE,
+    MultipartWriter,
+    get_range,
+    iter_chunks,
+    iter_s3_lines,
+    line_aligned_ranges,
+)
+
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -20,16 +39,25 @@ ORDER_FEATURE_KEYS = [
     "filled_size",
 ]
 
+# column order written by the collection service
 CANDLE_FEATURE_KEYS = [
     "start",
-    "low",
-    "high",
     "open",
+    "high",
+    "low",
     "close",
     "volume",
-    # add more engineered features as needed
 ]
 
+STREAM_CHUNK_ROWS = 10000
+VECTORIZED_CHUNK_BYTES = 16 * 1024 * 1024
+DOWNLOAD_WORKERS = 16
+RANGE_SIZE = 64 * 1024 * 1024
+MIN_RANGE_SIZE = 1024 * 1024
+OUTPUT_LAYOUTS = ("concatenated", "sharded")
+SERIES_TIME_COLUMN = "start"
+SERIES_WRITE_ROWS = 100000
+
 
 def csv_row_to_libsvm(row, feature_keys, label_col, label_map=None):
     label_val = row.get(label_col, None)
@@ -38,45 +66,668 @@ def csv_row_to_libsvm(row, feature_keys, label_col, label_map=None):
     return f"{label} " + " ".join(features)
 
 
-def s3_csv_to_libsvm(s3_bucket, s3_csv_key, s3_libsvm_key, data_type="order"):
+def get_schema(data_type):
+    """Returns (feature_keys, label_col, label_map) for a data type."""
     if data_type == "order":
-        feature_keys = ORDER_FEATURE_KEYS
-        label_col = "side"
-        label_map = {"BUY": 0, "SELL": 1}
+        return ORDER_FEATURE_KEYS, "side", {"BUY": 0, "SELL": 1}
     elif data_type == "candle":
-        feature_keys = CANDLE_FEATURE_KEYS
-        label_col = "trend"
-        label_map = {"up": 1, "down": 0}
-    else:
-        raise ValueError("Unsupported data_type")
+        return CANDLE_FEATURE_KEYS, "trend", {"up": 1, "down": 0}
+    raise ValueError("Unsupported data_type")
+
+
+def csv_text_to_libsvm_rows(text, feature_keys, label_col, label_map=None):
+    """Converts CSV text to libsvm text one row at a time through csv.DictReader."""
+    reader = csv.DictReader(io.StringIO(text), fieldnames=feature_keys + [label_col])
+    return "".join(csv_row_to_libsvm(row, feature_keys, label_col, label_map) + "\n" for row in reader)
+
+
+def _split_csv_tokens(text, n_fields):
+    """
+    Splits a chunk of plain CSV text into a (rows, n_fields) array of raw string tokens.
+    Returns None when the chunk holds anything the csv module would treat specially
+    (quotes, carriage returns) or rows with a different field count.
+    """
+    if '"' in text or "\r" in text:
+        return None
+    # csv.DictReader skips blank lines
+    while "\n\n" in text:
+        text = text.replace("\n\n", "\n")
+    text = text.strip("\n")
+    if not text:
+        return np.empty((0, n_fields), dtype=object)
+
+    raw = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    newlines = np.flatnonzero(raw == ord("\n"))
+    commas = np.flatnonzero(raw == ord(","))
+    n_rows = len(newlines) + 1
+    if len(commas) != n_rows * (n_fields - 1):
+        return None
+    commas_per_row = np.bincount(np.searchsorted(newlines, commas), minlength=n_rows)
+    if np.any(commas_per_row != n_fields - 1):
+        return None
+
+    tokens = text.replace("\n", ",").split(",")
+    return np.array(tokens, dtype=object).reshape(n_rows, n_fields)
+
+
+def csv_text_to_libsvm_vectorized(text, feature_keys, label_col, label_map=None):
+    """
+    Converts CSV text to libsvm text with array operations: tokens are split in bulk,
+    labels are mapped with masks and every row is formatted by a single template.
+    Feature values are copied verbatim, so the output is byte-identical to the row path,
+    which is used as the fallback for chunks that are not plain rectangular CSV.
+    """
+    n_features = len(feature_keys)
+    tokens = _split_csv_tokens(text, n_features + 1)
+    if tokens is None:
+        return csv_text_to_libsvm_rows(text, feature_keys, label_col, label_map)
+    n_rows = tokens.shape[0]
+    if n_rows == 0:
+        return ""
+
+    out = np.empty((n_rows, n_features + 1), dtype=object)
+    out[:, 0] = 0
+    for label_val, label in (label_map or {}).items():
+        out[tokens[:, -1] == label_val, 0] = label
+    out[:, 1:] = tokens[:, :-1]
+
+    row_template = "{} " + " ".join(f"{i+1}:{{}}" for i in range(n_features)) + "\n"
+    return (row_template * n_rows).format(*out.ravel().tolist())
+
+
+def iter_text_chunks(text, chunk_bytes=VECTORIZED_CHUNK_BYTES):
+    """Splits text into pieces of roughly chunk_bytes characters that end on a line boundary."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + chunk_bytes)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+
+CONVERSION_ENGINES = {
+    "row": csv_text_to_libsvm_rows,
+    "vectorized": csv_text_to_libsvm_vectorized,
+}
+
+
+def get_engine(engine):
+    if engine not in CONVERSION_ENGINES:
+        raise ValueError(f"Unsupported CONVERSION_ENGINE: {engine}")
+    return CONVERSION_ENGINES[engine]
+
+
+def convert_csv_text(text, data_type="order", engine="vectorized"):
+    """Converts a whole CSV document to libsvm text. Module level so it can run in worker processes."""
+    feature_keys, label_col, label_map = get_schema(data_type)
+    convert = get_engine(engine)
+    return "".join(convert(chunk, feature_keys, label_col, label_map) for chunk in iter_text_chunks(text))
+
+
+def s3_csv_to_libsvm(s3_bucket, s3_csv_key, s3_libsvm_key, data_type="order", engine="vectorized", binary_output=False, profiler=None):
+    feature_keys, _, _ = get_schema(data_type)
+    get_engine(engine)
 
     s3 = boto3.client("s3")
-    logger.info(f"Downloading CSV from s3://{s3_bucket}/{s3_csv_key}")
-    csv_obj = s3.get_object(Bucket=s3_bucket, Key=s3_csv_key)
-    csv_content = csv_obj['Body'].read().decode('utf-8')
-    csvfile = io.StringIO(csv_content)
-    reader = csv.DictReader(csvfile, fieldnames=feature_keys + [label_col])
-
-    def libsvm_line_generator():
-        for row in reader:
-            yield csv_row_to_libsvm(row, feature_keys, label_col, label_map)
-
-    libsvm_buffer = io.StringIO()
-    for libsvm_line in libsvm_line_generator():
-        libsvm_buffer.write(libsvm_line + "\n")
-
-    logger.info(f"Uploading libsvm to s3://{s3_bucket}/{s3_libsvm_key}")
-    s3.put_object(Bucket=s3_bucket, Key=s3_libsvm_key, Body=libsvm_buffer.getvalue().encode("utf-8"))
+    with profile_stage(profiler, "download"):
+        logger.info(f"Downloading CSV from s3://{s3_bucket}/{s3_csv_key}")
+        csv_obj = s3.get_object(Bucket=s3_bucket, Key=s3_csv_key)
+        csv_content = csv_obj['Body'].read().decode('utf-8')
+    with profile_stage(profiler, "convert"):
+        libsvm_content = convert_csv_text(csv_content, data_type, engine)
+
+    with profile_stage(profiler, "upload"):
+        logger.info(f"Uploading libsvm to s3://{s3_bucket}/{s3_libsvm_key}")
+        s3.put_object(Bucket=s3_bucket, Key=s3_libsvm_key, Body=libsvm_content.encode("utf-8"))
+    if binary_output:
+        with profile_stage(profiler, "binary"):
+            with matrix_writer(s3, s3_bucket, s3_libsvm_key, len(feature_keys)) as append_matrices:
+                for chunk in iter_text_chunks(csv_content):
+                    append_matrices(*parse_numeric_chunk(chunk, data_type))
     logger.info("Feature engineering complete.")
 
 
+def s3_csv_to_libsvm_streaming(
+    s3_bucket,
+    s3_csv_key,
+    s3_libsvm_key,
+    data_type="order",
+    chunk_rows=STREAM_CHUNK_ROWS,
+    part_size=DEFAULT_PART_SIZE,
+    engine="vectorized",
+    binary_output=False,
+    profiler=None,
+):
+    """
+    Same output as s3_csv_to_libsvm, but the CSV is read line by line and the libsvm
+    output is uploaded in multipart chunks, so memory stays bounded by chunk_rows and
+    part_size instead of growing with the dataset. Reads, conversion and uploads
+    interleave chunk by chunk, so they are profiled as a single "stream" stage.
+    """
+    feature_keys, label_col, label_map = get_schema(data_type)
+
+    s3 = boto3.client("s3")
+    logger.info(f"Streaming CSV from s3://{s3_bucket}/{s3_csv_key}")
+    convert = get_engine(engine)
+    lines = iter_s3_lines(s3, s3_bucket, s3_csv_key)
+
+    rows = 0
+    with profile_stage(profiler, "stream"), \
+            MultipartWriter(s3, s3_bucket, s3_libsvm_key, part_size=part_size) as writer, \
+            matrix_writer(s3, s3_bucket, s3_libsvm_key, len(feature_keys), binary_output, part_size) as append_matrices:
+        for chunk in iter_chunks(lines, chunk_rows):
+            text = "\n".join(chunk)
+            libsvm = convert(text, feature_keys, label_col, label_map)
+            writer.write(libsvm)
+            if binary_output:
+                append_matrices(*parse_numeric_chunk(text, data_type))
+            rows += libsvm.count("\n")
+    logger.info(f"Feature engineering complete, {rows} rows streamed to s3://{s3_bucket}/{s3_libsvm_key}")
+
+
+@contextmanager
+def matrix_writer(s3, s3_bucket, s3_libsvm_key, columns, enabled=True, part_size=DEFAULT_PART_SIZE):
+    """
+    Yields append(X, y), which writes dense float32 features and int32 labels as .npy
+    files next to s3_libsvm_key so training can memory-map them instead of parsing text.
+    append is a no-op when enabled is false.
+    """
+    if not enabled:
+        yield lambda X, y: None
+        return
+    x_key, y_key = binary_paths(s3_libsvm_key)
+    with NpyWriter(s3, s3_bucket, x_key, FEATURE_DTYPE, columns=columns, part_size=part_size) as x_writer, \
+            NpyWriter(s3, s3_bucket, y_key, LABEL_DTYPE, part_size=part_size) as y_writer:
+
+        def append(X, y):
+            x_writer.append(X)
+            y_writer.append(y)
+
+        yield append
+    logger.info(f"Binary matrices ({x_writer.rows} x {columns}) written to s3://{s3_bucket}/{x_key}")
+
+
+@contextmanager
+def csv_converter(max_workers, data_type="order", engine="vectorized"):
+    """
+    Yields a thread-safe function that converts CSV text to libsvm text on a process pool
+    of max_workers. A single vCPU gains nothing from a pool, so conversion then runs inline.
+    """
+    if max_workers <= 1:
+        yield lambda text: convert_csv_text(text, data_type, engine)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        yield lambda text: pool.submit(convert_csv_text, text, data_type, engine).result()
+
+
+def list_segments(s3, s3_bucket, prefix, suffix=".csv"):
+    """Returns the S3 objects under prefix whose key ends with suffix, in key order."""
+    paginator = s3.get_paginator("list_objects_v2")
+    segments = []
+    for page in paginator.paginate(Bucket=s3_bucket, Prefix=prefix):
+        segments.extend(obj for obj in page.get("Contents", []) if obj["Key"].endswith(suffix))
+    return sorted(segments, key=lambda obj: obj["Key"])
+
+
+def shard_key(output_prefix, source_prefix, segment_key):
+    """Maps a segment key under source_prefix to its libsvm shard key under output_prefix."""
+    relative = segment_key[len(source_prefix):].lstrip("/")
+    return f"{output_prefix.rstrip('/')}/{os.path.splitext(relative)[0]}.libsvm"
+
+
+def s3_prefix_to_libsvm(
+    s3_bucket,
+    s3_csv_prefix,
+    s3_libsvm_key,
+    data_type="order",
+    engine="vectorized",
+    output_layout="concatenated",
+    incremental=False,
+    max_workers=None,
+    download_workers=DOWNLOAD_WORKERS,
+    part_size=DEFAULT_PART_SIZE,
+    profiler=None,
+):
+    """
+    Converts every CSV segment under s3_csv_prefix. Segments are downloaded on a thread
+    pool and converted on a process pool sized to the task's vCPUs. With the
+    "concatenated" layout the outputs are uploaded in key order to s3_libsvm_key, with
+    "sharded" each segment gets its own object under the s3_libsvm_key prefix.
+
+    With incremental set, every segment's output is kept as a shard and recorded with
+    the segment's ETag in a checkpoint manifest. Later runs only convert new or changed
+    segments, reuse the shards of the others and drop those of deleted segments. A
+    change of data type, layout or engine starts over from an empty manifest.
+
+    Incremental runs save conversion, not transfer, with the "concatenated" layout: the
+    output is rewritten from every shard, so each run still downloads and uploads the
+    whole dataset. UploadPartCopy cannot assemble it server side, as every part but
+    the last must be at least 5 MiB and shards are often smaller. Use the "sharded"
+    layout where runs should only cost the changed segments.
+    """
+    get_schema(data_type)
+    get_engine(engine)
+    if output_layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unsupported OUTPUT_LAYOUT: {output_layout}")
+
+    s3 = boto3.client("s3")
+    with profile_stage(profiler, "list"):
+        segments = list_segments(s3, s3_bucket, s3_csv_prefix)
+        if not segments:
+            raise ValueError(f"No CSV segments found under s3://{s3_bucket}/{s3_csv_prefix}")
+
+        checkpoint_key = manifest_key(s3_libsvm_key)
+        if incremental:
+            previous = load_manifest(s3, s3_bucket, checkpoint_key, data_type, output_layout, engine)
+        else:
+            previous = empty_manifest(data_type, output_layout, engine)
+    shard_prefix = s3_libsvm_key if output_layout == "sharded" else f"{s3_libsvm_key.rstrip('/')}.shards"
+    stale = set(previous["segments"]) - {segment["Key"] for segment in segments}
+    pending = [segment for segment in segments if not is_current(previous, segment)]
+    if incremental and not pending and not stale:
+        logger.info(f"All {len(segments)} segments under s3://{s3_bucket}/{s3_csv_prefix} are up to date")
+        return [entry["output"] for entry in previous["segments"].values()] if output_layout == "sharded" else [s3_libsvm_key]
+
+    max_workers = max_workers or available_cpus()
+    logger.info(
+        f"Converting {len(pending)} of {len(segments)} segments under s3://{s3_bucket}/{s3_csv_prefix} "
+        f"with {max_workers} worker process(es) and {download_workers} download threads"
+    )
+    manifest = empty_manifest(data_type, output_layout, engine)
+
+    # segment downloads, conversion and uploads overlap, so they are one stage
+    with profile_stage(profiler, "convert"), csv_converter(max_workers, data_type, engine) as convert:
+
+        def process_segment(segment):
+            entry = previous["segments"].get(segment["Key"])
+            if is_current(previous, segment):
+                if output_layout == "sharded":
+                    return entry, None
+                return entry, s3.get_object(Bucket=s3_bucket, Key=entry["output"])["Body"].read()
+            response = s3.get_object(Bucket=s3_bucket, Key=segment["Key"])
+            libsvm = convert(response["Body"].read().decode("utf-8")).encode("utf-8")
+            # record the ETag of what was actually read, the listing may already be stale
+            entry = {"etag": response["ETag"], "output": None}
+            if output_layout == "sharded" or incremental:
+                entry["output"] = shard_key(shard_prefix, s3_csv_prefix, segment["Key"])
+                s3.put_object(Bucket=s3_bucket, Key=entry["output"], Body=libsvm)
+            return entry, libsvm
+
+        with ThreadPoolExecutor(max_workers=download_workers) as downloads:
+            results = ordered_map(downloads, process_segment, segments, window=2 * download_workers)
+            if output_layout == "sharded":
+                for segment, (entry, _) in zip(segments, results):
+                    manifest["segments"][segment["Key"]] = entry
+            else:
+                with MultipartWriter(s3, s3_bucket, s3_libsvm_key, part_size=part_size) as writer:
+                    for segment, (entry, libsvm) in zip(segments, results):
+                        manifest["segments"][segment["Key"]] = entry
+                        writer.write(libsvm)
+
+    if incremental:
+        with profile_stage(profiler, "checkpoint"):
+            outputs = [previous["segments"][key]["output"] for key in sorted(stale)]
+            for start in range(0, len(outputs), 1000):
+                s3.delete_objects(
+                    Bucket=s3_bucket,
+                    Delete={"Objects": [{"Key": key} for key in outputs[start:start + 1000]], "Quiet": True},
+                )
+            save_manifest(s3, s3_bucket, checkpoint_key, manifest)
+    logger.info(
+        f"Feature engineering complete, {len(pending)} converted, {len(segments) - len(pending)} reused, "
+        f"{len(stale)} removed, output at s3://{s3_bucket}/{s3_libsvm_key}"
+    )
+    if output_layout == "sharded":
+        return [entry["output"] for entry in manifest["segments"].values()]
+    return [s3_libsvm_key]
+
+
+def s3_csv_to_libsvm_ranged(
+    s3_bucket,
+    s3_csv_key,
+    s3_libsvm_key,
+    data_type="order",
+    engine="vectorized",
+    range_size=RANGE_SIZE,
+    max_workers=None,
+    download_workers=None,
+    part_size=DEFAULT_PART_SIZE,
+    profiler=None,
+):
+    """
+    Same output as s3_csv_to_libsvm for one large object. The object is split into
+    line-aligned byte ranges that are fetched with parallel ranged GETs, converted in
+    worker processes and uploaded in order through a multipart upload.
+    """
+    get_schema(data_type)
+    get_engine(engine)
+
+    s3 = boto3.client("s3")
+    size = s3.head_object(Bucket=s3_bucket, Key=s3_csv_key)["ContentLength"]
+    max_workers = max_workers or available_cpus()
+    download_workers = download_workers or 2 * max_workers
+    # give every worker at least one range, but keep ranges large enough to amortize a GET
+    range_size = max(MIN_RANGE_SIZE, min(range_size, -(-size // max_workers)))
+
+    with ThreadPoolExecutor(max_workers=download_workers) as downloads:
+        with profile_stage(profiler, "split"):
+            ranges = line_aligned_ranges(s3, s3_bucket, s3_csv_key, size, range_size, executor=downloads)
+        logger.info(
+            f"Converting s3://{s3_bucket}/{s3_csv_key} ({size} bytes) as {len(ranges)} ranges "
+            f"with {max_workers} worker process(es)"
+        )
+        # ranged GETs, conversion and part uploads overlap, so they are one stage
+        with profile_stage(profiler, "convert"), csv_converter(max_workers, data_type, engine) as convert:
+
+            def process_range(byte_range):
+                return convert(get_range(s3, s3_bucket, s3_csv_key, *byte_range).decode("utf-8"))
+
+            with MultipartWriter(s3, s3_bucket, s3_libsvm_key, part_size=part_size) as writer:
+                for libsvm in ordered_map(downloads, process_range, ranges, window=download_workers):
+                    writer.write(libsvm)
+    logger.info(f"Feature engineering complete, {len(ranges)} ranges written to s3://{s3_bucket}/{s3_libsvm_key}")
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_numeric_chunk(text, data_type="order"):
+    """
+    Parses a chunk of CSV text into a float64 feature matrix and an int64 label vector.
+    Rows with the wrong number of fields are dropped, non-numeric fields become NaN.
+    """
+    feature_keys, label_col, label_map = get_schema(data_type)
+    n_fields = len(feature_keys) + 1
+    tokens = _split_csv_tokens(text, n_fields)
+    if tokens is None:
+        rows = [row for row in csv.reader(io.StringIO(text)) if len(row) == n_fields]
+        tokens = np.array(rows, dtype=object).reshape(-1, n_fields)
+    labels = np.zeros(len(tokens), dtype=np.int64)
+    for label_val, label in label_map.items():
+        labels[tokens[:, -1] == label_val] = label
+    try:
+        features = tokens[:, :-1].astype(np.float64)
+    except ValueError:
+        # only chunks with stray headers or empty fields pay for the element-wise path
+        features = np.vectorize(_float_or_nan, otypes=[np.float64])(tokens[:, :-1])
+    return features, labels
+
+
+def load_series(s3, s3_bucket, s3_csv_key, data_type="order", download_workers=DOWNLOAD_WORKERS):
+    """
+    Loads every CSV segment at s3_csv_key (an object key or a product prefix) into one
+    float64 feature matrix and label vector. Series with a time column are sorted by it
+    and de-duplicated, keeping the most recently written row for each timestamp.
+    """
+    feature_keys, _, _ = get_schema(data_type)
+    segments = list_segments(s3, s3_bucket, s3_csv_key)
+    if not segments:
+        raise ValueError(f"No CSV segments found under s3://{s3_bucket}/{s3_csv_key}")
+
+    def load_segment(segment):
+        text = s3.get_object(Bucket=s3_bucket, Key=segment["Key"])["Body"].read().decode("utf-8")
+        parsed = [parse_numeric_chunk(chunk, data_type) for chunk in iter_text_chunks(text)]
+        if not parsed:
+            return np.empty((0, len(feature_keys))), np.empty(0, dtype=np.int64)
+        return np.concatenate([p[0] for p in parsed]), np.concatenate([p[1] for p in parsed])
+
+    with ThreadPoolExecutor(max_workers=download_workers) as downloads:
+        parts = list(ordered_map(downloads, load_segment, segments, window=2 * download_workers))
+    features = np.concatenate([p[0] for p in parts])
+    labels = np.concatenate([p[1] for p in parts])
+
+    if SERIES_TIME_COLUMN in feature_keys:
+        times = features[:, feature_keys.index(SERIES_TIME_COLUMN)]
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = times[1:] != times[:-1]
+        order = order[keep]
+        features, labels = features[order], labels[order]
+    logger.info(f"Loaded {len(features)} rows from {len(segments)} segment(s) under s3://{s3_bucket}/{s3_csv_key}")
+    return features, labels
+
+
+def format_libsvm_rows(labels, matrix):
+    """Formats a label vector and a float matrix as libsvm lines in a single pass."""
+    n_rows, n_columns = matrix.shape
+    if n_rows == 0:
+        return ""
+    out = np.empty((n_rows, n_columns + 1), dtype=object)
+    out[:, 0] = labels.tolist()
+    out[:, 1:] = matrix.tolist()
+    row_template = "{} " + " ".join(f"{i+1}:{{}}" for i in range(n_columns)) + "\n"
+    return (row_template * n_rows).format(*out.ravel().tolist())
+
+
+def labels_key(s3_libsvm_key):
+    return f"{s3_libsvm_key}.labels.csv"
+
+
+def read_labels(s3, s3_bucket, key):
+    """Reads a labels sidecar into its column names and a float64 matrix."""
+    text = s3.get_object(Bucket=s3_bucket, Key=key)["Body"].read().decode("utf-8")
+    header, _, body = text.partition("\n")
+    columns = header.split(",")
+    values = np.array(body.replace("\n", ",").rstrip(",").split(",") if body.strip() else [], dtype=np.float64)
+    return columns, values.reshape(-1, len(columns))
+
+
+def s3_series_to_libsvm(
+    s3_bucket,
+    s3_csv_key,
+    s3_libsvm_key,
+    data_type="order",
+    features=None,
+    horizons=None,
+    target_horizon=None,
+    flat_threshold=DEFAULT_FLAT_THRESHOLD,
+    binary_output=False,
+    part_size=DEFAULT_PART_SIZE,
+    profiler=None,
+):
+    """
+    Loads the whole series at s3_csv_key (a key or a product prefix), appends the named
+    technical features (the data type's defaults when features is None) after the raw
+    columns and uploads libsvm. Rows whose indicator windows are not yet full are dropped.
+
+    With horizons set, the ingest label is replaced by forward-looking up/down classes (and
+    flat, for moves within flat_threshold, when it is above 0):
+    the libsvm label is the target_horizon class (the first horizon by default) and the
+    returns and classes of every horizon are written row-aligned to <s3_libsvm_key>.labels.csv,
+    so another target can be selected later with the relabel mode.
+    """
+    feature_keys, _, _ = get_schema(data_type)
+    names = resolve_features(data_type, features)
+    if horizons:
+        if "close" not in feature_keys:
+            raise ValueError(f"Forward labels need a close column, {data_type} has none")
+        target_horizon = target_horizon or horizons[0]
+        if target_horizon not in horizons:
+            raise ValueError(f"Target horizon {target_horizon} is not one of {horizons}")
+
+    s3 = boto3.client("s3")
+    with profile_stage(profiler, "load"):
+        raw, labels = load_series(s3, s3_bucket, s3_csv_key, data_type)
+    with profile_stage(profiler, "features"):
+        engineered = compute_features({key: raw[:, i] for i, key in enumerate(feature_keys)}, names)
+        matrix = np.hstack([raw, engineered])
+        valid = ~np.isnan(matrix).any(axis=1)
+        if horizons:
+            returns, classes = forward_labels(raw[:, feature_keys.index("close")], horizons, flat_threshold)
+            # every horizon keeps the same rows so the sidecar stays aligned whatever the target
+            valid &= ~np.isnan(returns).any(axis=1)
+            labels = classes[:, horizons.index(target_horizon)]
+            returns, classes = returns[valid], classes[valid]
+        matrix, labels = matrix[valid], labels[valid]
+    logger.info(
+        f"Feature columns: {', '.join(f'{i+1}={name}' for i, name in enumerate(feature_keys + names))}; "
+        f"dropped {int((~valid).sum())} warm-up or incomplete rows"
+    )
+
+    with profile_stage(profiler, "upload"), \
+            MultipartWriter(s3, s3_bucket, s3_libsvm_key, part_size=part_size) as writer, \
+            matrix_writer(s3, s3_bucket, s3_libsvm_key, matrix.shape[1], binary_output, part_size) as append_matrices:
+        for start in range(0, len(matrix), SERIES_WRITE_ROWS):
+            end = start + SERIES_WRITE_ROWS
+            writer.write(format_libsvm_rows(labels[start:end], matrix[start:end]))
+            append_matrices(matrix[start:end], labels[start:end])
+    if horizons:
+        row_template = ",".join(["{}"] * 2 * len(horizons)) + "\n"
+        with profile_stage(profiler, "labels"), \
+                MultipartWriter(s3, s3_bucket, labels_key(s3_libsvm_key), part_size=part_size) as writer:
+            writer.write(",".join(label_columns(horizons)) + "\n")
+            for start in range(0, len(matrix), SERIES_WRITE_ROWS):
+                end = start + SERIES_WRITE_ROWS
+                rows = np.hstack([returns[start:end], classes[start:end]]).astype(object)
+                rows[:, len(horizons):] = classes[start:end].tolist()
+                writer.write((row_template * len(rows)).format(*rows.ravel().tolist()))
+        logger.info(f"Labelled horizon {target_horizon} of {horizons}, sidecar at s3://{s3_bucket}/{labels_key(s3_libsvm_key)}")
+    logger.info(f"Feature engineering complete, {len(matrix)} rows written to s3://{s3_bucket}/{s3_libsvm_key}")
+
+
+def object_exists(s3, s3_bucket, key):
+    try:
+        s3.head_object(Bucket=s3_bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+def relabel_matrices(s3, s3_bucket, s3_source_key, s3_libsvm_key, labels, part_size=DEFAULT_PART_SIZE):
+    """
+    Keeps the .npy matrices next to a relabelled libsvm in step with it. Training prefers
+    them over the libsvm, so the labels they hold must be the new ones: the source
+    features are copied (when the key changes) with a rewritten labels array, and stale
+    matrices at a destination whose source has none are deleted.
+    """
+    source_x, _ = binary_paths(s3_source_key)
+    x_key, y_key = binary_paths(s3_libsvm_key)
+    if object_exists(s3, s3_bucket, source_x):
+        if x_key != source_x:
+            s3.copy({"Bucket": s3_bucket, "Key": source_x}, s3_bucket, x_key)
+        with NpyWriter(s3, s3_bucket, y_key, LABEL_DTYPE, part_size=part_size) as writer:
+            writer.append(np.asarray(labels))
+        logger.info(f"Rewrote binary labels at s3://{s3_bucket}/{y_key}")
+    else:
+        s3.delete_objects(
+            Bucket=s3_bucket,
+            Delete={"Objects": [{"Key": x_key}, {"Key": y_key}], "Quiet": True},
+        )
+
+
+def s3_relabel_libsvm(
+    s3_bucket,
+    s3_source_key,
+    s3_libsvm_key,
+    horizon,
+    flat_threshold=DEFAULT_FLAT_THRESHOLD,
+    chunk_rows=STREAM_CHUNK_ROWS,
+    part_size=DEFAULT_PART_SIZE,
+    profiler=None,
+):
+    """
+    Rewrites the labels of a series libsvm from its labels sidecar without touching the
+    source data: the classes for horizon are recomputed from the stored forward returns
+    with flat_threshold, and only the label token of each line changes. Binary matrices
+    next to the libsvm are relabelled too (see relabel_matrices).
+    """
+    s3 = boto3.client("s3")
+    with profile_stage(profiler, "labels"):
+        columns, values = read_labels(s3, s3_bucket, labels_key(s3_source_key))
+        column = f"forward_return_{horizon}"
+        if column not in columns:
+            raise ValueError(f"No forward returns for horizon {horizon} in s3://{s3_bucket}/{labels_key(s3_source_key)}")
+        labels = classify(values[:, columns.index(column)], flat_threshold).tolist()
+
+    rows = 0
+    # the source is streamed through the rewrite, reads and uploads overlap
+    with profile_stage(profiler, "rewrite"), MultipartWriter(s3, s3_bucket, s3_libsvm_key, part_size=part_size) as writer:
+        for chunk in iter_chunks(iter_s3_lines(s3, s3_bucket, s3_source_key), chunk_rows):
+            chunk_labels = labels[rows:rows + len(chunk)]
+            if len(chunk_labels) != len(chunk):
+                raise ValueError("Labels sidecar has fewer rows than the libsvm file")
+            writer.write("".join(f"{label} {line.partition(' ')[2]}\n" for label, line in zip(chunk_labels, chunk)))
+            rows += len(chunk)
+    if rows != len(labels):
+        raise ValueError("Labels sidecar has more rows than the libsvm file")
+    with profile_stage(profiler, "copy"):
+        if s3_libsvm_key != s3_source_key:
+            s3.copy_object(
+                Bucket=s3_bucket,
+                Key=labels_key(s3_libsvm_key),
+                CopySource={"Bucket": s3_bucket, "Key": labels_key(s3_source_key)},
+            )
+        relabel_matrices(s3, s3_bucket, s3_source_key, s3_libsvm_key, labels, part_size)
+    logger.info(f"Relabelled {rows} rows for horizon {horizon} to s3://{s3_bucket}/{s3_libsvm_key}")
+
+
+def parse_feature_names(value):
+    """Parses a comma separated TECHNICAL_FEATURES value, None when unset."""
+    if value is None or not value.strip():
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+BINARY_OUTPUT_MODES = ("buffered", "stream", "series")
+
+FEATURE_ENGINEERING_MODES = {
+    "buffered": s3_csv_to_libsvm,
+    "stream": s3_csv_to_libsvm_streaming,
+    "prefix": s3_prefix_to_libsvm,
+    "ranged": s3_csv_to_libsvm_ranged,
+    "series": s3_series_to_libsvm,
+    "relabel": s3_relabel_libsvm,
+}
+
+
 def main():
     try:
-        s3_bucket = os.environ["S3_BUCKET"]
-        s3_csv_key = os.environ["S3_CSV_KEY"]
-        s3_libsvm_key = os.environ["S3_LIBSVM_KEY"]
-        data_type = os.environ.get("DATA_TYPE", "order")
-        s3_csv_to_libsvm(s3_bucket, s3_csv_key, s3_libsvm_key, data_type=data_type)
+        profiler = StageProfiler("feature_engineering")
+        with profiler.stage("config"):
+            s3_bucket = os.environ["S3_BUCKET"]
+            s3_csv_key = os.environ["S3_CSV_KEY"]
+            s3_libsvm_key = os.environ["S3_LIBSVM_KEY"]
+            data_type = os.environ.get("DATA_TYPE", "order")
+            mode = os.environ.get("FEATURE_ENGINEERING_MODE", "buffered")
+            engine = os.environ.get("CONVERSION_ENGINE", "vectorized")
+            if mode not in FEATURE_ENGINEERING_MODES:
+                raise ValueError(f"Unsupported FEATURE_ENGINEERING_MODE: {mode}")
+            get_engine(engine)
+            options = {"data_type": data_type, "engine": engine}
+            flat_threshold = float(os.environ.get("LABEL_FLAT_THRESHOLD") or DEFAULT_FLAT_THRESHOLD)
+            target_horizon = int(os.environ["LABEL_TARGET_HORIZON"]) if os.environ.get("LABEL_TARGET_HORIZON") else None
+            if mode == "series":
+                # S3_CSV_KEY is an object key or a product prefix
+                options = {
+                    "data_type": data_type,
+                    "features": parse_feature_names(os.environ.get("TECHNICAL_FEATURES")),
+                    "horizons": parse_horizons(os.environ.get("LABEL_HORIZONS")),
+                    "target_horizon": target_horizon,
+                    "flat_threshold": flat_threshold,
+                }
+            elif mode == "relabel":
+                # S3_CSV_KEY is the series libsvm to relabel, S3_LIBSVM_KEY the output
+                if target_horizon is None:
+                    raise ValueError("LABEL_TARGET_HORIZON is required to relabel")
+                options = {"horizon": target_horizon, "flat_threshold": flat_threshold}
+            elif mode == "prefix":
+                # S3_CSV_KEY is the product prefix, S3_LIBSVM_KEY the output key or shard prefix
+                options["output_layout"] = os.environ.get("OUTPUT_LAYOUT", "concatenated")
+                options["incremental"] = os.environ.get("INCREMENTAL", "false").lower() == "true"
+            if os.environ.get("BINARY_OUTPUT", "false").lower() == "true":
+                if mode not in BINARY_OUTPUT_MODES:
+                    raise ValueError(f"BINARY_OUTPUT is not supported by the {mode} mode")
+                options["binary_output"] = True
+        # each mode profiles its own stages, see the mode functions
+        FEATURE_ENGINEERING_MODES[mode](s3_bucket, s3_csv_key, s3_libsvm_key, profiler=profiler, **options)
+        profiler.log_summary()
     except Exception as e:
         logger.error(f"Feature engineering failed: {e}")
         sys.exit(1)
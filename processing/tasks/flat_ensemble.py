@@ -0,0 +1,179 @@
+"""
+Tree ensembles compiled to flat NumPy arrays.
+
+The nodes of every tree of a fitted forest are concatenated into global arrays
+(split feature, threshold, children and per-node class probabilities), saved as one
+.npy file each and memory-mapped on load. Prediction walks all trees for a batch at
+once with array gathers, one step per tree level, with none of sklearn's per-call
+validation or object graph. It reproduces RandomForestClassifier/ExtraTreesClassifier
+predict_proba: inputs are compared as float32, as sklearn's trees do, and tree
+probabilities are added up in tree order. Only NumPy is imported, so a predictor
+loads without paying for sklearn's import.
+"""
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from tasks.s3_io import transfer_config
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+FLATTENABLE = ("RandomForestClassifier", "ExtraTreesClassifier")
+ARRAYS = ("feature", "threshold", "children_left", "children_right", "missing_left", "value", "roots")
+META_FILE = "meta.json"
+# rows walked at once, small enough for the node index arrays to stay in cache
+BATCH_ROWS = 2048
+
+
+def can_flatten(model):
+    """Whether model is a fitted single-output forest classifier FlatEnsemble.compile accepts."""
+    return (
+        type(model).__name__ in FLATTENABLE
+        and hasattr(model, "estimators_")
+        and len(model.estimators_) > 0
+        and getattr(model, "n_outputs_", 1) == 1
+    )
+
+
+class FlatEnsemble:
+    def __init__(self, arrays, meta):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.classes_ = np.asarray(meta["classes"])
+        self.n_features_in_ = meta["n_features"]
+        self.has_missing = bool(np.any(self.missing_left))
+
+    @classmethod
+    def compile(cls, model):
+        """Flattens a fitted single-output RandomForestClassifier or ExtraTreesClassifier."""
+        if not can_flatten(model):
+            raise ValueError(f"Cannot flatten a {type(model).__name__}, only fitted single-output forests are supported")
+        n_classes = len(model.classes_)
+        parts = {name: [] for name in ARRAYS if name != "roots"}
+        roots = []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            leaf = tree.children_left < 0
+            roots.append(offset)
+            # leaves point at themselves so the walk can keep stepping until the deepest tree ends
+            own = np.arange(offset, offset + tree.node_count, dtype=np.int64)
+            parts["children_left"].append(np.where(leaf, own, tree.children_left + offset))
+            parts["children_right"].append(np.where(leaf, own, tree.children_right + offset))
+            parts["feature"].append(np.where(leaf, 0, tree.feature))
+            parts["threshold"].append(tree.threshold)
+            # trees fitted with missing value support record where NaN goes, older ones send it right
+            missing = getattr(tree, "missing_go_to_left", None)
+            parts["missing_left"].append(np.zeros(tree.node_count, dtype=bool) if missing is None else np.asarray(missing, dtype=bool))
+            # the normalisation DecisionTreeClassifier.predict_proba applies
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            parts["value"].append(value / normalizer)
+            offset += tree.node_count
+        arrays = {
+            "feature": np.concatenate(parts["feature"]).astype(np.int32),
+            "threshold": np.concatenate(parts["threshold"]).astype(np.float64),
+            "children_left": np.concatenate(parts["children_left"]).astype(np.int64),
+            "children_right": np.concatenate(parts["children_right"]).astype(np.int64),
+            "missing_left": np.concatenate(parts["missing_left"]),
+            "value": np.concatenate(parts["value"]),
+            "roots": np.asarray(roots, dtype=np.int64),
+        }
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "estimator": type(model).__name__,
+            "n_trees": len(model.estimators_),
+            "n_features": int(model.n_features_in_),
+            "max_depth": int(max(estimator.tree_.max_depth for estimator in model.estimators_)),
+            "classes": model.classes_.tolist(),
+        }
+        return cls(arrays, meta)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump(self.meta, f)
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """Loads a saved ensemble, memory-mapping its arrays by default so start-up reads almost nothing."""
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat ensemble format: {meta.get('format_version')}")
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(arrays, meta)
+
+    def _predict_batch(self, X):
+        n_rows = X.shape[0]
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * X.shape[1])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.meta["max_depth"]):
+            x = flat_X.take(row_offsets + self.feature.take(node))
+            go_left = x <= self.threshold.take(node)
+            if self.has_missing:
+                go_left |= np.isnan(x) & self.missing_left.take(node)
+            node = np.where(go_left, self.children_left.take(node), self.children_right.take(node))
+        leaves = self.value.take(node, axis=0)
+        proba = np.zeros((n_rows, leaves.shape[2]), dtype=np.float64)
+        for t in range(leaves.shape[1]):
+            proba += leaves[:, t]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict_proba(self, X):
+        if hasattr(X, "toarray"):
+            X = X.toarray()
+        # sklearn's trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        if X.shape[0] <= BATCH_ROWS:
+            return self._predict_batch(X)
+        return np.vstack([self._predict_batch(X[start:start + BATCH_ROWS]) for start in range(0, X.shape[0], BATCH_ROWS)])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _files():
+    return [f"{name}.npy" for name in ARRAYS] + [META_FILE]
+
+
+def upload_flat_model(s3_client, bucket, prefix, directory):
+    """Uploads a saved ensemble's files under prefix, concurrently."""
+    config = transfer_config()
+    with ThreadPoolExecutor(max_workers=len(_files())) as executor:
+        uploads = [
+            executor.submit(s3_client.upload_file, os.path.join(directory, name), bucket, f"{prefix.rstrip('/')}/{name}", Config=config)
+            for name in _files()
+        ]
+        for upload in uploads:
+            upload.result()
+    return prefix
+
+
+def download_flat_model(s3_client, bucket, prefix, directory):
+    """Downloads a flat ensemble from prefix into directory, concurrently."""
+    os.makedirs(directory, exist_ok=True)
+    config = transfer_config()
+    with ThreadPoolExecutor(max_workers=len(_files())) as executor:
+        downloads = [
+            executor.submit(s3_client.download_file, bucket, f"{prefix.rstrip('/')}/{name}", os.path.join(directory, name), Config=config)
+            for name in _files()
+        ]
+        for download in downloads:
+            download.result()
+    return directory
@@ -0,0 +1,292 @@
+"""
+Out-of-core training over datasets too large for task memory.
+
+Training shards are streamed from S3 a chunk of rows at a time and fed to estimators
+that learn incrementally: partial_fit models (SGD, Gaussian naive Bayes, a mini-batch
+MLP) or a random forest grown with warm_start, a few trees per chunk. Peak memory is
+bounded by the chunk size (MAX_CARRY_CHUNKS chunks for the forest, which holds back
+chunks missing a class). Train metrics are scored on a uniform sample of the rows kept
+while the last epoch streams by, and validation metrics come from a score histogram
+filled chunk by chunk, so evaluation memory does not grow with the dataset either.
+"""
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from scipy import sparse
+from sklearn.datasets import load_svmlight_file
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neural_network import MLPClassifier
+
+from tasks.evaluation import CURVE_THRESHOLDS, ScoreHistogram, binary_metrics
+from tasks.matrix_io import FEATURE_DTYPE, binary_paths
+from tasks.profiling import StageClock
+from tasks.s3_io import iter_chunks, iter_s3_lines, transfer_config
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 50000
+DEFAULT_TREES_PER_CHUNK = 10
+DEFAULT_CLASSES = (0, 1)
+# chunks a warm-start forest holds back while waiting for every class, at most
+MAX_CARRY_CHUNKS = 4
+
+# name -> (factory taking the hyperparams, whether chunks must be dense)
+INCREMENTAL_ESTIMATORS = {
+    "sgd": (
+        lambda params: SGDClassifier(loss="log_loss", random_state=params.get("random_state", 42)),
+        False,
+    ),
+    "naive_bayes": (lambda params: GaussianNB(), True),
+    "mlp": (
+        lambda params: MLPClassifier(hidden_layer_sizes=(64,), random_state=params.get("random_state", 42)),
+        False,
+    ),
+    "random_forest": (
+        lambda params: RandomForestClassifier(
+            n_estimators=0,
+            max_depth=params.get("max_depth", 5),
+            random_state=params.get("random_state", 42),
+            warm_start=True,
+            n_jobs=-1,
+        ),
+        False,
+    ),
+}
+
+
+def create_incremental_estimator(name, hyperparams):
+    """Returns (estimator, dense) for an INCREMENTAL_ESTIMATORS name."""
+    if name not in INCREMENTAL_ESTIMATORS:
+        raise ValueError(f"Unsupported incremental estimator: {name}")
+    factory, dense = INCREMENTAL_ESTIMATORS[name]
+    return factory(hyperparams), dense
+
+
+def parse_classes(value):
+    """Parses a comma separated INCREMENTAL_CLASSES value, the binary up/down classes when unset."""
+    if value is None or not value.strip():
+        return np.array(DEFAULT_CLASSES)
+    return np.array(sorted(int(c) for c in value.split(",") if c.strip()))
+
+
+def list_shards(s3_client, bucket, prefix):
+    """
+    Returns the libsvm shard keys under prefix in key order. Per-segment shards that
+    feature engineering keeps under <key>.shards/ next to a concatenated file are
+    skipped, their rows are already in it.
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    keys = set()
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.update(obj["Key"] for obj in page.get("Contents", []))
+    shards = sorted(key for key in keys if key.endswith(".libsvm"))
+    concatenated = [f"{key}.shards/" for key in shards]
+    shards = [key for key in shards if not any(key.startswith(parent) for parent in concatenated)]
+    binary = {key for key in shards if all(path in keys for path in binary_paths(key))}
+    return [(key, key in binary) for key in shards]
+
+
+def parse_libsvm_lines(lines, n_features=None):
+    """Parses a chunk of libsvm lines into (X, y), padded to n_features columns when given."""
+    X, y = load_svmlight_file(io.BytesIO("\n".join(lines).encode("utf-8")), n_features=n_features, dtype=FEATURE_DTYPE)
+    # file objects parse with 64-bit indices, which the linear models reject
+    X.indices = X.indices.astype(np.int32, copy=False)
+    X.indptr = X.indptr.astype(np.int32, copy=False)
+    return X, y
+
+
+def iter_binary_chunks(s3_client, bucket, key, chunk_rows):
+    """
+    Yields (X, y) chunks from the .npy matrices next to a libsvm key. They are downloaded
+    to local disk and memory-mapped, only the rows of the current chunk are paged in.
+    """
+    directory = tempfile.mkdtemp(prefix="shard-")
+    try:
+        local = os.path.join(directory, "shard.libsvm")
+        config = transfer_config()
+        for remote, path in zip(binary_paths(key), binary_paths(local)):
+            s3_client.download_file(bucket, remote, path, Config=config)
+        x_path, y_path = binary_paths(local)
+        X = np.load(x_path, mmap_mode="r")
+        y = np.load(y_path, mmap_mode="r")
+        for start in range(0, X.shape[0], chunk_rows):
+            yield np.asarray(X[start:start + chunk_rows]), np.asarray(y[start:start + chunk_rows])
+        del X, y
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class ShardStream:
+    """
+    Re-iterable stream of (X, y) chunks over every shard under an S3 prefix. The
+    feature count is fixed by the first chunk (or n_features) so sparse libsvm chunks
+    always have the same width. Time spent downloading and parsing chunks, over every
+    pass, adds up in the download_clock and parse_clock StageClocks.
+    """
+
+    def __init__(self, s3_client, bucket, prefix, chunk_rows=DEFAULT_CHUNK_ROWS, n_features=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.chunk_rows = chunk_rows
+        self.n_features = n_features
+        self.download_clock = StageClock()
+        self.parse_clock = StageClock()
+        self.shards = list_shards(s3_client, bucket, prefix)
+        if not self.shards:
+            raise ValueError(f"No libsvm shards under s3://{bucket}/{prefix}")
+
+    def __iter__(self):
+        for key, binary in self.shards:
+            if binary:
+                chunks = self.download_clock.iterate(iter_binary_chunks(self.s3_client, self.bucket, key, self.chunk_rows))
+            else:
+                lines = (line for line in iter_s3_lines(self.s3_client, self.bucket, key) if line.strip())
+                # parsed lazily so every chunk after the first is padded to the same width
+                chunks = (
+                    self._parse(chunk)
+                    for chunk in self.download_clock.iterate(iter_chunks(lines, self.chunk_rows))
+                )
+            for X, y in chunks:
+                if self.n_features is None:
+                    self.n_features = X.shape[1]
+                elif X.shape[1] != self.n_features:
+                    raise ValueError(f"Shard {key} has {X.shape[1]} features, expected {self.n_features}")
+                yield X, y
+
+    def _parse(self, lines):
+        with self.parse_clock.measure():
+            return parse_libsvm_lines(lines, self.n_features)
+
+
+def _prepare(X, dense):
+    return X.toarray() if dense and sparse.issparse(X) else X
+
+
+def fit_chunk(model, X, y, classes, trees_per_chunk=DEFAULT_TREES_PER_CHUNK):
+    """Updates model with one chunk: partial_fit, or a new batch of trees for warm-start forests."""
+    if isinstance(model, RandomForestClassifier):
+        model.n_estimators = len(getattr(model, "estimators_", [])) + trees_per_chunk
+        model.fit(X, y)
+    else:
+        model.partial_fit(X, y, classes=classes)
+    return model
+
+
+def _stack(top, bottom):
+    """Stacks two chunks, as CSR when either is sparse (libsvm and .npy shards can be mixed)."""
+    if sparse.issparse(top) or sparse.issparse(bottom):
+        return sparse.vstack([sparse.csr_matrix(top), sparse.csr_matrix(bottom)]).tocsr()
+    return np.vstack([top, bottom])
+
+
+class RowReservoir:
+    """
+    Uniform sample of at most size rows from a stream of chunks, every row when size is
+    None. Each row draws a random key and the size smallest keys are kept, so memory is
+    bounded by size plus one chunk.
+    """
+
+    def __init__(self, size, random_state=42):
+        self.size = size
+        self.rng = np.random.RandomState(random_state)
+        self.X = self.y = self.keys = None
+        self.seen = 0
+
+    def add(self, X, y):
+        self.seen += X.shape[0]
+        keys = self.rng.random_sample(X.shape[0])
+        y = np.asarray(y)
+        if self.X is not None:
+            X = _stack(self.X, X)
+            y = np.concatenate([self.y, y])
+            keys = np.concatenate([self.keys, keys])
+        if self.size is not None and len(keys) > self.size:
+            # sorted so the sample keeps the stream order
+            keep = np.sort(np.argpartition(keys, self.size)[:self.size])
+            X, y, keys = X[keep], y[keep], keys[keep]
+        self.X, self.y, self.keys = X, y, keys
+
+
+def train_incremental(
+    model, chunks, classes, dense=False, epochs=1, trees_per_chunk=DEFAULT_TREES_PER_CHUNK, sample=None, fit_clock=None,
+):
+    """
+    Trains model over a re-iterable stream of (X, y) chunks. When sample (a RowReservoir)
+    is given, the rows of the last epoch are offered to it for the train metrics. The
+    time spent on each chunk, reading it aside, adds up in fit_clock when given.
+    :return: (model, number of training rows seen in one epoch).
+    """
+    needs_all_classes = isinstance(model, RandomForestClassifier)
+    fit_clock = fit_clock or StageClock()
+    n_rows = 0
+    for epoch in range(epochs):
+        carry = None
+        carried_chunks = 0
+        n_rows = 0
+        for X, y in chunks:
+            with fit_clock.measure():
+                n_rows += X.shape[0]
+                if sample is not None and epoch == epochs - 1:
+                    sample.add(X, y)
+                X = _prepare(X, dense)
+                if needs_all_classes:
+                    # every batch of trees must see every class or their outputs would not line up
+                    if carry is not None:
+                        X = _stack(carry[0], X)
+                        y = np.concatenate([carry[1], y])
+                        carry = None
+                    carried_chunks += 1
+                    if not np.isin(classes, y).all():
+                        if carried_chunks < MAX_CARRY_CHUNKS:
+                            carry = (X, y)
+                        else:
+                            # keeps memory bounded through long one-sided stretches
+                            logger.warning(f"Skipped {X.shape[0]} rows, {carried_chunks} chunks in a row do not cover every class")
+                            carried_chunks = 0
+                        continue
+                    carried_chunks = 0
+                fit_chunk(model, X, y, classes, trees_per_chunk)
+        if carry is not None:
+            logger.warning(f"Skipped {carry[0].shape[0]} trailing rows that do not cover every class")
+        logger.info(f"Epoch {epoch + 1}/{epochs} done over {n_rows} rows")
+    return model, n_rows
+
+
+def evaluate_incremental(model, train_sample, val_chunks, dense=False):
+    """
+    Computes the evaluate_model metrics from the RowReservoir of training rows and one
+    streaming pass over the validation set.
+    """
+    logger.info("📈 Evaluating model...")
+    logger.info(f"Scoring a sample of {len(train_sample.y)} of {train_sample.seen} training rows")
+    train = binary_metrics(train_sample.y, model.predict_proba(_prepare(train_sample.X, dense))[:, 1])
+    histogram = ScoreHistogram()
+    for X, y in val_chunks:
+        histogram.add(y, model.predict_proba(_prepare(X, dense))[:, 1])
+    val = histogram.metrics(curve_thresholds=CURVE_THRESHOLDS)
+    metrics = {
+        "train_accuracy": train["accuracy"],
+        "val_accuracy": val["accuracy"],
+        "train_auc": train["auc"],
+        "val_auc": val["auc"],
+        "confusion_matrix": val["confusion_matrix"],
+        "threshold_curve": val["threshold_curve"],
+        "train_samples_scored": train["samples"],
+        "best_iteration": None,
+        "validation_samples": val["samples"],
+    }
+    logger.info(f"  Train Accuracy: {metrics['train_accuracy']:.4f}")
+    logger.info(f"  Validation Accuracy: {metrics['val_accuracy']:.4f}")
+    logger.info(f"  Train AUC: {metrics['train_auc']}")
+    logger.info(f"  Validation AUC: {metrics['val_auc']}")
+    return metrics
@@ -0,0 +1,55 @@
+"""
+Forward-looking labels computed over a whole series with shifted arrays.
+
+Classes follow the trend encoding used at ingest (down=0, up=1). The flat class (2)
+for moves no larger than a threshold is opt-in: with the default threshold of 0 the
+labels stay binary, which is what training and evaluation expect unless they are
+given the class set (INCREMENTAL_CLASSES for the out-of-core trainer).
+"""
+import numpy as np
+
+DOWN, UP, FLAT = 0, 1, 2
+DEFAULT_HORIZONS = (1, 5, 15)
+DEFAULT_FLAT_THRESHOLD = 0.0
+
+
+def forward_returns(close, horizon):
+    """Return from each bar's close to the close horizon bars later, NaN where the series ends."""
+    out = np.full_like(close, np.nan, dtype=np.float64)
+    if horizon < len(close):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:len(close) - horizon] = close[horizon:] / close[:len(close) - horizon] - 1.0
+    return out
+
+
+def classify(returns, flat_threshold=DEFAULT_FLAT_THRESHOLD):
+    """Maps returns to up/down classes, flat too when flat_threshold > 0, -1 where the return is undefined."""
+    labels = np.where(returns > 0, UP, DOWN)
+    if flat_threshold > 0:
+        labels[np.abs(returns) <= flat_threshold] = FLAT
+    labels[np.isnan(returns)] = -1
+    return labels
+
+
+def forward_labels(close, horizons=DEFAULT_HORIZONS, flat_threshold=DEFAULT_FLAT_THRESHOLD):
+    """
+    Computes forward returns and classes for every horizon at once.
+    :return: (returns, labels) matrices of shape (rows, len(horizons)), one column per horizon.
+    """
+    returns = np.column_stack([forward_returns(close, h) for h in horizons]) if horizons else np.empty((len(close), 0))
+    return returns, classify(returns, flat_threshold)
+
+
+def parse_horizons(value):
+    """Parses a comma separated LABEL_HORIZONS value, None when unset."""
+    if value is None or not value.strip():
+        return None
+    horizons = [int(h) for h in value.split(",") if h.strip()]
+    if any(h <= 0 for h in horizons):
+        raise ValueError(f"Label horizons must be positive: {value}")
+    return horizons
+
+
+def label_columns(horizons):
+    """Column names of the labels sidecar, returns first then classes."""
+    return [f"forward_return_{h}" for h in horizons] + [f"label_{h}" for h in horizons]
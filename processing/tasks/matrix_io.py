@@ -0,0 +1,112 @@
+import io
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from botocore.exceptions import ClientError
+from tasks.s3_io import DEFAULT_PART_SIZE, MultipartWriter, READ_CHUNK_SIZE, transfer_config
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEATURE_DTYPE = np.float32
+LABEL_DTYPE = np.int32
+
+
+def binary_paths(libsvm_path):
+    """Returns the (features, labels) .npy paths or keys that sit next to a libsvm path or key."""
+    stem = libsvm_path[:-len(".libsvm")] if libsvm_path.endswith(".libsvm") else libsvm_path
+    return f"{stem}.X.npy", f"{stem}.y.npy"
+
+
+class NpyWriter:
+    """
+    Writes a .npy array to S3 from row chunks. The header needs the final row count,
+    so rows are spooled to a local temporary file and uploaded in parts on close,
+    keeping memory bounded by the part size.
+    """
+
+    def __init__(self, s3_client, bucket, key, dtype, columns=None, part_size=DEFAULT_PART_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.dtype = np.dtype(dtype)
+        self.columns = columns
+        self.part_size = part_size
+        self.rows = 0
+        self._spool = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._spool.close()
+        return False
+
+    def append(self, array):
+        array = np.ascontiguousarray(array, dtype=self.dtype)
+        expected = 1 if self.columns is None else 2
+        if array.ndim != expected or (self.columns is not None and array.shape[1] != self.columns):
+            raise ValueError(f"Expected rows of {self.columns or 'scalars'}, got shape {array.shape}")
+        self._spool.write(array.tobytes())
+        self.rows += len(array)
+
+    def close(self):
+        shape = (self.rows,) if self.columns is None else (self.rows, self.columns)
+        self._spool.seek(0)
+        with MultipartWriter(self.s3_client, self.bucket, self.key, part_size=self.part_size) as writer:
+            writer.write(_npy_header(self.dtype, shape))
+            for chunk in iter(lambda: self._spool.read(READ_CHUNK_SIZE), b""):
+                writer.write(chunk)
+        self._spool.close()
+
+
+def _npy_header(dtype, shape):
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        buffer, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape}
+    )
+    return buffer.getvalue()
+
+
+def load_binary(libsvm_path):
+    """
+    Memory-maps the .npy matrices next to libsvm_path, pages are read lazily.
+    Returns (X, y), or None when they are not there and libsvm has to be parsed.
+    """
+    x_path, y_path = binary_paths(libsvm_path)
+    if not (os.path.exists(x_path) and os.path.exists(y_path)):
+        return None
+    X = np.load(x_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    logger.info(f"Memory-mapped {x_path} {X.shape} {X.dtype}")
+    return X, y
+
+
+def download_matrices(s3_client, bucket, libsvm_key, local_libsvm_path, config=None):
+    """
+    Downloads the binary matrices for libsvm_key when feature engineering wrote them,
+    otherwise the libsvm file itself. Either way the data can then be loaded from
+    local_libsvm_path with load_binary, falling back to load_svmlight_file.
+    """
+    config = config or transfer_config()
+    local_paths = binary_paths(local_libsvm_path)
+    try:
+        for key, path in zip(binary_paths(libsvm_key), local_paths):
+            s3_client.download_file(bucket, key, path, Config=config)
+        return local_libsvm_path
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "403"):
+            raise
+        for path in local_paths:
+            if os.path.exists(path):
+                os.remove(path)
+    logger.info(f"No binary matrices for s3://{bucket}/{libsvm_key}, using libsvm")
+    s3_client.download_file(bucket, libsvm_key, local_libsvm_path, Config=config)
+    return local_libsvm_path
@@ -0,0 +1,133 @@
+"""
+Model artifact formats and the ETag-keyed local model cache.
+
+"mmap" artifacts are uncompressed joblib files; their NumPy arrays are memory-mapped
+on load instead of read and copied. "compressed" artifacts are gzip joblib files,
+smaller to store and transfer but fully decompressed on load. The format is told
+apart by the file suffix, so a model key alone says how to load it.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+
+from botocore.exceptions import ClientError
+from tasks.s3_io import READ_CHUNK_SIZE
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# format -> (file suffix, joblib compress argument)
+ARTIFACT_FORMATS = {
+    "mmap": (".joblib", 0),
+    "compressed": (".joblib.gz", ("gzip", 3)),
+}
+DEFAULT_ARTIFACT_FORMAT = "mmap"
+COMPRESSED_SUFFIXES = (".z", ".gz", ".bz2", ".xz", ".lzma", ".lz4")
+MODEL_FILE = "model"
+META_FILE = "meta.json"
+
+
+def artifact_suffix(artifact_format):
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(f"Unsupported model artifact format: {artifact_format}")
+    return ARTIFACT_FORMATS[artifact_format][0]
+
+
+def artifact_compression(artifact_format):
+    artifact_suffix(artifact_format)
+    return ARTIFACT_FORMATS[artifact_format][1]
+
+
+def mmap_mode_for(name):
+    """The joblib mmap_mode for an artifact file or key name: read-only maps unless it is compressed."""
+    return None if name.endswith(COMPRESSED_SUFFIXES) else "r"
+
+
+def load_artifact(path, name=None):
+    """Loads a joblib model; name is the artifact's key when path does not carry its suffix."""
+    return joblib.load(path, mmap_mode=mmap_mode_for(name or path))
+
+
+def _etag(value):
+    return value.strip('"')
+
+
+class ModelCache:
+    """
+    Keeps downloaded models on a local volume keyed by S3 object, revalidated with a
+    conditional GET (If-None-Match on the cached ETag): an unchanged model costs one
+    304 response and no transfer. Models loaded in this process are kept as well, so
+    scoring with the same model again skips deserialization entirely.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._loaded = {}
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Builds the cache from MODEL_CACHE_DIR, None when it is unset."""
+        directory = os.environ.get("MODEL_CACHE_DIR")
+        return cls(directory) if directory else None
+
+    def _entry_dir(self, bucket, key):
+        return os.path.join(self.directory, hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest())
+
+    def _cached_etag(self, entry):
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                return json.load(f)["etag"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def fetch(self, s3_client, bucket, key):
+        """
+        Returns (local path, ETag) of the current model at s3://bucket/key, downloading it
+        only when the cached copy is missing or out of date.
+        """
+        entry = self._entry_dir(bucket, key)
+        cached_etag = self._cached_etag(entry)
+        request = {"Bucket": bucket, "Key": key}
+        if cached_etag:
+            request["IfNoneMatch"] = f'"{cached_etag}"'
+        try:
+            response = s3_client.get_object(**request)
+        except ClientError as e:
+            if cached_etag and e.response["Error"]["Code"] in ("304", "NotModified"):
+                logger.info(f"Model cache hit for s3://{bucket}/{key} ({cached_etag})")
+                return os.path.join(entry, MODEL_FILE), cached_etag
+            raise
+        etag = _etag(response["ETag"])
+        logger.info(f"Model cache miss for s3://{bucket}/{key}, downloading {etag}")
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".staging-")
+        try:
+            with open(os.path.join(staging, MODEL_FILE), "wb") as f:
+                shutil.copyfileobj(response["Body"], f, READ_CHUNK_SIZE)
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump({"bucket": bucket, "key": key, "etag": etag, "created_at": time.time()}, f)
+            # rename is atomic, readers never see a half written model
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.rename(staging, entry)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return os.path.join(entry, MODEL_FILE), etag
+
+    def load(self, s3_client, bucket, key):
+        """Returns the current model at s3://bucket/key, reusing the one already loaded when its ETag still matches."""
+        path, etag = self.fetch(s3_client, bucket, key)
+        loaded = self._loaded.get((bucket, key))
+        if loaded is not None and loaded[0] == etag:
+            return loaded[1]
+        model = load_artifact(path, name=key)
+        self._loaded[(bucket, key)] = (etag, model)
+        return model
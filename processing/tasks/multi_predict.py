@@ -0,0 +1,167 @@
+"""
+Batch prediction for many products in one task.
+
+A manifest lists the jobs, one per product: the model (a joblib key or a flat model
+prefix), the input shards and where to write the predictions. Models are downloaded
+on threads in the parent process, and each job goes to a process pool as soon as its
+model is on local disk, so downloads overlap the scoring of jobs already running.
+Workers keep every model they load, a model shared by several jobs is loaded once
+per worker. Each job streams its input like PREDICTION_MODE=stream.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import boto3
+
+from tasks.batch_predict import DEFAULT_CHUNK_ROWS, DEFAULT_KEY_COLUMN, predict_to_s3
+from tasks.flat_ensemble import FlatEnsemble, download_flat_model
+from tasks.model_artifacts import load_artifact
+from tasks.s3_io import client_config, transfer_config
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_WORKERS = 4
+MODEL_FIELDS = ("model_s3_key", "flat_model_s3_prefix")
+
+# per worker process: the S3 client and every model loaded so far, by local path
+_worker_s3 = None
+_worker_models = {}
+
+
+def parse_manifest(text, output_format="npy"):
+    """
+    Parses a JSON list of jobs, each with product_id, input_s3_key and either
+    model_s3_key or flat_model_s3_prefix. output_s3_key defaults to
+    <input_s3_key>.predictions.<output_format>.
+    """
+    jobs = json.loads(text)
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError("The prediction manifest must be a non-empty JSON list of jobs")
+    for i, job in enumerate(jobs):
+        missing = [field for field in ("product_id", "input_s3_key") if not job.get(field)]
+        if missing:
+            raise ValueError(f"Manifest job {i} is missing {', '.join(missing)}")
+        if sum(bool(job.get(field)) for field in MODEL_FIELDS) != 1:
+            raise ValueError(f"Manifest job {i} needs exactly one of {', '.join(MODEL_FIELDS)}")
+        job.setdefault("output_s3_key", f"{job['input_s3_key'].rstrip('/')}.predictions.{output_format}")
+    return jobs
+
+
+def load_manifest(s3_client, bucket, manifest=None, manifest_s3_key=None, output_format="npy"):
+    """Parses the inline manifest, or the one stored at s3://bucket/manifest_s3_key."""
+    if manifest_s3_key:
+        manifest = s3_client.get_object(Bucket=bucket, Key=manifest_s3_key)["Body"].read().decode("utf-8")
+    if not manifest:
+        raise ValueError("PREDICTION_MANIFEST or PREDICTION_MANIFEST_S3_KEY is required")
+    return parse_manifest(manifest, output_format)
+
+
+def model_ref(job):
+    """(kind, S3 key or prefix) of a job's model, "flat" or "joblib"."""
+    if job.get("flat_model_s3_prefix"):
+        return "flat", job["flat_model_s3_prefix"]
+    return "joblib", job["model_s3_key"]
+
+
+def fetch_model(s3_client, bucket, ref, directory, cache=None):
+    """
+    Downloads a model to directory, or through the model cache when given.
+    Returns (kind, local path, S3 key or prefix) for load_worker_model.
+    """
+    kind, key = ref
+    if kind == "flat":
+        local = os.path.join(directory, hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest())
+        return kind, download_flat_model(s3_client, bucket, key, local), key
+    if cache is not None:
+        return kind, cache.fetch(s3_client, bucket, key)[0], key
+    local = os.path.join(directory, hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest())
+    s3_client.download_file(bucket, key, local, Config=transfer_config())
+    return kind, local, key
+
+
+def load_worker_model(local_model):
+    """Loads a fetched model, once per worker process."""
+    kind, path, key = local_model
+    if path not in _worker_models:
+        _worker_models[path] = FlatEnsemble.load(path) if kind == "flat" else load_artifact(path, name=key)
+    return _worker_models[path]
+
+
+def _worker_client():
+    global _worker_s3
+    if _worker_s3 is None:
+        _worker_s3 = boto3.client("s3", config=client_config())
+    return _worker_s3
+
+
+def run_job(bucket, job, local_model, output_format="npy", chunk_rows=DEFAULT_CHUNK_ROWS, key_column=DEFAULT_KEY_COLUMN):
+    """Scores one manifest job. Runs in a pool worker."""
+    start = time.time()
+    model = load_worker_model(local_model)
+    rows = predict_to_s3(
+        _worker_client(), model, bucket, job["input_s3_key"], job["output_s3_key"],
+        output_format=output_format, chunk_rows=chunk_rows, key_column=key_column,
+    )
+    return {"product_id": job["product_id"], "rows": rows, "output_s3_key": job["output_s3_key"], "seconds": time.time() - start}
+
+
+def run_manifest(
+    s3_client,
+    bucket,
+    jobs,
+    directory,
+    max_workers,
+    output_format="npy",
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    key_column=DEFAULT_KEY_COLUMN,
+    cache=None,
+    executor=None,
+):
+    """
+    Runs every job, each submitted as soon as its model is downloaded. A failed job does
+    not stop the others. Returns one result per job in manifest order, with an "error"
+    instead of rows when it failed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    refs = {}
+    for i, job in enumerate(jobs):
+        refs.setdefault(model_ref(job), []).append(i)
+    logger.info(f"🗂️ Predicting {len(jobs)} jobs with {len(refs)} models on {max_workers} workers")
+    # workers are spawned rather than forked, download threads may be holding locks
+    pool = executor or ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    results = [None] * len(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(refs))) as downloads:
+            fetches = {downloads.submit(fetch_model, s3_client, bucket, ref, directory, cache): ref for ref in refs}
+            submitted = {}
+            for fetch in as_completed(fetches):
+                indices = refs[fetches[fetch]]
+                try:
+                    local_model = fetch.result()
+                except Exception as e:
+                    logger.error(f"Error downloading model {fetches[fetch][1]}: {e}")
+                    for i in indices:
+                        results[i] = {"product_id": jobs[i]["product_id"], "error": f"model download failed: {e}"}
+                    continue
+                for i in indices:
+                    submitted[pool.submit(run_job, bucket, jobs[i], local_model, output_format, chunk_rows, key_column)] = i
+        for future in as_completed(submitted):
+            i = submitted[future]
+            try:
+                results[i] = future.result()
+                logger.info(f"✅ {results[i]['product_id']}: {results[i]['rows']} rows in {results[i]['seconds']:.1f}s")
+            except Exception as e:
+                logger.error(f"❌ {jobs[i]['product_id']} failed: {e}")
+                results[i] = {"product_id": jobs[i]["product_id"], "error": str(e)}
+    finally:
+        if executor is None:
+            pool.shutdown()
+    return results
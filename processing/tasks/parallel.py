@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import deque
+from queue import Full, Queue
+
+
+def available_cpus():
+    """
+    Number of vCPUs this task may use. MAX_WORKERS overrides detection, otherwise
+    the scheduler affinity mask is used since it reflects the container's allotment.
+    """
+    override = os.environ.get("MAX_WORKERS")
+    if override:
+        return max(int(override), 1)
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# (limit, usage) files of cgroup v2 and v1; v1 reports an unset limit as a huge number
+CGROUP_MEMORY_FILES = (
+    ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+    ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+)
+UNLIMITED_MEMORY = 1 << 60
+
+
+def available_memory():
+    """
+    Bytes this task can still allocate: the container's cgroup memory limit less its
+    usage when a limit is set, the available physical memory otherwise.
+    """
+    for limit_path, usage_path in CGROUP_MEMORY_FILES:
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read().strip())
+            if limit != "max" and int(limit) < UNLIMITED_MEMORY:
+                return max(int(limit) - usage, 0)
+        except (OSError, ValueError):
+            continue
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def memory_bounded_jobs(n_jobs, bytes_per_job):
+    """Caps n_jobs so that bytes_per_job for every job fits in available_memory(), at least 1."""
+    if bytes_per_job <= 0:
+        return n_jobs
+    return max(1, min(n_jobs, available_memory() // bytes_per_job))
+
+
+def ordered_map(executor, fn, items, window):
+    """
+    Like executor.map, but submits lazily and keeps at most window items in flight,
+    so results are yielded in input order without buffering the whole input.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def prefetch(iterable, depth=2):
+    """
+    Yields the items of iterable while a background thread produces up to depth items
+    ahead, so producing the next item (typically I/O) overlaps consuming this one.
+    Exceptions raised by the producer are re-raised to the consumer.
+    """
+    items = Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # a consumer that stops early releases the producer
+        stop.set()
+        thread.join()
@@ -1,36 +1,98 @@
 import os
 import boto3
-import joblib
 import logging
 import sys
 import json
-from sklearn.datasets import load_svmlight_file
+
+from concurrent.futures import ThreadPoolExecutor
+from tasks.flat_ensemble import FlatEnsemble, download_flat_model
+from tasks.matrix_io import download_matrices
+from tasks.s3_io import client_config, transfer_config
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+LOCAL_MODEL_PATH = "model.joblib"
+LOCAL_FLAT_MODEL_DIR = "flat_model"
+LOCAL_MANIFEST_MODEL_DIR = "models"
+PREDICTION_MODES = ("file", "stream", "manifest")
+
 def download_model(s3_client, bucket, model_s3_key, local_path):
     try:
         logger.info(f"Downloading model from s3://{bucket}/{model_s3_key} ...")
-        s3_client.download_file(bucket, model_s3_key, local_path)
+        s3_client.download_file(bucket, model_s3_key, local_path, Config=transfer_config())
         logger.info("Model downloaded.")
     except Exception as e:
         logger.error(f"Error downloading model: {e}")
         raise
 
-def load_model(local_path):
+def start_prefetch():
+    """
+    Starts the S3 downloads on background threads, so they overlap the joblib/sklearn
+    imports below. The model is fetched when FLAT_MODEL_S3_PREFIX is set, or when
+    MODEL_S3_KEY is set and the model cache is not. The input data is fetched when
+    INPUT_DATA_S3_KEY is set, the dataset cache is not and the input is not streamed.
+    Returns a dict of futures, or None when no model is configured or in manifest mode.
+    """
+    bucket = os.environ.get('S3_BUCKET')
+    model_s3_key = os.environ.get('MODEL_S3_KEY')
+    flat_model_s3_prefix = os.environ.get('FLAT_MODEL_S3_PREFIX')
+    # manifest jobs download their own models
+    if not (bucket and (model_s3_key or flat_model_s3_prefix)) or os.environ.get('PREDICTION_MODE') == 'manifest':
+        return None
+    s3_client = boto3.client('s3', config=client_config())
+    executor = ThreadPoolExecutor(max_workers=2)
+    futures = {}
+    if flat_model_s3_prefix:
+        futures["model"] = executor.submit(download_flat_model, s3_client, bucket, flat_model_s3_prefix, LOCAL_FLAT_MODEL_DIR)
+    elif not os.environ.get("MODEL_CACHE_DIR"):
+        futures["model"] = executor.submit(download_model, s3_client, bucket, model_s3_key, LOCAL_MODEL_PATH)
+    input_data_s3_key = os.environ.get('INPUT_DATA_S3_KEY')
+    # streamed input is read chunk by chunk while predicting
+    streaming = os.environ.get('PREDICTION_MODE') == 'stream'
+    if input_data_s3_key and not streaming and not os.environ.get("DATASET_CACHE_DIR"):
+        input_data_path = os.environ.get('INPUT_DATA_PATH', 'predict.libsvm')
+        futures["input"] = executor.submit(download_matrices, s3_client, bucket, input_data_s3_key, input_data_path)
+    executor.shutdown(wait=False)
+    return futures
+
+PREFETCH = start_prefetch() if __name__ == "__main__" else None
+
+import joblib  # noqa: E402
+from sklearn.datasets import load_svmlight_file  # noqa: E402
+
+from tasks.batch_predict import (  # noqa: E402
+    DEFAULT_CHUNK_ROWS,
+    OUTPUT_FORMATS,
+    parse_key_column,
+    predict_to_s3,
+    score,
+)
+from tasks.dataset_cache import DatasetCache  # noqa: E402
+from tasks.matrix_io import load_binary  # noqa: E402
+from tasks.model_artifacts import ModelCache, mmap_mode_for  # noqa: E402
+from tasks.multi_predict import load_manifest, run_manifest  # noqa: E402
+from tasks.parallel import available_cpus  # noqa: E402
+from tasks.profiling import StageProfiler  # noqa: E402
+
+def load_model(local_path, name=None):
+    """Loads a model artifact; name is its S3 key, whose suffix tells whether it can be memory-mapped."""
     try:
         logger.info(f"Loading model from {local_path} ...")
-        model = joblib.load(local_path)
+        model = joblib.load(local_path, mmap_mode=mmap_mode_for(name or local_path))
         logger.info("Model loaded.")
         return model
     except Exception as e:
         logger.error(f"Error loading model: {e}")
         raise
 
+def load_matrix(local_path):
+    """Memory-maps the binary matrices for local_path when present, otherwise parses libsvm."""
+    return load_binary(local_path) or load_svmlight_file(local_path)
+
 def load_input_data(input_path):
     try:
-        X, y = load_svmlight_file(input_path)
+        X, y = load_matrix(input_path)
         logger.info(f"Loaded {X.shape[0]} samples.")
         return X, y
     except Exception as e:
@@ -50,31 +112,109 @@ def save_predictions(preds, output_path):
 
 def main():
     try:
-        # Environment/config
-        bucket = os.environ['S3_BUCKET']
-        model_s3_key = os.environ['MODEL_S3_KEY']  # e.g. "my/path/to/model.joblib"
-        input_data_path = os.environ.get('INPUT_DATA_PATH', 'predict.libsvm')
-        output_path = os.environ.get('OUTPUT_PATH', 'predictions.txt')
+        profiler = StageProfiler("predict_scikit")
+        with profiler.stage("config"):
+            # Environment/config
+            bucket = os.environ['S3_BUCKET']
+            model_s3_key = os.environ.get('MODEL_S3_KEY')  # e.g. "my/path/to/model.joblib"
+            # e.g. "my/path/trained_model/flat_model", used instead of MODEL_S3_KEY when set
+            flat_model_s3_prefix = os.environ.get('FLAT_MODEL_S3_PREFIX')
+            input_data_path = os.environ.get('INPUT_DATA_PATH', 'predict.libsvm')
+            input_data_s3_key = os.environ.get('INPUT_DATA_S3_KEY')  # optional, read from S3_BUCKET
+            output_path = os.environ.get('OUTPUT_PATH', 'predictions.txt')
+            prediction_mode = os.environ.get('PREDICTION_MODE') or 'file'
+            if prediction_mode not in PREDICTION_MODES:
+                raise ValueError(f"Unsupported PREDICTION_MODE: {prediction_mode}")
+            if prediction_mode != 'manifest' and not (model_s3_key or flat_model_s3_prefix):
+                raise ValueError("MODEL_S3_KEY or FLAT_MODEL_S3_PREFIX is required")
+            if prediction_mode in ('stream', 'manifest'):
+                output_format = os.environ.get('PREDICTION_OUTPUT_FORMAT') or 'npy'
+                if output_format not in OUTPUT_FORMATS:
+                    raise ValueError(f"Unsupported PREDICTION_OUTPUT_FORMAT: {output_format}")
+                chunk_rows = int(os.environ.get('PREDICTION_CHUNK_ROWS') or DEFAULT_CHUNK_ROWS)
+                # rows are keyed by the candle start for DATA_TYPE=candle, by position otherwise
+                key_column = parse_key_column(os.environ.get('PREDICT_KEY_COLUMN'), os.environ.get('DATA_TYPE', 'order'))
+            if prediction_mode == 'stream':
+                # streams every shard under INPUT_DATA_S3_KEY (a key or a prefix) to OUTPUT_S3_KEY
+                output_s3_key = os.environ['OUTPUT_S3_KEY']
+                if not input_data_s3_key:
+                    raise ValueError("PREDICTION_MODE=stream needs INPUT_DATA_S3_KEY")
 
-        s3_client = boto3.client('s3')
-        local_model_path = "model.joblib"
+            s3_client = boto3.client('s3', config=client_config())
+            prefetch = PREFETCH or {}
 
-        # Download model from S3
-        download_model(s3_client, bucket, model_s3_key, local_model_path)
+        if prediction_mode == 'manifest':
+            # one job per product, run on a process pool, see tasks.multi_predict
+            with profiler.stage("manifest"):
+                jobs = load_manifest(
+                    s3_client, bucket, manifest=os.environ.get('PREDICTION_MANIFEST'),
+                    manifest_s3_key=os.environ.get('PREDICTION_MANIFEST_S3_KEY'), output_format=output_format,
+                )
+                results = run_manifest(
+                    s3_client, bucket, jobs, LOCAL_MANIFEST_MODEL_DIR, available_cpus(),
+                    output_format=output_format, chunk_rows=chunk_rows, key_column=key_column,
+                    cache=ModelCache.from_env(),
+                )
+            profiler.log_summary()
+            failed = [result['product_id'] for result in results if 'error' in result]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(jobs)} manifest jobs failed: {', '.join(failed)}")
+            logger.info("Prediction complete!")
+            return
 
-        # Load model
-        model = load_model(local_model_path)
+        model_cache = ModelCache.from_env()
+        if flat_model_s3_prefix:
+            with profiler.stage("download"):
+                if "model" in prefetch:
+                    prefetch["model"].result()
+                else:
+                    download_flat_model(s3_client, bucket, flat_model_s3_prefix, LOCAL_FLAT_MODEL_DIR)
+            with profiler.stage("deserialize"):
+                model = FlatEnsemble.load(LOCAL_FLAT_MODEL_DIR)
+        elif model_cache is not None:
+            # revalidated with a conditional GET, downloaded only when it changed
+            with profiler.stage("load_model"):
+                model = model_cache.load(s3_client, bucket, model_s3_key)
+        else:
+            # Download model from S3, unless it was prefetched while importing
+            with profiler.stage("download"):
+                if "model" in prefetch:
+                    prefetch["model"].result()
+                else:
+                    download_model(s3_client, bucket, model_s3_key, LOCAL_MODEL_PATH)
 
-        # Load input data
-        X, y = load_input_data(input_data_path)
+            # Load model
+            with profiler.stage("deserialize"):
+                model = load_model(LOCAL_MODEL_PATH, name=model_s3_key)
 
-        # Make predictions
-        logger.info("Making predictions ...")
-        if hasattr(model, "predict_proba"):
-            preds = model.predict_proba(X)[:, 1]
+        if prediction_mode == 'stream':
+            with profiler.stage("stream"):
+                predict_to_s3(
+                    s3_client, model, bucket, input_data_s3_key, output_s3_key,
+                    output_format=output_format, chunk_rows=chunk_rows, key_column=key_column,
+                )
         else:
-            preds = model.predict(X)
-        save_predictions(preds, output_path)
+            # Load input data, through the dataset cache when it is configured
+            cache = DatasetCache.from_env()
+            if input_data_s3_key and cache is not None:
+                with profiler.stage("load"):
+                    X, y = cache.fetch(s3_client, bucket, input_data_s3_key, input_data_path, load_matrix)
+            else:
+                with profiler.stage("download"):
+                    if "input" in prefetch:
+                        prefetch["input"].result()
+                    elif input_data_s3_key:
+                        download_matrices(s3_client, bucket, input_data_s3_key, input_data_path)
+                with profiler.stage("parse"):
+                    X, y = load_input_data(input_data_path)
+
+            # Make predictions
+            logger.info("Making predictions ...")
+            with profiler.stage("predict"):
+                preds = score(model, X)
+            with profiler.stage("write"):
+                save_predictions(preds, output_path)
+        profiler.log_summary()
         logger.info("Prediction complete!")
 
     except Exception as e:
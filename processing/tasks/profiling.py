@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+from contextlib import contextmanager, nullcontext
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+_DONE = object()
+
+
+def peak_rss_bytes():
+    """High-water mark of the process resident set size."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time and peak memory of named task stages:
+
+        profiler = StageProfiler("train_scikit")
+        with profiler.stage("fit"):
+            ...
+
+    Each finished stage is logged as a JSON metric line. The RSS high-water mark can
+    not be reset, so a stage reports the mark at its end and how much it raised it.
+    With trace_memory (PROFILE_TRACEMALLOC=true) the peak of Python and NumPy
+    allocations within each stage is traced as well, at some cost in speed.
+    """
+
+    def __init__(self, task, trace_memory=None):
+        self.task = task
+        if trace_memory is None:
+            trace_memory = os.environ.get("PROFILE_TRACEMALLOC", "false").lower() == "true"
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        # tracing slows every allocation down, so it only runs within stages
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        rss_before = peak_rss_bytes()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                "stage": name,
+                "wall_seconds": round(time.perf_counter() - wall, 6),
+                "cpu_seconds": round(time.process_time() - cpu, 6),
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
+            record["peak_rss_increase_bytes"] = record["peak_rss_bytes"] - rss_before
+            if self.trace_memory:
+                record["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            self.stages.append(record)
+            logger.info(json.dumps({"metric": "stage_profile", "task": self.task, **record}))
+
+    def add_clock(self, name, clock):
+        """
+        Records a StageClock as a stage. Its time was summed over many intervals, so
+        the record has the RSS high-water mark but no increase of it.
+        """
+        record = {
+            "stage": name,
+            "wall_seconds": round(clock.wall_seconds, 6),
+            "cpu_seconds": round(clock.cpu_seconds, 6),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+        self.stages.append(record)
+        logger.info(json.dumps({"metric": "stage_profile", "task": self.task, **record}))
+
+    def stage_seconds(self, name):
+        """Wall time spent in stages called name."""
+        return sum(record["wall_seconds"] for record in self.stages if record["stage"] == name)
+
+    def summary(self):
+        return {
+            "task": self.task,
+            "total_wall_seconds": round(time.perf_counter() - self._started, 6),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": list(self.stages),
+        }
+
+    def log_summary(self):
+        summary = self.summary()
+        logger.info(json.dumps({"metric": "task_profile", **summary}))
+        return summary
+
+
+class StageClock:
+    """
+    Wall and CPU time summed over many short intervals, for stages that take turns
+    within one loop, such as downloading, parsing and fitting the chunks of a stream.
+    Added to a StageProfiler with add_clock.
+    """
+
+    def __init__(self):
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    @contextmanager
+    def measure(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.wall_seconds += time.perf_counter() - wall
+            self.cpu_seconds += time.process_time() - cpu
+
+    def iterate(self, iterable):
+        """Yields the items of iterable, measuring the time spent producing each one."""
+        iterator = iter(iterable)
+        while True:
+            with self.measure():
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+
+def profile_stage(profiler, name):
+    """profiler.stage(name), or a no-op context when profiler is None."""
+    return nullcontext() if profiler is None else profiler.stage(name)
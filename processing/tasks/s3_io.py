@@ -0,0 +1,163 @@
+import logging
+import os
+import sys
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects non-final parts smaller than 5 MB
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+PROBE_SIZE = 64 * 1024
+TRANSFER_PART_SIZE = 16 * 1024 * 1024
+TRANSFER_MAX_CONCURRENCY = 16
+
+
+def transfer_config():
+    """
+    TransferConfig for downloading and uploading large objects, tunable with
+    TRANSFER_PART_SIZE (also the multipart threshold) and TRANSFER_MAX_CONCURRENCY.
+    """
+    part_size = int(os.environ.get("TRANSFER_PART_SIZE") or TRANSFER_PART_SIZE)
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=int(os.environ.get("TRANSFER_MAX_CONCURRENCY") or TRANSFER_MAX_CONCURRENCY),
+        use_threads=True,
+    )
+
+
+def client_config(concurrent_transfers=2):
+    """Client config with enough pooled connections for concurrent_transfers tuned transfers."""
+    max_concurrency = int(os.environ.get("TRANSFER_MAX_CONCURRENCY") or TRANSFER_MAX_CONCURRENCY)
+    return Config(max_pool_connections=max_concurrency * concurrent_transfers)
+
+
+class MultipartWriter:
+    """
+    File-like writer that uploads to S3 in parts as data is written, so memory
+    use is bounded by part_size no matter how large the object grows.
+    Objects that never fill a single part are written with one put_object.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size=DEFAULT_PART_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.upload_id = None
+        self.parts = []
+        self.bytes_written = 0
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._upload_part(part)
+
+    def _upload_part(self, data):
+        if self.upload_id is None:
+            response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self.upload_id = response["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def close(self):
+        if self.upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self._buffer = bytearray()
+        logger.info(f"Wrote {self.bytes_written} bytes to s3://{self.bucket}/{self.key} in {max(len(self.parts), 1)} part(s)")
+
+    def abort(self):
+        self._buffer = bytearray()
+        if self.upload_id is not None:
+            logger.warning(f"Aborting multipart upload to s3://{self.bucket}/{self.key}")
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+
+def iter_s3_lines(s3_client, bucket, key, chunk_size=READ_CHUNK_SIZE):
+    """Yields the decoded lines of an S3 object without holding the whole body in memory."""
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    for line in body.iter_lines(chunk_size=chunk_size):
+        yield line.decode("utf-8")
+
+
+def iter_chunks(iterable, size):
+    """Groups an iterable into lists of at most size items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_range(s3_client, bucket, key, start, end):
+    """Returns bytes [start, end) of an S3 object with a ranged GET."""
+    if end <= start:
+        return b""
+    return s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end - 1}")["Body"].read()
+
+
+def next_line_start(s3_client, bucket, key, offset, size, probe_size=PROBE_SIZE):
+    """Returns the offset of the first line that starts at or after offset."""
+    # a line starts at offset when the byte before it is a newline
+    position = offset - 1
+    while position < size:
+        probe = get_range(s3_client, bucket, key, position, min(position + probe_size, size))
+        index = probe.find(b"\n")
+        if index != -1:
+            return position + index + 1
+        position += len(probe)
+        probe_size *= 2
+    return size
+
+
+def line_aligned_ranges(s3_client, bucket, key, size, range_size, executor=None):
+    """
+    Splits an object of size bytes into [start, end) ranges of roughly range_size bytes
+    that start and end on line boundaries. Boundaries are found with small probe GETs,
+    run on executor when one is given.
+    """
+    offsets = range(range_size, size, range_size)
+    mapper = executor.map if executor is not None else map
+    aligned = mapper(lambda offset: next_line_start(s3_client, bucket, key, offset, size), offsets)
+    boundaries = sorted({0, size, *aligned})
+    return list(zip(boundaries[:-1], boundaries[1:]))
@@ -0,0 +1,151 @@
+"""
+Hyperparameter search inside one training task.
+
+Candidates are sampled over the XGBoost-style hyperparameter names get_config uses,
+built through the estimator registry and scored by validation AUC. They run in
+parallel with joblib, which memory-maps the loaded arrays into its worker processes
+rather than copying them. The "halving" strategy is successive halving over training
+rows: every round keeps the best 1/factor of the candidates on factor times the rows.
+"""
+import json
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+
+from joblib import Parallel, delayed
+from scipy.stats import loguniform, randint, uniform
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterSampler
+
+from tasks.estimators import best_iteration, create_estimator, fit_estimator
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEARCH_STRATEGIES = ("random", "halving")
+DEFAULT_CANDIDATES = 20
+DEFAULT_FACTOR = 3
+MIN_HALVING_ROWS = 1000
+
+_FOREST_SPACE = {
+    "n_estimators": randint(50, 300),
+    "max_depth": randint(3, 12),
+    "colsample_bytree": uniform(0.3, 0.7),
+    "min_child_weight": randint(1, 20),
+}
+
+DEFAULT_SEARCH_SPACES = {
+    "random_forest": dict(_FOREST_SPACE, subsample=uniform(0.5, 0.5)),
+    "extra_trees": _FOREST_SPACE,
+    "hist_gradient_boosting": {
+        "learning_rate": loguniform(0.01, 0.3),
+        "max_depth": randint(3, 10),
+        "n_estimators": randint(50, 500),
+    },
+}
+
+
+def parse_search_space(value, estimator):
+    """
+    Returns the search space for estimator: a SEARCH_SPACE JSON object mapping
+    hyperparameter names to lists of values, or the estimator's default distributions.
+    """
+    if value is None or not value.strip():
+        return DEFAULT_SEARCH_SPACES[estimator]
+    space = json.loads(value)
+    if not isinstance(space, dict) or not all(isinstance(v, list) and v for v in space.values()):
+        raise ValueError("SEARCH_SPACE must map hyperparameter names to non-empty lists")
+    return space
+
+
+def _plain(params):
+    """Converts sampled NumPy scalars to Python values so candidates serialize to JSON."""
+    return {name: value.item() if isinstance(value, np.generic) else value for name, value in params.items()}
+
+
+def sample_candidates(space, n_candidates, random_state=42):
+    return [_plain(params) for params in ParameterSampler(space, n_candidates, random_state=random_state)]
+
+
+def score_candidate(estimator, hyperparams, X_train, y_train, X_val, y_val, rows=None):
+    """
+    Fits one candidate on the given training rows (all when None) and scores it on the
+    validation set. Runs in a joblib worker, so the estimator is single threaded there.
+    """
+    start = time.time()
+    X, y = (X_train, y_train) if rows is None else (X_train[rows], y_train[rows])
+    model = fit_estimator(
+        create_estimator(estimator, dict(hyperparams, n_jobs=1)), X, y, X_val, y_val, hyperparams.get("early_stopping_rounds")
+    )
+    return {
+        "val_auc": float(roc_auc_score(y_val, model.predict_proba(X_val)[:, 1])),
+        "best_iteration": best_iteration(model),
+        "training_rows": int(X.shape[0]),
+        "fit_time_seconds": time.time() - start,
+    }
+
+
+def _evaluate(parallel, estimator, base_hyperparams, candidates, X_train, y_train, X_val, y_val, rows=None):
+    scores = parallel(
+        delayed(score_candidate)(estimator, dict(base_hyperparams, **params), X_train, y_train, X_val, y_val, rows)
+        for params in candidates
+    )
+    return [dict(score, hyperparameters=params) for params, score in zip(candidates, scores)]
+
+
+def halving_rounds(n_candidates, factor):
+    """Number of rounds successive halving needs to narrow n_candidates down to one."""
+    return max(1, math.ceil(math.log(n_candidates, factor))) if n_candidates > 1 else 1
+
+
+def run_search(
+    estimator,
+    base_hyperparams,
+    X_train,
+    y_train,
+    X_val,
+    y_val,
+    strategy="random",
+    n_candidates=DEFAULT_CANDIDATES,
+    factor=DEFAULT_FACTOR,
+    space=None,
+    n_jobs=-1,
+    random_state=42,
+):
+    """
+    Searches hyperparameters for estimator on the loaded data.
+    :return: The leaderboard, best first: one entry per candidate with its hyperparameters,
+        validation AUC and the number of training rows of the round it was last scored in.
+    """
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unsupported search strategy: {strategy}")
+    candidates = sample_candidates(space or DEFAULT_SEARCH_SPACES[estimator], n_candidates, random_state)
+    logger.info(f"🔎 {strategy} search over {len(candidates)} candidates for {estimator} with {n_jobs} jobs")
+    results = []
+    with Parallel(n_jobs=n_jobs) as parallel:
+        if strategy == "random":
+            results = _evaluate(parallel, estimator, base_hyperparams, candidates, X_train, y_train, X_val, y_val)
+        else:
+            n_rows = X_train.shape[0]
+            n_rounds = halving_rounds(len(candidates), factor)
+            order = np.random.RandomState(random_state).permutation(n_rows)
+            for round_index in range(n_rounds):
+                round_rows = min(n_rows, max(MIN_HALVING_ROWS, n_rows // factor ** (n_rounds - 1 - round_index)))
+                # the last round trains on every row, without building a subset copy
+                rows = None if round_rows >= n_rows else np.sort(order[:round_rows])
+                scored = _evaluate(parallel, estimator, base_hyperparams, candidates, X_train, y_train, X_val, y_val, rows)
+                scored.sort(key=lambda entry: entry["val_auc"], reverse=True)
+                logger.info(f"Round {round_index + 1}/{n_rounds}: {len(candidates)} candidates on {round_rows} rows, best AUC {scored[0]['val_auc']:.4f}")
+                keep = max(1, math.ceil(len(scored) / factor))
+                results = scored[keep:] + results
+                candidates = [entry["hyperparameters"] for entry in scored[:keep]]
+                if round_index == n_rounds - 1:
+                    results = scored[:keep] + results
+    leaderboard = sorted(results, key=lambda entry: (entry["training_rows"], entry["val_auc"]), reverse=True)
+    for rank, entry in enumerate(leaderboard, start=1):
+        entry["rank"] = rank
+    logger.info(f"🏆 Best candidate: {json.dumps(leaderboard[0]['hyperparameters'])} (AUC {leaderboard[0]['val_auc']:.4f})")
+    return leaderboard
@@ -0,0 +1,180 @@
+"""
+Vectorized technical indicators over a whole product series.
+
+Every kernel takes float64 NumPy arrays ordered oldest first and returns an array of
+the same length, with NaN where the window has not filled yet. Recursive averages
+(EMA, Wilder smoothing) run through scipy's IIR filter, rolling windows through
+cumulative sums, so no kernel loops over candles in Python.
+"""
+import numpy as np
+
+from scipy.signal import lfilter
+
+
+def _shift(x, periods):
+    """Returns x moved forward by periods positions, padded with NaN."""
+    out = np.full_like(x, np.nan)
+    if periods < len(x):
+        out[periods:] = x[:len(x) - periods]
+    return out
+
+
+def returns(close, periods=1):
+    """Simple return over periods bars."""
+    previous = _shift(close, periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return close / previous - 1.0
+
+
+def log_returns(close, periods=1):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(close / _shift(close, periods))
+
+
+def _rolling_sums(x, window):
+    # centring keeps the running sum of squares small enough to avoid cancellation
+    centred = x - np.mean(x)
+    s1 = np.cumsum(centred)
+    s2 = np.cumsum(centred * centred)
+    s1[window:] = s1[window:] - s1[:-window]
+    s2[window:] = s2[window:] - s2[:-window]
+    return centred, s1, s2
+
+
+def rolling_mean(x, window):
+    out = np.full_like(x, np.nan)
+    if window > len(x):
+        return out
+    _, s1, _ = _rolling_sums(x, window)
+    out[window - 1:] = s1[window - 1:] / window + np.mean(x)
+    return out
+
+
+def rolling_std(x, window):
+    """Population standard deviation over the trailing window."""
+    out = np.full_like(x, np.nan)
+    if window > len(x):
+        return out
+    _, s1, s2 = _rolling_sums(x, window)
+    variance = s2[window - 1:] / window - (s1[window - 1:] / window) ** 2
+    out[window - 1:] = np.sqrt(np.maximum(variance, 0.0))
+    return out
+
+
+def _smooth(x, alpha):
+    """Exponential smoothing y[t] = alpha * x[t] + (1 - alpha) * y[t-1], seeded with x[0]."""
+    if len(x) == 0:
+        return x.copy()
+    return lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])[0]
+
+
+def ema(x, span):
+    return _smooth(x, 2.0 / (span + 1.0))
+
+
+def wilder(x, window):
+    """Wilder's moving average, the smoothing used by RSI and ATR."""
+    return _smooth(x, 1.0 / window)
+
+
+def rsi(close, window=14):
+    delta = np.diff(close, prepend=close[:1])
+    average_gain = wilder(np.maximum(delta, 0.0), window)
+    average_loss = wilder(np.maximum(-delta, 0.0), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+    out[average_loss == 0] = 100.0
+    out[:window] = np.nan
+    return out
+
+
+def bollinger_width(close, window=20, num_std=2.0):
+    """Distance between the upper and lower band relative to the middle band."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 2.0 * num_std * rolling_std(close, window) / rolling_mean(close, window)
+
+
+def true_range(high, low, close):
+    previous_close = _shift(close, 1)
+    previous_close[:1] = close[:1]
+    return np.maximum(high - low, np.maximum(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+
+def atr(high, low, close, window=14):
+    out = wilder(true_range(high, low, close), window)
+    out[:window - 1] = np.nan
+    return out
+
+
+def volume_zscore(volume, window=20):
+    mean = rolling_mean(volume, window)
+    std = rolling_std(volume, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = (volume - mean) / std
+    out[std == 0] = 0.0
+    return out
+
+
+# name -> (required columns, kernel taking the columns dict)
+FEATURES = {
+    "return_1": (("close",), lambda c: returns(c["close"], 1)),
+    "return_5": (("close",), lambda c: returns(c["close"], 5)),
+    "return_15": (("close",), lambda c: returns(c["close"], 15)),
+    "log_return_1": (("close",), lambda c: log_returns(c["close"], 1)),
+    "sma_20": (("close",), lambda c: rolling_mean(c["close"], 20)),
+    "std_20": (("close",), lambda c: rolling_std(c["close"], 20)),
+    "ema_12": (("close",), lambda c: ema(c["close"], 12)),
+    "ema_26": (("close",), lambda c: ema(c["close"], 26)),
+    "rsi_14": (("close",), lambda c: rsi(c["close"], 14)),
+    "bollinger_width_20": (("close",), lambda c: bollinger_width(c["close"], 20)),
+    "atr_14": (("high", "low", "close"), lambda c: atr(c["high"], c["low"], c["close"], 14)),
+    "volume_zscore_20": (("volume",), lambda c: volume_zscore(c["volume"], 20)),
+}
+
+DEFAULT_FEATURES = {
+    "candle": [
+        "return_1",
+        "return_5",
+        "std_20",
+        "ema_12",
+        "ema_26",
+        "rsi_14",
+        "bollinger_width_20",
+        "atr_14",
+        "volume_zscore_20",
+    ],
+    "order": [],
+}
+
+
+def resolve_features(data_type, names=None):
+    """
+    Returns the feature names to compute for data_type: the given names, or the
+    data type's defaults when names is None.
+    """
+    if names is None:
+        if data_type not in DEFAULT_FEATURES:
+            raise ValueError("Unsupported data_type")
+        return list(DEFAULT_FEATURES[data_type])
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unsupported technical features: {', '.join(unknown)}")
+    return list(names)
+
+
+def compute_features(columns, names):
+    """
+    Computes the named features over a series.
+    :param columns: Mapping of column name to float64 array, ordered oldest first.
+    :param names: Feature names from FEATURES.
+    :return: A (rows, len(names)) float64 matrix, NaN where a window is not yet full.
+    """
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    out = np.empty((n_rows, len(names)), dtype=np.float64)
+    for i, name in enumerate(names):
+        required, kernel = FEATURES[name]
+        missing = [column for column in required if column not in columns]
+        if missing:
+            raise ValueError(f"Feature {name} needs columns: {', '.join(missing)}")
+        out[:, i] = kernel(columns)
+    return out
@@ -1,18 +1,85 @@
 import os
-import time
 import json
 import boto3
-from sklearn.datasets import load_svmlight_file
-from sklearn.metrics import accuracy_score, roc_auc_score, confusion_matrix
-from sklearn.ensemble import RandomForestClassifier
-import joblib
 import logging
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
+from tasks.matrix_io import download_matrices
+from tasks.s3_io import client_config, transfer_config
+
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def download_data(s3_client, bucket, s3_key):
+    try:
+        logger.info("📥 Downloading training data...")
+        train_local = 'train.libsvm'
+        val_local = 'validation.libsvm'
+        config = transfer_config()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            downloads = [
+                executor.submit(download_matrices, s3_client, bucket, f"{s3_key}/train/train.libsvm", train_local, config),
+                executor.submit(download_matrices, s3_client, bucket, f"{s3_key}/validation/validation.libsvm", val_local, config),
+            ]
+            for download in downloads:
+                download.result()
+        return train_local, val_local
+    except Exception as e:
+        logger.error(f"Error downloading data from S3: {e}")
+        raise
+
+def start_prefetch():
+    """
+    Starts download_data on a background thread so the transfer overlaps the sklearn
+    imports below. Returns the future, or None when the dataset cache or incremental
+    training is in use or the location is not configured.
+    """
+    if os.environ.get("DATASET_CACHE_DIR") or not (os.environ.get("S3_BUCKET") and os.environ.get("S3_KEY")):
+        return None
+    if os.environ.get("TRAINING_MODE", "full") == "incremental":
+        # incremental training streams shards, there is nothing to download up front
+        return None
+    s3_client = boto3.client('s3', config=client_config())
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(download_data, s3_client, os.environ["S3_BUCKET"], os.environ["S3_KEY"])
+    executor.shutdown(wait=False)
+    return future
+
+PREFETCH = start_prefetch() if __name__ == "__main__" else None
+
+import numpy as np  # noqa: E402
+from sklearn.datasets import load_svmlight_file  # noqa: E402
+from sklearn.ensemble import RandomForestClassifier  # noqa: E402
+import joblib  # noqa: E402
+
+from tasks.dataset_cache import DatasetCache  # noqa: E402
+from tasks.estimators import DEFAULT_ESTIMATOR, ESTIMATORS, best_iteration, create_estimator, final_estimator, fit_estimator  # noqa: E402
+from tasks.evaluation import CURVE_THRESHOLDS, binary_metrics, stratified_sample  # noqa: E402
+from tasks.flat_ensemble import FlatEnsemble, can_flatten, upload_flat_model  # noqa: E402
+from tasks.incremental import (  # noqa: E402
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_TREES_PER_CHUNK,
+    ShardStream,
+    RowReservoir,
+    create_incremental_estimator,
+    evaluate_incremental,
+    parse_classes,
+    train_incremental,
+)
+from tasks.matrix_io import load_binary  # noqa: E402
+from tasks.model_artifacts import ARTIFACT_FORMATS, DEFAULT_ARTIFACT_FORMAT, artifact_compression, artifact_suffix  # noqa: E402
+from tasks.parallel import available_cpus, memory_bounded_jobs  # noqa: E402
+from tasks.profiling import StageClock, StageProfiler, profile_stage  # noqa: E402
+from tasks.search import DEFAULT_CANDIDATES, DEFAULT_FACTOR, SEARCH_STRATEGIES, parse_search_space, run_search  # noqa: E402
+from tasks.walk_forward import DEFAULT_SPLITS, WINDOWS, fold_bytes, run_walk_forward, walk_forward_folds  # noqa: E402
+
+TRAINING_MODES = ("full", "incremental", "search", "walk_forward")
+# training rows scored for train metrics, 0 scores them all
+DEFAULT_EVAL_TRAIN_SAMPLE_SIZE = 100000
+
+
 def create_random_forest_estimator(estimators=100, max_depth=5, random_state=42):
     """Creates a RandomForestClassifier model with the given hyperparameters."""
     return RandomForestClassifier(
@@ -29,6 +96,31 @@ def get_config():
             "provider": os.environ['PROVIDER'],
             "product_id": os.environ['PRODUCT_ID'],
             "correlation_id": os.environ['CORRELATION_ID'],
+            "training_mode": os.environ.get('TRAINING_MODE', 'full'),
+            "estimator": os.environ.get('ESTIMATOR') or DEFAULT_ESTIMATOR,
+            "artifact_format": os.environ.get('MODEL_ARTIFACT_FORMAT') or DEFAULT_ARTIFACT_FORMAT,
+            "export_flat_model": os.environ.get('EXPORT_FLAT_MODEL', 'false').lower() == 'true',
+            "eval_train_sample_size": int(os.environ.get('EVAL_TRAIN_SAMPLE_SIZE') or DEFAULT_EVAL_TRAIN_SAMPLE_SIZE),
+            "incremental": {
+                'estimator': os.environ.get('INCREMENTAL_ESTIMATOR', 'sgd'),
+                'chunk_rows': int(os.environ.get('INCREMENTAL_CHUNK_ROWS') or DEFAULT_CHUNK_ROWS),
+                'epochs': int(os.environ.get('INCREMENTAL_EPOCHS') or 1),
+                'trees_per_chunk': int(os.environ.get('INCREMENTAL_TREES_PER_CHUNK') or DEFAULT_TREES_PER_CHUNK),
+                'classes': parse_classes(os.environ.get('INCREMENTAL_CLASSES')).tolist(),
+                'n_features': int(os.environ['INCREMENTAL_N_FEATURES']) if os.environ.get('INCREMENTAL_N_FEATURES') else None,
+            },
+            "search": {
+                'strategy': os.environ.get('SEARCH_STRATEGY') or 'random',
+                'candidates': int(os.environ.get('SEARCH_CANDIDATES') or DEFAULT_CANDIDATES),
+                'factor': int(os.environ.get('SEARCH_FACTOR') or DEFAULT_FACTOR),
+                'space': os.environ.get('SEARCH_SPACE'),
+            },
+            "walk_forward": {
+                'splits': int(os.environ.get('WALK_FORWARD_SPLITS') or DEFAULT_SPLITS),
+                'window': os.environ.get('WALK_FORWARD_WINDOW') or 'expanding',
+                'gap': int(os.environ.get('WALK_FORWARD_GAP') or 0),
+                'max_train_size': int(os.environ['WALK_FORWARD_MAX_TRAIN_SIZE']) if os.environ.get('WALK_FORWARD_MAX_TRAIN_SIZE') else None,
+            },
             "hyperparams": {
                 'max_depth': int(os.environ.get('HYPERPARAM_MAX_DEPTH', '6')),
                 'learning_rate': float(os.environ.get('HYPERPARAM_ETA', '0.1')),
@@ -46,28 +138,30 @@ def get_config():
                 'random_state': 42,
             }
         }
+        if config['training_mode'] not in TRAINING_MODES:
+            raise ValueError(f"Unsupported TRAINING_MODE: {config['training_mode']}")
+        if config['estimator'] not in ESTIMATORS:
+            raise ValueError(f"Unsupported ESTIMATOR: {config['estimator']}")
+        if config['artifact_format'] not in ARTIFACT_FORMATS:
+            raise ValueError(f"Unsupported MODEL_ARTIFACT_FORMAT: {config['artifact_format']}")
+        if config['search']['strategy'] not in SEARCH_STRATEGIES:
+            raise ValueError(f"Unsupported SEARCH_STRATEGY: {config['search']['strategy']}")
+        if config['walk_forward']['window'] not in WINDOWS:
+            raise ValueError(f"Unsupported WALK_FORWARD_WINDOW: {config['walk_forward']['window']}")
         return config
     except KeyError as e:
         logger.error(f"Missing required environment variable: {e}")
         raise
 
-def download_data(s3_client, bucket, s3_key):
-    try:
-        logger.info("📥 Downloading training data...")
-        train_local = 'train.libsvm'
-        val_local = 'validation.libsvm'
-        s3_client.download_file(bucket, f"{s3_key}/train/train.libsvm", train_local)
-        s3_client.download_file(bucket, f"{s3_key}/validation/validation.libsvm", val_local)
-        return train_local, val_local
-    except Exception as e:
-        logger.error(f"Error downloading data from S3: {e}")
-        raise
+def load_matrix(local_path):
+    """Memory-maps the binary matrices for local_path when present, otherwise parses libsvm."""
+    return load_binary(local_path) or load_svmlight_file(local_path)
 
 def load_data(train_local, val_local):
     try:
         logger.info("📊 Loading training data...")
-        X_train, y_train = load_svmlight_file(train_local)
-        X_val, y_val = load_svmlight_file(val_local)
+        X_train, y_train = load_matrix(train_local)
+        X_val, y_val = load_matrix(val_local)
         logger.info(f"Training samples: {X_train.shape[0]}, Features: {X_train.shape[1]}")
         logger.info(f"Validation samples: {X_val.shape[0]}")
         return X_train, y_train, X_val, y_val
@@ -75,67 +169,183 @@ def load_data(train_local, val_local):
         logger.error(f"Error loading data: {e}")
         return None, None, None, None
 
-def train_model(X_train, y_train, X_val, y_val, hyperparams, model_class):
+def load_cached_data(s3_client, cache, bucket, s3_key):
+    """Loads the training and validation sets through the dataset cache, keyed by their ETags."""
+    try:
+        logger.info("📊 Loading training data through the dataset cache...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            train_set = executor.submit(cache.fetch, s3_client, bucket, f"{s3_key}/train/train.libsvm", 'train.libsvm', load_matrix)
+            val_set = executor.submit(cache.fetch, s3_client, bucket, f"{s3_key}/validation/validation.libsvm", 'validation.libsvm', load_matrix)
+            (X_train, y_train), (X_val, y_val) = train_set.result(), val_set.result()
+        logger.info(f"Training samples: {X_train.shape[0]}, Features: {X_train.shape[1]}")
+        logger.info(f"Validation samples: {X_val.shape[0]}")
+        return X_train, y_train, X_val, y_val
+    except Exception as e:
+        logger.error(f"Error loading cached data: {e}")
+        raise
+
+def train_model(X_train, y_train, X_val, y_val, hyperparams, estimator):
     """
-    Trains a model using the provided model_class (e.g., sklearn.ensemble.RandomForestClassifier, etc.)
+    Fits estimator, an instance (see tasks.estimators.create_estimator) or an estimator
+    class built from hyperparams. Boosting engines early-stop on the validation set.
     """
     try:
-        logger.info(f"🔥 Training model: {model_class.__name__} ...")
-        model = model_class(**hyperparams)
-        # scikit-learn estimators do not use eval_set or eval_names
-        model.fit(X_train, y_train)
-        return model
+        model = estimator(**hyperparams) if isinstance(estimator, type) else estimator
+        logger.info(f"🔥 Training model: {type(final_estimator(model)).__name__} ...")
+        return fit_estimator(model, X_train, y_train, X_val, y_val, hyperparams.get('early_stopping_rounds'))
     except Exception as e:
         logger.error(f"Error during model training: {e}")
         raise
 
-def evaluate_model(model, X_train, y_train, X_val, y_val):
+def evaluate_model(model, X_train, y_train, X_val, y_val, train_sample_size=None):
+    """
+    Scores the validation set and, for train metrics, a stratified sample of at most
+    train_sample_size training rows (all of them when None). Every metric of a set comes
+    from one sorted pass over its scores, see tasks.evaluation.
+    """
     try:
         logger.info("📈 Evaluating model...")
-        train_preds = model.predict_proba(X_train)[:, 1]
-        val_preds = model.predict_proba(X_val)[:, 1]
-        train_pred_binary = (train_preds > 0.5).astype(int)
-        val_pred_binary = (val_preds > 0.5).astype(int)
-        train_accuracy = accuracy_score(y_train, train_pred_binary)
-        val_accuracy = accuracy_score(y_val, val_pred_binary)
-        train_auc = roc_auc_score(y_train, train_preds)
-        val_auc = roc_auc_score(y_val, val_preds)
-        cm = confusion_matrix(y_val, val_pred_binary)
-        tn, fp, fn, tp = cm.ravel() if cm.size == 4 else (0, 0, 0, 0)
-        feature_importance = model.feature_importances_
+        sample = stratified_sample(y_train, train_sample_size)
+        if sample is not None:
+            logger.info(f"Scoring a stratified sample of {len(sample)} of {len(y_train)} training rows")
+            X_train, y_train = X_train[sample], np.asarray(y_train)[sample]
+        train = binary_metrics(y_train, model.predict_proba(X_train)[:, 1])
+        val = binary_metrics(y_val, model.predict_proba(X_val)[:, 1], curve_thresholds=CURVE_THRESHOLDS)
+        cm = val["confusion_matrix"]
+        feature_importance = getattr(final_estimator(model), "feature_importances_", None)
+        iterations = best_iteration(model)
         logger.info("📊 Training Results:")
-        logger.info(f"  Train Accuracy: {train_accuracy:.4f}")
-        logger.info(f"  Validation Accuracy: {val_accuracy:.4f}")
-        logger.info(f"  Train AUC: {train_auc:.4f}")
-        logger.info(f"  Validation AUC: {val_auc:.4f}")
-        logger.info(f"  Best Iteration: {model.best_iteration}")
-        logger.info(f"  Confusion Matrix - TP: {tp}, TN: {tn}, FP: {fp}, FN: {fn}")
+        logger.info(f"  Train Accuracy: {train['accuracy']:.4f}")
+        logger.info(f"  Validation Accuracy: {val['accuracy']:.4f}")
+        logger.info(f"  Train AUC: {train['auc']}")
+        logger.info(f"  Validation AUC: {val['auc']}")
+        logger.info(f"  Best Iteration: {iterations}")
+        logger.info(f"  Confusion Matrix - TP: {cm['true_positive']}, TN: {cm['true_negative']}, FP: {cm['false_positive']}, FN: {cm['false_negative']}")
         return {
-            "train_accuracy": train_accuracy,
-            "val_accuracy": val_accuracy,
-            "train_auc": train_auc,
-            "val_auc": val_auc,
-            "confusion_matrix": {"true_positive": int(tp), "true_negative": int(tn), "false_positive": int(fp), "false_negative": int(fn)},
+            "train_accuracy": train["accuracy"],
+            "val_accuracy": val["accuracy"],
+            "train_auc": train["auc"],
+            "val_auc": val["auc"],
+            "confusion_matrix": cm,
+            "threshold_curve": val["threshold_curve"],
+            "train_samples_scored": train["samples"],
             "feature_importance": feature_importance,
-            "best_iteration": int(model.best_iteration),
+            "best_iteration": None if iterations is None else int(iterations),
         }
     except Exception as e:
         logger.error(f"Error during model evaluation: {e}")
         return {"error": str(e)}
 
-def save_and_upload_model(s3_client, model, bucket, s3_key, model_version=None):
+def run_incremental_training(s3_client, config, profiler=None):
+    """
+    Trains on the shards under {s3_key}/train/ one chunk at a time, so memory depends on
+    INCREMENTAL_CHUNK_ROWS and EVAL_TRAIN_SAMPLE_SIZE rather than on the dataset size.
+    Downloading, parsing and fitting take turns chunk by chunk; each one's time over the
+    training passes is recorded as its own profiler stage, followed by evaluate.
+    :return: (model, metrics, feature count, training samples).
+    """
+    try:
+        options = config['incremental']
+        logger.info(f"🔥 Training {options['estimator']} incrementally in chunks of {options['chunk_rows']} rows ...")
+        model, dense = create_incremental_estimator(options['estimator'], config['hyperparams'])
+        train_chunks = ShardStream(s3_client, config['bucket'], f"{config['s3_key']}/train/", options['chunk_rows'], options['n_features'])
+        # train metrics are scored on a sample kept during the last epoch, not a second pass
+        train_sample = RowReservoir(config.get('eval_train_sample_size', DEFAULT_EVAL_TRAIN_SAMPLE_SIZE) or None)
+        fit_clock = StageClock()
+        model, n_train = train_incremental(
+            model, train_chunks, np.array(options['classes']),
+            dense=dense, epochs=options['epochs'], trees_per_chunk=options['trees_per_chunk'], sample=train_sample,
+            fit_clock=fit_clock,
+        )
+        if profiler is not None:
+            profiler.add_clock("download", train_chunks.download_clock)
+            profiler.add_clock("parse", train_chunks.parse_clock)
+            profiler.add_clock("fit", fit_clock)
+        with profile_stage(profiler, "evaluate"):
+            val_chunks = ShardStream(s3_client, config['bucket'], f"{config['s3_key']}/validation/", options['chunk_rows'], train_chunks.n_features)
+            metrics = evaluate_incremental(model, train_sample, val_chunks, dense=dense)
+        return model, metrics, train_chunks.n_features, n_train
+    except Exception as e:
+        logger.error(f"Error during incremental training: {e}")
+        raise
+
+def run_hyperparameter_search(config, X_train, y_train, X_val, y_val):
+    """
+    Searches hyperparameters for the configured estimator over the already loaded data,
+    on every vCPU of the task. Returns the leaderboard, best candidate first.
+    """
+    try:
+        options = config['search']
+        return run_search(
+            config['estimator'],
+            config['hyperparams'],
+            X_train, y_train, X_val, y_val,
+            strategy=options['strategy'],
+            n_candidates=options['candidates'],
+            factor=options['factor'],
+            space=parse_search_space(options['space'], config['estimator']),
+            n_jobs=available_cpus(),
+            random_state=config['hyperparams'].get('random_state', 42),
+        )
+    except Exception as e:
+        logger.error(f"Error during hyperparameter search: {e}")
+        raise
+
+def run_walk_forward_validation(config, X_train, y_train):
+    """
+    Walk-forward validation of the configured estimator over the time-ordered training
+    set, one fold per vCPU at most, and no more folds at once than the memory left
+    holds copies of. Returns per-fold and aggregate metrics.
+    """
     try:
-        logger.info("Saving model...")
+        options = config['walk_forward']
+        folds = walk_forward_folds(
+            X_train.shape[0], options['splits'], options['window'], options['gap'], options['max_train_size']
+        )
+        n_jobs = memory_bounded_jobs(min(available_cpus(), len(folds)), fold_bytes(X_train, folds))
+        return run_walk_forward(config['estimator'], config['hyperparams'], X_train, y_train, folds, n_jobs=n_jobs)
+    except Exception as e:
+        logger.error(f"Error during walk-forward validation: {e}")
+        raise
+
+def save_and_upload_model(s3_client, model, bucket, s3_key, model_version=None, profiler=None, artifact_format=DEFAULT_ARTIFACT_FORMAT):
+    """
+    Uploads the model as a joblib artifact: uncompressed, so predict_scikit can memory-map
+    it ("mmap"), or gzip-compressed with a .joblib.gz suffix ("compressed").
+    """
+    try:
+        profiler = profiler or StageProfiler("train_scikit")
+        logger.info(f"Saving model as a {artifact_format} artifact...")
         version_str = f"_v{model_version}" if model_version else ""
-        model_filename = f"xgb_model{version_str}.joblib"
-        joblib.dump(model, model_filename)
-        model_s3_key = f"{s3_key}/trained_model/xgb_model{version_str}.joblib"
-        s3_client.upload_file(model_filename, bucket, model_s3_key)
+        model_filename = f"xgb_model{version_str}{artifact_suffix(artifact_format)}"
+        with profiler.stage("serialize"):
+            joblib.dump(model, model_filename, compress=artifact_compression(artifact_format))
+        model_s3_key = f"{s3_key}/trained_model/{model_filename}"
+        with profiler.stage("upload"):
+            s3_client.upload_file(model_filename, bucket, model_s3_key, Config=transfer_config())
         return model_s3_key
     except Exception as e:
         logger.error(f"Error saving/uploading model: {e}")
         raise
 
+def export_flat_model(s3_client, model, bucket, s3_key, model_version=None):
+    """
+    Compiles a forest into flat arrays (see tasks.flat_ensemble) and uploads them under
+    {s3_key}/trained_model/flat_model{_vN}/ for low latency prediction.
+    """
+    try:
+        version_str = f"_v{model_version}" if model_version else ""
+        flat_dir = f"flat_model{version_str}"
+        flat = FlatEnsemble.compile(model)
+        flat.save(flat_dir)
+        flat_s3_prefix = f"{s3_key}/trained_model/{flat_dir}"
+        upload_flat_model(s3_client, bucket, flat_s3_prefix, flat_dir)
+        logger.info(f"🌲 Exported {flat.meta['n_trees']} trees ({len(flat.feature)} nodes) as a flat model")
+        return flat_s3_prefix
+    except Exception as e:
+        logger.error(f"Error exporting flat model: {e}")
+        raise
+
 def save_and_upload_results(s3_client, results, bucket, s3_key):
     try:
         results_filename = 'training_results.json'
@@ -150,25 +360,62 @@ def save_and_upload_results(s3_client, results, bucket, s3_key):
 
 def main():
     try:
-        start_time = time.time()
-        config = get_config()
-        model_version = os.environ.get('MODEL_VERSION')
+        profiler = StageProfiler("train_scikit")
+        with profiler.stage("config"):
+            config = get_config()
+            model_version = os.environ.get('MODEL_VERSION')
+            s3_client = boto3.client('s3', config=client_config())
         logger.info(f"🚀 Starting training for {config['provider']}/{config['product_id']}")
+        logger.info(f"🧠 Estimator: {config['estimator']}")
         logger.info(f"📊 Hyperparameters: {json.dumps(config['hyperparams'], indent=2)}")
-        s3_client = boto3.client('s3')
-        train_local, val_local = download_data(s3_client, config['bucket'], config['s3_key'])
-        X_train, y_train, X_val, y_val = load_data(train_local, val_local)
-
-        estimator = create_random_forest_estimator(
-            estimators=config['hyperparams'].get('n_estimators', 100),
-            max_depth=config['hyperparams'].get('max_depth', 5),
-            random_state=config['hyperparams'].get('random_state', 42)
-        )
+        hyperparams = config['hyperparams']
+        leaderboard = None
+        walk_forward = None
+        if config['training_mode'] == 'incremental':
+            # shards are downloaded and parsed chunk by chunk while fitting, profiled per stage inside
+            model, metrics, feature_count, training_samples = run_incremental_training(s3_client, config, profiler=profiler)
+            validation_samples = metrics['validation_samples']
+        else:
+            cache = DatasetCache.from_env()
+            if cache is not None:
+                with profiler.stage("load"):
+                    X_train, y_train, X_val, y_val = load_cached_data(s3_client, cache, config['bucket'], config['s3_key'])
+            else:
+                with profiler.stage("download"):
+                    if PREFETCH is not None:
+                        train_local, val_local = PREFETCH.result()
+                    else:
+                        train_local, val_local = download_data(s3_client, config['bucket'], config['s3_key'])
+                with profiler.stage("parse"):
+                    X_train, y_train, X_val, y_val = load_data(train_local, val_local)
 
-        model = train_model(X_train, y_train, X_val, y_val, config['hyperparams'], estimator)
-        training_time = time.time() - start_time
-        metrics = evaluate_model(model, X_train, y_train, X_val, y_val)
-        model_s3_key = save_and_upload_model(s3_client, model, config['bucket'], config['s3_key'], model_version=model_version)
+            if config['training_mode'] == 'search':
+                with profiler.stage("search"):
+                    leaderboard = run_hyperparameter_search(config, X_train, y_train, X_val, y_val)
+                hyperparams = {**hyperparams, **leaderboard[0]['hyperparameters']}
+            elif config['training_mode'] == 'walk_forward':
+                with profiler.stage("walk_forward"):
+                    walk_forward = run_walk_forward_validation(config, X_train, y_train)
+            estimator = create_estimator(config['estimator'], hyperparams)
+
+            with profiler.stage("fit"):
+                model = train_model(X_train, y_train, X_val, y_val, hyperparams, estimator)
+            with profiler.stage("evaluate"):
+                metrics = evaluate_model(model, X_train, y_train, X_val, y_val, config['eval_train_sample_size'])
+            feature_count, training_samples, validation_samples = X_train.shape[1], X_train.shape[0], X_val.shape[0]
+        # fit time only, the whole task is in profile.total_wall_seconds
+        training_time = profiler.stage_seconds("fit")
+        model_s3_key = save_and_upload_model(
+            s3_client, model, config['bucket'], config['s3_key'], model_version=model_version, profiler=profiler,
+            artifact_format=config['artifact_format'],
+        )
+        flat_model_s3_prefix = None
+        if config['export_flat_model']:
+            if can_flatten(model):
+                with profiler.stage("export"):
+                    flat_model_s3_prefix = export_flat_model(s3_client, model, config['bucket'], config['s3_key'], model_version=model_version)
+            else:
+                logger.warning(f"⚠️ EXPORT_FLAT_MODEL is set but a {type(model).__name__} cannot be flattened, skipping")
         results = {
             'provider': config['provider'],
             'product_id': config['product_id'],
@@ -176,16 +423,26 @@ def main():
             'training_time_seconds': training_time,
             'train_accuracy': float(metrics['train_accuracy']),
             'val_accuracy': float(metrics['val_accuracy']),
-            'train_auc': float(metrics['train_auc']),
-            'val_auc': float(metrics['val_auc']),
+            'train_auc': metrics['train_auc'],
+            'val_auc': metrics['val_auc'],
             'confusion_matrix': metrics['confusion_matrix'],
-            'hyperparameters': config['hyperparams'],
+            'threshold_curve': metrics.get('threshold_curve'),
+            'estimator': config['incremental']['estimator'] if config['training_mode'] == 'incremental' else config['estimator'],
+            'hyperparameters': hyperparams,
             'model_s3_path': f"s3://{config['bucket']}/{model_s3_key}",
+            'model_artifact_format': config['artifact_format'],
+            'flat_model_s3_path': f"s3://{config['bucket']}/{flat_model_s3_prefix}" if flat_model_s3_prefix else None,
             'best_iteration': metrics['best_iteration'],
-            'feature_count': int(X_train.shape[1]),
-            'training_samples': int(X_train.shape[0]),
-            'validation_samples': int(X_val.shape[0])
+            'training_mode': config['training_mode'],
+            'feature_count': int(feature_count),
+            'training_samples': int(training_samples),
+            'validation_samples': int(validation_samples)
         }
+        if leaderboard is not None:
+            results['leaderboard'] = leaderboard
+        if walk_forward is not None:
+            results['walk_forward'] = walk_forward
+        results['profile'] = profiler.log_summary()
         results_s3_key = save_and_upload_results(s3_client, results, config['bucket'], config['s3_key'])
         logger.info(f"🎉 Training completed successfully!")
         logger.info(f"📁 Model saved to: s3://{config['bucket']}/{model_s3_key}")
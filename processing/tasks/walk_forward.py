@@ -0,0 +1,103 @@
+"""
+Walk-forward validation over a time-ordered training set.
+
+Folds are contiguous row ranges, so each fold's training and test sets are basic
+slices of the one loaded matrix: views for dense and memory-mapped arrays, nothing
+is gathered by index. Folds are fitted in parallel with joblib, which hands large
+arrays to its worker processes as memory maps instead of copies. The estimators still
+convert their fold to their own dtype and format in the worker (float32, CSC or dense),
+so the number of jobs is also bounded by the memory those copies take, see fold_bytes.
+"""
+import logging
+import sys
+import time
+
+import numpy as np
+
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+from tasks.estimators import create_estimator, fit_estimator
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WINDOWS = ("expanding", "sliding")
+DEFAULT_SPLITS = 5
+
+
+def walk_forward_folds(n_rows, n_splits=DEFAULT_SPLITS, window="expanding", gap=0, max_train_size=None):
+    """
+    Returns (train, test) slices for n_splits folds, with the same boundaries as
+    sklearn's TimeSeriesSplit: equal test blocks at the end of the series, each trained
+    on the rows before it. gap rows are left out between training and test, which keeps
+    forward-looking labels from leaking. A sliding window keeps max_train_size rows,
+    by default the size of the first fold's training set.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"Unsupported walk-forward window: {window}")
+    test_size = n_rows // (n_splits + 1)
+    if n_splits < 1 or test_size < 1:
+        raise ValueError(f"Cannot build {n_splits} walk-forward folds over {n_rows} rows")
+    first_test_start = n_rows - n_splits * test_size
+    if window == "sliding" and max_train_size is None:
+        max_train_size = first_test_start - gap
+    folds = []
+    for test_start in range(first_test_start, n_rows, test_size):
+        train_end = test_start - gap
+        if train_end <= 0:
+            raise ValueError(f"A gap of {gap} rows leaves no training rows before row {test_start}")
+        train_start = max(0, train_end - max_train_size) if max_train_size else 0
+        folds.append((slice(train_start, train_end), slice(test_start, test_start + test_size)))
+    return folds
+
+
+def fold_bytes(X, folds):
+    """
+    Upper bound of the memory one worker takes to convert its fold: the largest
+    training set as a dense float64 matrix, the widest conversion any estimator makes.
+    """
+    rows = max(train.stop - train.start for train, _ in folds)
+    return rows * X.shape[1] * np.dtype(np.float64).itemsize
+
+
+def score_fold(estimator, hyperparams, X, y, train, test):
+    """Fits a fold on rows X[train] and scores it on X[test]. Runs in a joblib worker."""
+    start = time.time()
+    model = fit_estimator(create_estimator(estimator, dict(hyperparams, n_jobs=1)), X[train], y[train])
+    y_test = np.asarray(y[test])
+    preds = model.predict_proba(X[test])[:, 1]
+    return {
+        "train_rows": [train.start, train.stop],
+        "test_rows": [test.start, test.stop],
+        "accuracy": float(accuracy_score(y_test, (preds > 0.5).astype(int))),
+        # a test block holding a single class has no AUC
+        "auc": float(roc_auc_score(y_test, preds)) if len(np.unique(y_test)) > 1 else None,
+        "fit_time_seconds": time.time() - start,
+    }
+
+
+def _summary(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"mean": None, "std": None}
+    return {"mean": float(np.mean(values)), "std": float(np.std(values))}
+
+
+def run_walk_forward(estimator, hyperparams, X, y, folds, n_jobs=-1):
+    """
+    Fits and scores every fold in parallel.
+    :return: {"folds": per-fold metrics, "accuracy"/"auc": mean and std over folds}.
+    """
+    logger.info(f"⏩ Walk-forward validation of {estimator} over {len(folds)} folds with {n_jobs} jobs")
+    scores = Parallel(n_jobs=n_jobs)(delayed(score_fold)(estimator, hyperparams, X, y, train, test) for train, test in folds)
+    for i, fold in enumerate(scores, start=1):
+        auc = "n/a" if fold["auc"] is None else f"{fold['auc']:.4f}"
+        logger.info(f"  Fold {i}: train rows {fold['train_rows']}, test rows {fold['test_rows']}, accuracy {fold['accuracy']:.4f}, AUC {auc}")
+    result = {
+        "folds": scores,
+        "accuracy": _summary([fold["accuracy"] for fold in scores]),
+        "auc": _summary([fold["auc"] for fold in scores]),
+    }
+    logger.info(f"📊 Walk-forward AUC {result['auc']['mean']} ± {result['auc']['std']}")
+    return result
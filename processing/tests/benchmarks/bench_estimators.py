@@ -0,0 +1,65 @@
+"""
+Compares training time and validation AUC of the registered estimators on synthetic
+candle-like data, with the hyperparameters get_config uses by default.
+
+Run from the processing directory:
+    python -m tests.benchmarks.bench_estimators --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from scipy import sparse
+from sklearn.metrics import roc_auc_score
+
+from tasks.estimators import ESTIMATORS, best_iteration, create_estimator, fit_estimator
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+HYPERPARAMS = {
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "min_child_weight": 1,
+    "n_estimators": 100,
+    "early_stopping_rounds": 10,
+    "n_jobs": -1,
+    "random_state": 42,
+}
+
+
+def make_dataset(n_rows, n_features=9, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n_rows, n_features)).astype(np.float32)
+    signal = X[:, 0] - 0.5 * X[:, 1] + 0.25 * X[:, 2] * X[:, 3]
+    y = (signal + rng.normal(scale=2.0, size=n_rows) > 0).astype(int)
+    # libsvm files load as CSR, so that is what the estimators see in the task
+    return sparse.csr_matrix(X), y
+
+
+def run(sizes, names):
+    print(f"{'estimator':<24}{'rows':>10}{'fit (s)':>10}{'iterations':>12}{'val auc':>10}")
+    for n_rows in sizes:
+        X_train, y_train = make_dataset(n_rows)
+        X_val, y_val = make_dataset(max(n_rows // 5, 1000), seed=1)
+        for name in names:
+            start = time.perf_counter()
+            model = fit_estimator(
+                create_estimator(name, HYPERPARAMS), X_train, y_train, X_val, y_val, HYPERPARAMS["early_stopping_rounds"]
+            )
+            elapsed = time.perf_counter() - start
+            auc = roc_auc_score(y_val, model.predict_proba(X_val)[:, 1])
+            print(f"{name:<24}{n_rows:>10}{elapsed:>10.2f}{best_iteration(model):>12}{auc:>10.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--estimators", nargs="+", default=sorted(ESTIMATORS), choices=sorted(ESTIMATORS))
+    args = parser.parse_args()
+    run(args.sizes, args.estimators)
+
+
+if __name__ == "__main__":
+    main()
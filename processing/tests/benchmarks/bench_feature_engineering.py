@@ -0,0 +1,69 @@
+"""
+Compares the row and vectorized CSV-to-libsvm engines on synthetic data.
+
+Run from the processing directory:
+    python -m tests.benchmarks.bench_feature_engineering --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+import tasks.feature_engineering as fe
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def make_rows(data_type, n_rows, seed=0):
+    rng = random.Random(seed)
+    if data_type == "order":
+        return "".join(
+            f"{rng.uniform(1, 1e5):.2f},{rng.uniform(1, 1e4):.4f},0,{rng.uniform(0, 5):.6f},"
+            f"{rng.uniform(1, 1e4):.4f},{rng.randint(1, 20)},0.006,{rng.uniform(0, 2):.8f},"
+            f"{rng.choice(('BUY', 'SELL'))}\n"
+            for _ in range(n_rows)
+        )
+    return "".join(
+        f"{1700000000 + i * 60},{rng.uniform(1, 1e5):.2f},{rng.uniform(1, 1e5):.2f},"
+        f"{rng.uniform(1, 1e5):.2f},{rng.uniform(1, 1e5):.2f},{rng.uniform(0, 1e3):.8f},"
+        f"{rng.choice(('up', 'down'))}\n"
+        for i in range(n_rows)
+    )
+
+
+def time_engine(engine, text, data_type, repeat):
+    feature_keys, label_col, label_map = fe.get_schema(data_type)
+    convert = fe.get_engine(engine)
+    best = float("inf")
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = "".join(
+            convert(chunk, feature_keys, label_col, label_map) for chunk in fe.iter_text_chunks(text)
+        )
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def run(sizes, data_types, repeat):
+    print(f"{'data_type':<10}{'rows':>10}{'row (s)':>12}{'vectorized (s)':>16}{'speedup':>10}")
+    for data_type in data_types:
+        for n_rows in sizes:
+            text = make_rows(data_type, n_rows)
+            row_time, row_output = time_engine("row", text, data_type, repeat)
+            vec_time, vec_output = time_engine("vectorized", text, data_type, repeat)
+            if row_output != vec_output:
+                raise AssertionError(f"Engines disagree for {data_type} at {n_rows} rows")
+            print(f"{data_type:<10}{n_rows:>10}{row_time:>12.3f}{vec_time:>16.3f}{row_time / vec_time:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--data-types", nargs="+", default=["order", "candle"], choices=["order", "candle"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.data_types, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
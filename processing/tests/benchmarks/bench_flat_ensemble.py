@@ -0,0 +1,69 @@
+"""
+Compares the flat ensemble predictor with sklearn's predict_proba for a random forest
+trained with get_config's default hyperparameters: load time of the artifact, p50/p99
+latency of single-row predictions and throughput of one large batch.
+
+Run from the processing directory:
+    python -m tests.benchmarks.bench_flat_ensemble --trees 100 --max-depth 6 --requests 1000
+"""
+import argparse
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+
+from tasks.flat_ensemble import FlatEnsemble
+from tests.benchmarks.bench_estimators import make_dataset
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def latencies(predict, X, requests):
+    times = []
+    for i in range(requests):
+        row = X[i % X.shape[0]:i % X.shape[0] + 1]
+        start = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - start)
+    return np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000
+
+
+def run(trees, max_depth, train_rows, batch_rows, requests):
+    X_train, y_train = make_dataset(train_rows)
+    X_batch, _ = make_dataset(batch_rows, seed=1)
+    X_batch = X_batch.toarray()
+    model = RandomForestClassifier(n_estimators=trees, max_depth=max_depth, n_jobs=-1, random_state=42).fit(X_train, y_train)
+    with tempfile.TemporaryDirectory() as directory:
+        joblib.dump(model, f"{directory}/model.joblib")
+        FlatEnsemble.compile(model).save(f"{directory}/flat_model")
+        sklearn_model, sklearn_load = timed(lambda: joblib.load(f"{directory}/model.joblib", mmap_mode="r"))
+        flat_model, flat_load = timed(lambda: FlatEnsemble.load(f"{directory}/flat_model"))
+
+        assert np.array_equal(flat_model.predict_proba(X_batch), sklearn_model.predict_proba(X_batch))
+        print(f"{'predictor':<12}{'load (ms)':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}{'batch rows/s':>16}")
+        for name, model, load in (("sklearn", sklearn_model, sklearn_load), ("flat", flat_model, flat_load)):
+            p50, p99 = latencies(model.predict_proba, X_batch, requests)
+            _, batch = timed(lambda: model.predict_proba(X_batch))
+            print(f"{name:<12}{load * 1000:>12.2f}{p50:>12.3f}{p99:>12.3f}{batch_rows / batch:>16.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=6)
+    parser.add_argument("--train-rows", type=int, default=100000)
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.trees, args.max_depth, args.train_rows, args.batch_rows, args.requests)
+
+
+if __name__ == "__main__":
+    main()
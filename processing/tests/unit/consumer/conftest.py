@@ -52,12 +52,12 @@ def mock_aws_ecs(aws_credentials):
                 {
                     "name": "task-container",
                     "image": "task-image",
-                    "memory": Env.MEMORY,
-                    "cpu": Env.CPU,
+                    "memory": int(Env.MEMORY),
+                    "cpu": int(Env.CPU),
                     "portMappings": [
                         {
-                            "containerPort": Env.CONTAINER_PORT,
-                            "hostPort": Env.HOST_PORT,
+                            "containerPort": int(Env.CONTAINER_PORT),
+                            "hostPort": int(Env.HOST_PORT),
                         }
                     ],
                 }
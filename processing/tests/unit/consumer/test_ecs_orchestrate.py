@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from unittest.mock import patch
+
+from consumer.ecs_orchestrate import build_env_vars, sqs_record_handler
+
+
+def _env(env_vars):
+    return {var["name"]: var["value"] for var in env_vars}
+
+
+def _run(body):
+    """Runs sqs_record_handler on one run message, returns the task's environment."""
+    message = {"operation": "run", "provider": "COINBASE", "product_id": "BTC-USD", "S3_BUCKET": "bucket", **body}
+    with patch("consumer.ecs_orchestrate.run_task", return_value={}) as run_task:
+        sqs_record_handler({"Records": [{"body": json.dumps(message)}]}, None)
+    return _env(run_task.call_args.kwargs["overrides"]["containerOverrides"][0]["environment"])
+
+
+def test_train_env_vars_forward_the_artifact_format():
+    env = _env(build_env_vars("train_scikit.py", "bucket", s3_key="COINBASE/BTC-USD", model_artifact_format="compressed"))
+    assert env["MODEL_ARTIFACT_FORMAT"] == "compressed"
+    assert _env(build_env_vars("train_scikit.py", "bucket"))["MODEL_ARTIFACT_FORMAT"] == ""
+
+
+def test_predict_env_vars_forward_the_model_and_its_cache():
+    env = _env(build_env_vars("predict_scikit.py", "bucket", model_s3_key="models/model.joblib", model_cache_dir="/mnt/models"))
+    assert env["MODEL_S3_KEY"] == "models/model.joblib"
+    assert env["MODEL_CACHE_DIR"] == "/mnt/models"
+
+
+def test_handler_forwards_model_settings():
+    env = _run({"MODULE": "predict_scikit.py", "MODEL_S3_KEY": "models/model.joblib", "MODEL_CACHE_DIR": "/mnt/models"})
+    assert env["MODEL_S3_KEY"] == "models/model.joblib"
+    assert env["MODEL_CACHE_DIR"] == "/mnt/models"
+    assert _run({"MODULE": "train_scikit.py", "MODEL_ARTIFACT_FORMAT": "compressed"})["MODEL_ARTIFACT_FORMAT"] == "compressed"
+
+
+def test_flat_model_settings_are_forwarded():
+    assert _env(build_env_vars("train_scikit.py", "bucket"))["EXPORT_FLAT_MODEL"] == "false"
+    assert _run({"MODULE": "train_scikit.py", "EXPORT_FLAT_MODEL": True})["EXPORT_FLAT_MODEL"] == "true"
+    env = _run({"MODULE": "predict_scikit.py", "FLAT_MODEL_S3_PREFIX": "models/flat_model"})
+    assert env["FLAT_MODEL_S3_PREFIX"] == "models/flat_model"
+
+
+def test_streaming_prediction_settings_are_forwarded():
+    env = _run({
+        "MODULE": "predict_scikit.py",
+        "DATA_TYPE": "candle",
+        "PREDICTION_MODE": "stream",
+        "INPUT_DATA_S3_KEY": "COINBASE/BTC-USD/features/",
+        "OUTPUT_S3_KEY": "COINBASE/BTC-USD/predictions.csv",
+        "PREDICTION_OUTPUT_FORMAT": "csv",
+        "PREDICTION_CHUNK_ROWS": 50000,
+        "PREDICT_KEY_COLUMN": 0,
+    })
+    assert env["DATA_TYPE"] == "candle"
+    assert env["PREDICTION_MODE"] == "stream"
+    assert env["INPUT_DATA_S3_KEY"] == "COINBASE/BTC-USD/features/"
+    assert env["OUTPUT_S3_KEY"] == "COINBASE/BTC-USD/predictions.csv"
+    assert env["PREDICTION_OUTPUT_FORMAT"] == "csv"
+    assert env["PREDICTION_CHUNK_ROWS"] == "50000"
+    assert env["PREDICT_KEY_COLUMN"] == "0"
+    defaults = _env(build_env_vars("predict_scikit.py", "bucket"))
+    assert defaults["PREDICTION_MODE"] == "file"
+    assert defaults["PREDICT_KEY_COLUMN"] == ""
+
+
+def test_prediction_manifest_is_forwarded_as_json():
+    jobs = [{"product_id": "BTC-USD", "model_s3_key": "models/btc.joblib", "input_s3_key": "COINBASE/BTC-USD/features/"}]
+    env = _run({"MODULE": "predict_scikit.py", "PREDICTION_MODE": "manifest", "PREDICTION_MANIFEST": jobs})
+    assert json.loads(env["PREDICTION_MANIFEST"]) == jobs
+    env = _run({"MODULE": "predict_scikit.py", "PREDICTION_MODE": "manifest", "PREDICTION_MANIFEST_S3_KEY": "manifests/daily.json"})
+    assert env["PREDICTION_MANIFEST_S3_KEY"] == "manifests/daily.json"
+    assert env["PREDICTION_MANIFEST"] == ""
+
+
+def test_label_settings_keep_zero():
+    env = _run({"MODULE": "feature_engineering.py", "LABEL_TARGET_HORIZON": 5, "LABEL_FLAT_THRESHOLD": 0})
+    assert env["LABEL_TARGET_HORIZON"] == "5"
+    assert env["LABEL_FLAT_THRESHOLD"] == "0"
+    assert _env(build_env_vars("feature_engineering.py", "bucket"))["LABEL_FLAT_THRESHOLD"] == ""
+
+
+def test_search_settings_are_forwarded():
+    space = {"max_depth": [2, 4], "n_estimators": [50, 100]}
+    env = _run({"MODULE": "train_scikit.py", "TRAINING_MODE": "search", "SEARCH_SPACE": space, "SEARCH_FACTOR": 2})
+    assert json.loads(env["SEARCH_SPACE"]) == space
+    assert env["SEARCH_FACTOR"] == "2"
+    assert _run({"MODULE": "train_scikit.py", "SEARCH_SPACE": '{"max_depth": [3]}'})["SEARCH_SPACE"] == '{"max_depth": [3]}'
+
+
+def test_walk_forward_settings_are_forwarded():
+    env = _run({"MODULE": "train_scikit.py", "TRAINING_MODE": "walk_forward", "WALK_FORWARD_GAP": 15, "WALK_FORWARD_MAX_TRAIN_SIZE": 100000})
+    assert env["WALK_FORWARD_GAP"] == "15"
+    assert env["WALK_FORWARD_MAX_TRAIN_SIZE"] == "100000"
+
+
+@pytest.mark.parametrize("module", ["train_scikit.py", "predict_scikit.py"])
+def test_dataset_cache_settings_are_forwarded(module):
+    env = _run({"MODULE": module, "DATASET_CACHE_DIR": "/tmp/datasets", "DATASET_CACHE_MAX_BYTES": 2 ** 30, "DATASET_CACHE_S3_SIDECAR": True})
+    assert env["DATASET_CACHE_DIR"] == "/tmp/datasets"
+    assert env["DATASET_CACHE_MAX_BYTES"] == str(2 ** 30)
+    assert env["DATASET_CACHE_S3_SIDECAR"] == "true"
+    assert _env(build_env_vars(module, "bucket"))["DATASET_CACHE_DIR"] == ""
+
+
+def test_incremental_settings_are_forwarded():
+    env = _run({
+        "MODULE": "train_scikit.py",
+        "TRAINING_MODE": "incremental",
+        "INCREMENTAL_CLASSES": [0, 1, 2],
+        "INCREMENTAL_N_FEATURES": 42,
+        "INCREMENTAL_EPOCHS": 3,
+        "INCREMENTAL_TREES_PER_CHUNK": 5,
+    })
+    assert env["INCREMENTAL_CLASSES"] == "0,1,2"
+    assert env["INCREMENTAL_N_FEATURES"] == "42"
+    assert env["INCREMENTAL_EPOCHS"] == "3"
+    assert env["INCREMENTAL_TREES_PER_CHUNK"] == "5"
+    assert _run({"MODULE": "train_scikit.py", "INCREMENTAL_CLASSES": "0,1"})["INCREMENTAL_CLASSES"] == "0,1"
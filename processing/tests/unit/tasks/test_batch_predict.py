@@ -0,0 +1,92 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from sklearn.ensemble import RandomForestClassifier
+
+from tasks.batch_predict import CANDLE_KEY_COLUMN, iter_keyed_chunks, parse_key_column, predict_to_s3
+from tasks.incremental import list_shards
+from tasks.matrix_io import binary_paths
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+FIRST_START = 1700000000
+
+
+def _candles(n_rows, first=FIRST_START, seed=0):
+    rng = np.random.RandomState(seed)
+    starts = first + 60 * np.arange(n_rows)
+    X = np.column_stack([starts, rng.normal(size=(n_rows, 2))])
+    y = (X[:, 1] > 0).astype(int)
+    return X, y
+
+
+def _put_shard(s3, key, X, y, binary=False):
+    rows = "".join(f"{label} " + " ".join(f"{i + 1}:{value!r}" for i, value in enumerate(row)) + "\n" for row, label in zip(X.tolist(), y))
+    s3.put_object(Bucket=BUCKET, Key=key, Body=rows.encode("utf-8"))
+    if binary:
+        for path, array in zip(binary_paths(key), (X.astype(np.float32), y.astype(np.int32))):
+            buffer = io.BytesIO()
+            np.save(buffer, array)
+            s3.put_object(Bucket=BUCKET, Key=path, Body=buffer.getvalue())
+
+
+def _model():
+    X, y = _candles(200, seed=1)
+    return RandomForestClassifier(n_estimators=5, max_depth=3, random_state=0).fit(X, y)
+
+
+def test_parse_key_column():
+    assert parse_key_column(None) is None
+    assert parse_key_column("", data_type="candle") == 0
+    assert parse_key_column(None, data_type="order") is None
+    assert parse_key_column("none", data_type="candle") is None
+    assert parse_key_column("2") == 2
+    assert parse_key_column("none") is None
+
+
+def test_iter_keyed_chunks_reads_exact_starts(mock_aws_s3):
+    X, y = _candles(25)
+    _put_shard(mock_aws_s3, "in/part-0.libsvm", X[:10], y[:10])
+    _put_shard(mock_aws_s3, "in/part-1.libsvm", X[10:], y[10:], binary=True)
+    chunks = list(iter_keyed_chunks(mock_aws_s3, BUCKET, list_shards(mock_aws_s3, BUCKET, "in/"), chunk_rows=4, n_features=3, key_column=CANDLE_KEY_COLUMN))
+    assert [len(keys) for keys, _ in chunks] == [4, 4, 2, 4, 4, 4, 3]
+    # starts beyond float32 precision come back exactly from the text shards
+    np.testing.assert_array_equal(np.concatenate([keys for keys, _ in chunks]), X[:, 0].astype(np.int64))
+
+
+def test_iter_keyed_chunks_by_position_uses_binary_matrices(mock_aws_s3):
+    X, y = _candles(6)
+    _put_shard(mock_aws_s3, "in/part-0.libsvm", X, y, binary=True)
+    chunks = list(iter_keyed_chunks(mock_aws_s3, BUCKET, list_shards(mock_aws_s3, BUCKET, "in/"), chunk_rows=4, key_column=None))
+    assert [keys.tolist() for keys, _ in chunks] == [[0, 1, 2, 3], [4, 5]]
+    assert chunks[0][1].dtype == np.float32
+
+
+@pytest.mark.parametrize("output_format", ["npy", "csv"])
+def test_predict_to_s3(mock_aws_s3, output_format):
+    model = _model()
+    X, y = _candles(50, first=FIRST_START + 60 * 200)
+    _put_shard(mock_aws_s3, "in/part-0.libsvm", X[:30], y[:30])
+    _put_shard(mock_aws_s3, "in/part-1.libsvm", X[30:], y[30:])
+    rows = predict_to_s3(
+        mock_aws_s3, model, BUCKET, "in/", "out/predictions", output_format=output_format, chunk_rows=8, key_column=CANDLE_KEY_COLUMN,
+    )
+    assert rows == 50
+    body = mock_aws_s3.get_object(Bucket=BUCKET, Key="out/predictions")["Body"].read()
+    if output_format == "npy":
+        records = np.load(io.BytesIO(body))
+        starts, predictions = records["start"], records["prediction"]
+    else:
+        header, *lines = body.decode("utf-8").splitlines()
+        assert header == "start,prediction"
+        starts = np.array([int(line.split(",")[0]) for line in lines])
+        predictions = np.array([float(line.split(",")[1]) for line in lines])
+    np.testing.assert_array_equal(starts, X[:, 0].astype(np.int64))
+    np.testing.assert_array_equal(predictions, model.predict_proba(X)[:, 1])
+
+
+def test_predict_to_s3_without_shards(mock_aws_s3):
+    with pytest.raises(ValueError):
+        predict_to_s3(mock_aws_s3, _model(), BUCKET, "missing/", "out/predictions")
@@ -0,0 +1,35 @@
+import os
+
+from tasks.checkpoint import empty_manifest, is_current, load_manifest, manifest_key, save_manifest
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def test_manifest_key_is_outside_output_prefix():
+    assert manifest_key("coinbase/BTC-USD/libsvm/") == "coinbase/BTC-USD/libsvm.manifest.json"
+
+
+def test_load_manifest_missing(mock_aws_s3):
+    assert load_manifest(mock_aws_s3, BUCKET, "missing.manifest.json", "candle") == empty_manifest("candle")
+
+
+def test_manifest_round_trip_and_data_type_mismatch(mock_aws_s3):
+    manifest = empty_manifest("candle")
+    manifest["segments"]["a.csv"] = {"etag": '"abc"', "output": "out/a.libsvm"}
+    save_manifest(mock_aws_s3, BUCKET, "out.manifest.json", manifest)
+
+    loaded = load_manifest(mock_aws_s3, BUCKET, "out.manifest.json", "candle")
+    assert is_current(loaded, {"Key": "a.csv", "ETag": '"abc"'})
+    assert not is_current(loaded, {"Key": "a.csv", "ETag": '"def"'})
+    assert not is_current(loaded, {"Key": "b.csv", "ETag": '"abc"'})
+    assert load_manifest(mock_aws_s3, BUCKET, "out.manifest.json", "order") == empty_manifest("order")
+
+
+def test_layout_or_engine_change_invalidates_manifest(mock_aws_s3):
+    manifest = empty_manifest("candle", "sharded", "vectorized")
+    manifest["segments"]["a.csv"] = {"etag": '"abc"', "output": "out/a.libsvm"}
+    save_manifest(mock_aws_s3, BUCKET, "out.manifest.json", manifest)
+
+    assert load_manifest(mock_aws_s3, BUCKET, "out.manifest.json", "candle", "sharded", "vectorized")["segments"]
+    assert load_manifest(mock_aws_s3, BUCKET, "out.manifest.json", "candle", "concatenated", "vectorized")["segments"] == {}
+    assert load_manifest(mock_aws_s3, BUCKET, "out.manifest.json", "candle", "sharded", "row")["segments"] == {}
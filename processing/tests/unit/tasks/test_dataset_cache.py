@@ -0,0 +1,109 @@
+import os
+import time
+
+import numpy as np
+from scipy import sparse
+from unittest.mock import MagicMock
+
+from tasks.dataset_cache import DatasetCache
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def _put_libsvm(s3, key, body=b"0 1:1 2:2\n1 1:3 2:4\n"):
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+
+def test_fetch_caches_by_etag(mock_aws_s3, tmp_path):
+    from sklearn.datasets import load_svmlight_file
+    _put_libsvm(mock_aws_s3, "p/train.libsvm")
+    cache = DatasetCache(str(tmp_path / "cache"))
+    load = MagicMock(side_effect=load_svmlight_file)
+    local = str(tmp_path / "train.libsvm")
+
+    X, y = cache.fetch(mock_aws_s3, BUCKET, "p/train.libsvm", local, load)
+    X_again, y_again = cache.fetch(mock_aws_s3, BUCKET, "p/train.libsvm", local, load)
+    assert load.call_count == 1
+    assert sparse.issparse(X_again)
+    np.testing.assert_array_equal(X_again.toarray(), [[1, 2], [3, 4]])
+    np.testing.assert_array_equal(y_again, [0, 1])
+
+    _put_libsvm(mock_aws_s3, "p/train.libsvm", b"1 1:5 2:6\n")
+    X_new, _ = cache.fetch(mock_aws_s3, BUCKET, "p/train.libsvm", local, load)
+    assert load.call_count == 2
+    assert X_new.shape == (1, 2)
+
+
+def test_fetch_revalidates_binary_matrices(mock_aws_s3, tmp_path):
+    import io
+    from sklearn.datasets import load_svmlight_file
+    from tasks.matrix_io import load_binary
+
+    def put_npy(key, array):
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        mock_aws_s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+
+    _put_libsvm(mock_aws_s3, "p/train.libsvm")
+    put_npy("p/train.X.npy", np.array([[1, 2], [3, 4]], dtype=np.float32))
+    put_npy("p/train.y.npy", np.array([0, 1], dtype=np.int32))
+    cache = DatasetCache(str(tmp_path / "cache"))
+    load = MagicMock(side_effect=lambda path: load_binary(path) or load_svmlight_file(path))
+    local = str(tmp_path / "train.libsvm")
+
+    _, y = cache.fetch(mock_aws_s3, BUCKET, "p/train.libsvm", local, load)
+    np.testing.assert_array_equal(y, [0, 1])
+    # relabelling rewrites the labels array, the libsvm ETag alone would not notice
+    put_npy("p/train.y.npy", np.array([1, 0], dtype=np.int32))
+    _, y = cache.fetch(mock_aws_s3, BUCKET, "p/train.libsvm", local, load)
+    assert load.call_count == 2
+    np.testing.assert_array_equal(y, [1, 0])
+
+
+def test_dense_entries_are_memory_mapped(tmp_path):
+    cache = DatasetCache(str(tmp_path))
+    cache.put("b", "k", '"etag"', np.ones((3, 2), dtype=np.float32), np.zeros(3))
+    X, y = cache.get("b", "k", "etag")
+    assert isinstance(X, np.memmap) and X.dtype == np.float32
+    assert cache.get("b", "k", "other") is None
+
+
+def test_lru_eviction(tmp_path):
+    X = np.zeros((100, 10))
+    cache = DatasetCache(str(tmp_path))
+    cache.put("b", "first", "1", X, np.zeros(100))
+    entry_size = cache.size()
+    cache.max_bytes = 2 * entry_size + 100
+    cache.put("b", "second", "1", X, np.zeros(100))
+    past = time.time() - 60
+    os.utime(cache._entry_dir("b", "second", "1"), (past, past))
+    assert cache.get("b", "first", "1") is not None
+    cache.put("b", "third", "1", X, np.zeros(100))
+    assert cache.get("b", "second", "1") is None
+    assert cache.get("b", "first", "1") is not None
+    assert cache.get("b", "third", "1") is not None
+    assert cache.size() <= cache.max_bytes
+
+
+def test_s3_sidecar_shared_between_caches(mock_aws_s3, tmp_path):
+    _put_libsvm(mock_aws_s3, "p/validation.libsvm")
+    from sklearn.datasets import load_svmlight_file
+    first = DatasetCache(str(tmp_path / "a"), s3_sidecar=True)
+    first.fetch(mock_aws_s3, BUCKET, "p/validation.libsvm", str(tmp_path / "v.libsvm"), load_svmlight_file)
+    etag = mock_aws_s3.head_object(Bucket=BUCKET, Key="p/validation.libsvm")["ETag"]
+    mock_aws_s3.head_object(Bucket=BUCKET, Key=DatasetCache.sidecar_key("p/validation.libsvm", etag))
+
+    second = DatasetCache(str(tmp_path / "b"), s3_sidecar=True)
+    load = MagicMock()
+    X, y = second.fetch(mock_aws_s3, BUCKET, "p/validation.libsvm", str(tmp_path / "v2.libsvm"), load)
+    load.assert_not_called()
+    np.testing.assert_array_equal(X.toarray(), [[1, 2], [3, 4]])
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("DATASET_CACHE_DIR", raising=False)
+    assert DatasetCache.from_env() is None
+    monkeypatch.setenv("DATASET_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("DATASET_CACHE_MAX_BYTES", "1024")
+    cache = DatasetCache.from_env()
+    assert cache.max_bytes == 1024 and not cache.s3_sidecar
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from unittest.mock import patch
+from scipy import sparse
+from sklearn.pipeline import Pipeline
+
+from tasks.estimators import (
+    ESTIMATORS,
+    best_iteration,
+    create_estimator,
+    early_stopping_iteration,
+    final_estimator,
+    fit_estimator,
+)
+
+HYPERPARAMS = {
+    "max_depth": 3,
+    "learning_rate": 0.3,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "min_child_weight": 1,
+    "n_estimators": 20,
+    "early_stopping_rounds": 5,
+    "n_jobs": 1,
+    "random_state": 0,
+}
+
+
+def _dataset(n_rows, seed=0, noise=0.1):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = (X[:, 0] - X[:, 1] + noise * rng.normal(size=n_rows) > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("name", sorted(ESTIMATORS))
+def test_estimators_fit_sparse_libsvm_input(name):
+    X, y = _dataset(300)
+    X_val, y_val = _dataset(100, seed=1)
+    model = fit_estimator(create_estimator(name, HYPERPARAMS), sparse.csr_matrix(X), y, sparse.csr_matrix(X_val), y_val, 5)
+    assert model.predict_proba(sparse.csr_matrix(X_val)).shape == (100, 2)
+    assert (model.predict(X_val) == y_val).mean() > 0.85
+    assert best_iteration(model) <= 20
+
+
+def test_create_estimator_unknown():
+    with pytest.raises(ValueError):
+        create_estimator("xgboost", HYPERPARAMS)
+
+
+def test_forest_maps_xgboost_hyperparameters():
+    forest = create_estimator("random_forest", HYPERPARAMS)
+    assert (forest.max_features, forest.max_samples, forest.n_estimators) == (0.8, 0.8, 20)
+
+
+def test_early_stopping_iteration():
+    assert early_stopping_iteration([5, 4, 3, 3.5, 3.6, 3.7, 2.0], 3) == 3
+    assert early_stopping_iteration([5, 4, 3, 3.5, 2.0], 3) == 5
+    assert early_stopping_iteration([1.0], 3) == 1
+
+
+def test_hist_gradient_boosting_stops_on_validation_set():
+    # noisy labels and a high learning rate overfit quickly
+    X, y = _dataset(400, noise=3.0)
+    X_val, y_val = _dataset(400, seed=1, noise=3.0)
+    params = dict(HYPERPARAMS, learning_rate=1.0, n_estimators=200, max_depth=6)
+    model = fit_estimator(create_estimator("hist_gradient_boosting", params), X, y, X_val, y_val, 5)
+    assert isinstance(model, Pipeline)
+    kept = best_iteration(model)
+    assert kept < 200
+    assert final_estimator(model).n_iter_ == kept
+
+
+def test_early_stopping_stops_growing_once_the_loss_stalls():
+    X, y = _dataset(400, noise=3.0)
+    X_val, y_val = _dataset(400, seed=1, noise=3.0)
+    params = dict(HYPERPARAMS, learning_rate=1.0, n_estimators=200, max_depth=6)
+    model = create_estimator("hist_gradient_boosting", params)
+    booster = final_estimator(model)
+    grown = []
+    fit = booster.fit
+    with patch.object(booster, "fit", side_effect=lambda *args: grown.append(booster.max_iter) or fit(*args)):
+        fit_estimator(model, X, y, X_val, y_val, 5)
+    kept = best_iteration(model)
+    # grown in steps until 5 iterations without improvement, then refit up to the best
+    *growth, refit = grown
+    assert growth == sorted(growth) and max(growth) < 200
+    assert refit == kept
+    assert booster.max_iter == kept and booster.n_iter_ == kept and not booster.warm_start
+    reference = create_estimator("hist_gradient_boosting", dict(params, n_estimators=kept)).fit(X, y)
+    np.testing.assert_allclose(model.predict_proba(X_val), reference.predict_proba(X_val))
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, recall_score, roc_auc_score
+
+from tasks.evaluation import CURVE_THRESHOLDS, ScoreHistogram, binary_metrics, stratified_sample
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_binary_metrics_match_sklearn(seed):
+    rng = np.random.RandomState(seed)
+    y = rng.randint(0, 2, size=500)
+    # rounding creates ties, which the AUC has to handle like roc_auc_score
+    scores = np.round(np.clip(0.5 * y + rng.normal(0.25, 0.3, size=500), 0, 1), 2)
+    metrics = binary_metrics(y, scores, curve_thresholds=CURVE_THRESHOLDS)
+    preds = (scores > 0.5).astype(int)
+    assert metrics["auc"] == pytest.approx(roc_auc_score(y, scores), abs=1e-12)
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(y, preds))
+    tn, fp, fn, tp = confusion_matrix(y, preds).ravel()
+    assert metrics["confusion_matrix"] == {"true_positive": tp, "true_negative": tn, "false_positive": fp, "false_negative": fn}
+    point = next(p for p in metrics["threshold_curve"] if p["threshold"] == 0.3)
+    assert point["precision"] == pytest.approx(precision_score(y, scores > 0.3))
+    assert point["recall"] == pytest.approx(recall_score(y, scores > 0.3))
+
+
+def test_binary_metrics_flat_rows_count_as_wrong_for_accuracy():
+    y = np.array([0, 1, 2, 2, 1])
+    scores = np.array([0.1, 0.9, 0.2, 0.7, 0.4])
+    metrics = binary_metrics(y, scores)
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(y, (scores > 0.5).astype(int)))
+    assert metrics["confusion_matrix"] == {"true_positive": 1, "true_negative": 2, "false_positive": 1, "false_negative": 1}
+
+
+def test_binary_metrics_single_class_and_empty():
+    assert binary_metrics([1, 1, 1], [0.2, 0.6, 0.9])["auc"] is None
+    empty = binary_metrics([], [], curve_thresholds=(0.5,))
+    assert empty["samples"] == 0 and empty["threshold_curve"][0]["precision"] is None
+
+
+def test_stratified_sample_keeps_class_proportions():
+    y = np.array([0] * 900 + [1] * 90 + [2] * 10)
+    sample = stratified_sample(y, 100)
+    assert np.all(np.diff(sample) > 0)
+    assert np.bincount(y[sample]).tolist() == [90, 9, 1]
+    assert stratified_sample(y, 1000) is None
+    assert stratified_sample(y, None) is None
+
+
+def test_score_histogram_matches_binary_metrics():
+    rng = np.random.RandomState(0)
+    y = rng.randint(0, 3, size=5000)
+    scores = np.clip(0.4 * (y == 1) + rng.uniform(0, 0.6, size=5000), 0, 1).astype(np.float32)
+    histogram = ScoreHistogram()
+    for start in range(0, 5000, 700):
+        histogram.add(y[start:start + 700], scores[start:start + 700])
+    streamed = histogram.metrics(curve_thresholds=CURVE_THRESHOLDS)
+    exact = binary_metrics(y, scores, curve_thresholds=CURVE_THRESHOLDS)
+    # thresholds fall on bin edges, only the AUC sees the ties within a bin
+    assert streamed["auc"] == pytest.approx(exact["auc"], abs=1e-3)
+    assert {k: v for k, v in streamed.items() if k != "auc"} == {k: v for k, v in exact.items() if k != "auc"}
+    assert ScoreHistogram().metrics()["samples"] == 0
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from scipy import sparse
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+
+from tasks.flat_ensemble import FlatEnsemble, can_flatten, download_flat_model, upload_flat_model
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def _data(seed=0, n_rows=500, n_features=6):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.5, size=n_rows) > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("forest", [RandomForestClassifier, ExtraTreesClassifier])
+def test_predict_proba_matches_sklearn_exactly(forest):
+    X, y = _data()
+    model = forest(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    flat = FlatEnsemble.compile(model)
+    X_test, _ = _data(seed=1, n_rows=300)
+    np.testing.assert_array_equal(flat.predict_proba(X_test), model.predict_proba(X_test))
+    np.testing.assert_array_equal(flat.predict(X_test), model.predict(X_test))
+
+
+def test_unbounded_depth_multiclass_and_sparse_input():
+    X, y = _data()
+    y = y + (X[:, 2] > 1).astype(int)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    flat = FlatEnsemble.compile(model)
+    X_test, _ = _data(seed=2, n_rows=200)
+    np.testing.assert_array_equal(flat.predict_proba(sparse.csr_matrix(X_test)), model.predict_proba(X_test))
+    np.testing.assert_array_equal(flat.predict(X_test[:1]), model.predict(X_test[:1]))
+
+
+def test_batches_larger_than_batch_rows(monkeypatch):
+    monkeypatch.setattr("tasks.flat_ensemble.BATCH_ROWS", 64)
+    X, y = _data()
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+    np.testing.assert_array_equal(FlatEnsemble.compile(model).predict_proba(X), model.predict_proba(X))
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    X, y = _data()
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+    FlatEnsemble.compile(model).save(str(tmp_path))
+    loaded = FlatEnsemble.load(str(tmp_path))
+    assert isinstance(loaded.threshold, np.memmap)
+    assert loaded.meta["n_trees"] == 5
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+    with pytest.raises(ValueError):
+        loaded.predict_proba(X[:, :3])
+
+
+def test_can_flatten():
+    X, y = _data()
+    assert not can_flatten(RandomForestClassifier())
+    assert can_flatten(RandomForestClassifier(n_estimators=2).fit(X, y))
+    assert not can_flatten(HistGradientBoostingClassifier(max_iter=2).fit(X, y))
+    with pytest.raises(ValueError):
+        FlatEnsemble.compile(HistGradientBoostingClassifier(max_iter=2).fit(X, y))
+
+
+def test_upload_and_download(mock_aws_s3, tmp_path):
+    X, y = _data()
+    model = RandomForestClassifier(n_estimators=3, max_depth=3, random_state=0).fit(X, y)
+    FlatEnsemble.compile(model).save(str(tmp_path / "out"))
+    upload_flat_model(mock_aws_s3, BUCKET, "k/trained_model/flat_model", str(tmp_path / "out"))
+    download_flat_model(mock_aws_s3, BUCKET, "k/trained_model/flat_model", str(tmp_path / "in"))
+    np.testing.assert_array_equal(FlatEnsemble.load(str(tmp_path / "in")).predict_proba(X), model.predict_proba(X))
@@ -0,0 +1,157 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+
+from tasks.incremental import (
+    RowReservoir,
+    ShardStream,
+    create_incremental_estimator,
+    evaluate_incremental,
+    list_shards,
+    parse_classes,
+    parse_libsvm_lines,
+    train_incremental,
+)
+from tasks.matrix_io import binary_paths
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def _dataset(n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n_rows, 3))
+    y = (X[:, 0] + 0.1 * rng.normal(size=n_rows) > 0).astype(int)
+    return X, y
+
+
+def _libsvm(X, y):
+    return "".join(
+        f"{label} " + " ".join(f"{i + 1}:{value}" for i, value in enumerate(row)) + "\n" for row, label in zip(X, y)
+    ).encode("utf-8")
+
+
+def _put_npy(s3, key, array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+
+
+def test_parse_classes():
+    assert parse_classes(None).tolist() == [0, 1]
+    assert parse_classes("2, 0,1").tolist() == [0, 1, 2]
+
+
+def test_create_incremental_estimator():
+    model, dense = create_incremental_estimator("naive_bayes", {})
+    assert dense and hasattr(model, "partial_fit")
+    with pytest.raises(ValueError):
+        create_incremental_estimator("xgboost", {})
+
+
+def test_parse_libsvm_lines_pads_to_width():
+    X, y = parse_libsvm_lines(["1 1:0.5", "0 2:1.5"], n_features=4)
+    assert X.shape == (2, 4) and X.dtype == np.float32
+    assert y.tolist() == [1, 0]
+
+
+def test_list_shards_skips_concatenated_segments(mock_aws_s3):
+    for key in ["d/train/train.libsvm", "d/train/train.libsvm.shards/a.libsvm", "d/train/b.libsvm", "d/train/notes.json"]:
+        mock_aws_s3.put_object(Bucket=BUCKET, Key=key, Body=b"0 1:1\n")
+    for key in binary_paths("d/train/b.libsvm"):
+        mock_aws_s3.put_object(Bucket=BUCKET, Key=key, Body=b"")
+    assert list_shards(mock_aws_s3, BUCKET, "d/train/") == [("d/train/b.libsvm", True), ("d/train/train.libsvm", False)]
+
+
+def test_shard_stream_reads_libsvm_and_binary_in_chunks(mock_aws_s3):
+    X, y = _dataset(25)
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="d/train/a.libsvm", Body=_libsvm(X[:10], y[:10]))
+    x_key, y_key = binary_paths("d/train/b.libsvm")
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="d/train/b.libsvm", Body=b"")
+    _put_npy(mock_aws_s3, x_key, X[10:].astype(np.float32))
+    _put_npy(mock_aws_s3, y_key, y[10:].astype(np.int32))
+
+    stream = ShardStream(mock_aws_s3, BUCKET, "d/train/", chunk_rows=4)
+    chunks = list(stream)
+    assert [chunk[0].shape[0] for chunk in chunks] == [4, 4, 2, 4, 4, 4, 3]
+    assert stream.n_features == 3
+    np.testing.assert_allclose(np.vstack([c[0].toarray() if hasattr(c[0], "toarray") else c[0] for c in chunks]), X, rtol=1e-6)
+    assert np.concatenate([c[1] for c in chunks]).tolist() == y.tolist()
+
+
+def test_shard_stream_requires_shards(mock_aws_s3):
+    with pytest.raises(ValueError):
+        ShardStream(mock_aws_s3, BUCKET, "missing/")
+
+
+@pytest.mark.parametrize("name", ["sgd", "naive_bayes", "mlp", "random_forest"])
+def test_train_incremental_learns_from_chunks(name):
+    X, y = _dataset(400)
+    chunks = [(X[i:i + 50], y[i:i + 50]) for i in range(0, 400, 50)]
+    model, dense = create_incremental_estimator(name, {"max_depth": 3})
+    sample = RowReservoir(100)
+    model, n_rows = train_incremental(model, chunks, np.array([0, 1]), dense=dense, epochs=5, trees_per_chunk=2, sample=sample)
+    assert n_rows == 400
+    X_val, y_val = _dataset(200, seed=1)
+    metrics = evaluate_incremental(model, sample, [(X_val[:120], y_val[:120]), (X_val[120:], y_val[120:])], dense=dense)
+    assert metrics["val_accuracy"] > 0.8
+    assert metrics["validation_samples"] == 200
+    assert metrics["train_samples_scored"] == 100
+    if name == "random_forest":
+        assert len(model.estimators_) == 5 * len(chunks) * 2
+
+
+def test_warm_start_forest_carries_single_class_chunks():
+    X, y = _dataset(60)
+    order = np.argsort(y)
+    X, y = X[order], y[order]
+    chunks = [(X[:20], y[:20]), (X[20:40], y[20:40]), (X[40:], y[40:])]
+    model = RandomForestClassifier(n_estimators=0, warm_start=True, max_depth=2, random_state=0)
+    model, _ = train_incremental(model, chunks, np.array([0, 1]), trees_per_chunk=3)
+    assert model.classes_.tolist() == [0, 1]
+    assert all(tree.n_classes_ == 2 for tree in model.estimators_)
+
+
+def test_warm_start_forest_caps_the_carry(caplog):
+    X, y = _dataset(200)
+    ones = np.flatnonzero(y == 1)[:100]
+    # a one-sided stretch longer than the cap, then chunks with both classes
+    chunks = [(X[ones[i:i + 10]], y[ones[i:i + 10]]) for i in range(0, 60, 10)] + [(X[:50], y[:50]), (X[50:100], y[50:100])]
+    model = RandomForestClassifier(n_estimators=0, warm_start=True, max_depth=2, random_state=0)
+    model, n_rows = train_incremental(model, chunks, np.array([0, 1]), trees_per_chunk=2)
+    assert n_rows == 160
+    assert "Skipped 40 rows" in caplog.text
+    assert len(model.estimators_) == 4
+
+
+def test_warm_start_forest_stacks_sparse_and_dense_chunks():
+    X, y = _dataset(60)
+    order = np.argsort(y)
+    X, y = X[order], y[order]
+    chunks = [(sparse.csr_matrix(X[:20]), y[:20]), (X[20:], y[20:])]
+    model = RandomForestClassifier(n_estimators=0, warm_start=True, max_depth=2, random_state=0)
+    model, _ = train_incremental(model, chunks, np.array([0, 1]), trees_per_chunk=3)
+    assert len(model.estimators_) == 3
+
+
+def test_row_reservoir_keeps_a_bounded_uniform_sample():
+    X = np.arange(1000, dtype=float).reshape(-1, 1)
+    y = np.arange(1000) % 2
+    reservoir = RowReservoir(100, random_state=0)
+    for start in range(0, 1000, 64):
+        reservoir.add(sparse.csr_matrix(X[start:start + 64]) if start % 128 else X[start:start + 64], y[start:start + 64])
+    assert reservoir.X.shape == (100, 1) and reservoir.seen == 1000
+    rows = reservoir.X.toarray().ravel()
+    # in stream order, each row paired with its own label, drawn from the whole stream
+    assert np.all(np.diff(rows) > 0)
+    np.testing.assert_array_equal(reservoir.y, rows.astype(int) % 2)
+    assert rows.min() < 200 and rows.max() > 800
+
+    everything = RowReservoir(None)
+    everything.add(X[:10], y[:10])
+    everything.add(X[10:20], y[10:20])
+    assert everything.X.shape == (20, 1)
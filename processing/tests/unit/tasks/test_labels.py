@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from tasks.labels import DOWN, FLAT, UP, classify, forward_labels, forward_returns, label_columns, parse_horizons
+
+
+def test_forward_returns():
+    close = np.array([100.0, 101.0, 99.0, 99.0, 102.0])
+    out = forward_returns(close, 2)
+    np.testing.assert_allclose(out[:3], [99 / 100 - 1, 99 / 101 - 1, 102 / 99 - 1])
+    assert np.isnan(out[3:]).all()
+    assert np.isnan(forward_returns(close, 10)).all()
+
+
+def test_classify():
+    returns = np.array([0.01, -0.01, 0.0001, -0.0005, np.nan])
+    assert classify(returns, 0.0005).tolist() == [UP, DOWN, FLAT, FLAT, -1]
+
+
+def test_classify_is_binary_by_default():
+    returns = np.array([0.01, -0.01, 0.0, np.nan])
+    assert classify(returns).tolist() == [UP, DOWN, DOWN, -1]
+
+
+def test_forward_labels_one_column_per_horizon():
+    close = np.arange(1.0, 31.0)
+    returns, labels = forward_labels(close, [1, 5, 15], flat_threshold=0.0)
+    assert returns.shape == labels.shape == (30, 3)
+    for j, h in enumerate([1, 5, 15]):
+        np.testing.assert_allclose(returns[:30 - h, j], close[h:] / close[:-h] - 1)
+        assert (labels[:30 - h, j] == UP).all()
+        assert (labels[30 - h:, j] == -1).all()
+    assert label_columns([1, 5]) == ["forward_return_1", "forward_return_5", "label_1", "label_5"]
+
+
+def test_parse_horizons():
+    assert parse_horizons(None) is None
+    assert parse_horizons(" ") is None
+    assert parse_horizons("1, 5,15") == [1, 5, 15]
+    with pytest.raises(ValueError):
+        parse_horizons("0,5")
@@ -0,0 +1,64 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from tasks.matrix_io import NpyWriter, binary_paths, download_matrices, load_binary
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def test_binary_paths():
+    assert binary_paths("a/train.libsvm") == ("a/train.X.npy", "a/train.y.npy")
+    assert binary_paths("predict") == ("predict.X.npy", "predict.y.npy")
+
+
+def test_npy_writer_round_trip(mock_aws_s3):
+    chunks = [np.arange(12, dtype=np.float64).reshape(4, 3), np.ones((2, 3))]
+    with NpyWriter(mock_aws_s3, BUCKET, "m.X.npy", np.float32, columns=3) as writer:
+        for chunk in chunks:
+            writer.append(chunk)
+    body = mock_aws_s3.get_object(Bucket=BUCKET, Key="m.X.npy")["Body"].read()
+    array = np.load(io.BytesIO(body))
+    assert array.dtype == np.float32
+    np.testing.assert_array_equal(array, np.vstack(chunks))
+
+
+def test_npy_writer_empty_and_shape_errors(mock_aws_s3):
+    with NpyWriter(mock_aws_s3, BUCKET, "empty.y.npy", np.int32) as writer:
+        with pytest.raises(ValueError):
+            writer.append(np.zeros((2, 2)))
+    body = mock_aws_s3.get_object(Bucket=BUCKET, Key="empty.y.npy")["Body"].read()
+    assert np.load(io.BytesIO(body)).shape == (0,)
+
+
+def test_load_binary_memory_maps(tmp_path):
+    path = str(tmp_path / "train.libsvm")
+    assert load_binary(path) is None
+    x_path, y_path = binary_paths(path)
+    np.save(x_path, np.ones((3, 2), dtype=np.float32))
+    np.save(y_path, np.array([0, 1, 1], dtype=np.int32))
+    X, y = load_binary(path)
+    assert isinstance(X, np.memmap) and X.shape == (3, 2)
+    assert y.tolist() == [0, 1, 1]
+
+
+def test_download_matrices_prefers_binary(mock_aws_s3, tmp_path):
+    for key in binary_paths("p/train.libsvm"):
+        buffer = io.BytesIO()
+        np.save(buffer, np.zeros(2, dtype=np.float32))
+        mock_aws_s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+    local = str(tmp_path / "train.libsvm")
+    download_matrices(mock_aws_s3, BUCKET, "p/train.libsvm", local)
+    assert load_binary(local) is not None
+    assert not os.path.exists(local)
+
+
+def test_download_matrices_falls_back_to_libsvm(mock_aws_s3, tmp_path):
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="p/validation.libsvm", Body=b"0 1:1\n")
+    local = str(tmp_path / "validation.libsvm")
+    download_matrices(mock_aws_s3, BUCKET, "p/validation.libsvm", local)
+    assert load_binary(local) is None
+    with open(local) as f:
+        assert f.read() == "0 1:1\n"
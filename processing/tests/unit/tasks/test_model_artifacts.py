@@ -0,0 +1,94 @@
+import io
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from sklearn.ensemble import RandomForestClassifier
+
+from tasks.model_artifacts import (
+    ModelCache,
+    artifact_compression,
+    artifact_suffix,
+    load_artifact,
+    mmap_mode_for,
+)
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def _artifact(model, artifact_format):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer, compress=artifact_compression(artifact_format))
+    return buffer.getvalue()
+
+
+def _forest(seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(100, 3))
+    return RandomForestClassifier(n_estimators=5, max_depth=3, random_state=seed).fit(X, (X[:, 0] > 0).astype(int)), X
+
+
+def test_artifact_formats():
+    assert artifact_suffix("mmap") == ".joblib"
+    assert artifact_suffix("compressed") == ".joblib.gz"
+    assert mmap_mode_for("m/xgb_model_v2.joblib") == "r"
+    assert mmap_mode_for("m/xgb_model_v2.joblib.gz") is None
+    with pytest.raises(ValueError):
+        artifact_suffix("onnx")
+
+
+@pytest.mark.parametrize("artifact_format", ["mmap", "compressed"])
+def test_load_artifact_round_trip(tmp_path, artifact_format):
+    model, X = _forest()
+    path = str(tmp_path / f"model{artifact_suffix(artifact_format)}")
+    joblib.dump(model, path, compress=artifact_compression(artifact_format))
+    np.testing.assert_array_equal(load_artifact(path).predict_proba(X), model.predict_proba(X))
+
+
+def test_compressed_artifact_is_smaller(tmp_path):
+    model, _ = _forest()
+    assert len(_artifact(model, "compressed")) < len(_artifact(model, "mmap"))
+
+
+def test_model_cache_revalidates_with_conditional_get(mock_aws_s3, tmp_path):
+    model, X = _forest()
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="m/model.joblib", Body=_artifact(model, "mmap"))
+    cache = ModelCache(str(tmp_path))
+    calls = []
+    get_object = mock_aws_s3.get_object
+
+    def recording_get_object(**kwargs):
+        calls.append(kwargs.get("IfNoneMatch"))
+        return get_object(**kwargs)
+
+    mock_aws_s3.get_object = recording_get_object
+    first = cache.load(mock_aws_s3, BUCKET, "m/model.joblib")
+    second = cache.load(mock_aws_s3, BUCKET, "m/model.joblib")
+    assert second is first
+    assert calls[0] is None and calls[1] is not None
+    np.testing.assert_array_equal(first.predict_proba(X), model.predict_proba(X))
+
+    # a fresh process reuses the file on disk without downloading it
+    path, etag = ModelCache(str(tmp_path)).fetch(mock_aws_s3, BUCKET, "m/model.joblib")
+    assert etag == calls[1].strip('"')
+
+
+def test_model_cache_refreshes_changed_model(mock_aws_s3, tmp_path):
+    old, X = _forest(0)
+    new, _ = _forest(1)
+    cache = ModelCache(str(tmp_path))
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="m/model.joblib.gz", Body=_artifact(old, "compressed"))
+    cache.load(mock_aws_s3, BUCKET, "m/model.joblib.gz")
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="m/model.joblib.gz", Body=_artifact(new, "compressed"))
+    reloaded = cache.load(mock_aws_s3, BUCKET, "m/model.joblib.gz")
+    np.testing.assert_array_equal(reloaded.predict_proba(X), new.predict_proba(X))
+    assert len([name for name in os.listdir(str(tmp_path)) if not name.startswith(".")]) == 1
+
+
+def test_model_cache_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("MODEL_CACHE_DIR", raising=False)
+    assert ModelCache.from_env() is None
+    monkeypatch.setenv("MODEL_CACHE_DIR", str(tmp_path / "models"))
+    assert ModelCache.from_env().directory == str(tmp_path / "models")
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pytest
+
+from sklearn.ensemble import RandomForestClassifier
+
+import tasks.multi_predict as multi
+from tasks.flat_ensemble import FlatEnsemble, upload_flat_model
+from tasks.multi_predict import load_manifest, parse_manifest, run_manifest
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+@pytest.fixture(autouse=True)
+def worker_state(monkeypatch):
+    monkeypatch.setattr(multi, "_worker_s3", None)
+    monkeypatch.setattr(multi, "_worker_models", {})
+
+
+def _candles(n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    X = np.column_stack([1700000000 + 60 * np.arange(n_rows), rng.normal(size=(n_rows, 2))])
+    return X, (X[:, 1] > 0).astype(int)
+
+
+def _put_input(s3, key, X, y):
+    rows = "".join(f"{label} " + " ".join(f"{i + 1}:{value!r}" for i, value in enumerate(row)) + "\n" for row, label in zip(X.tolist(), y))
+    s3.put_object(Bucket=BUCKET, Key=key, Body=rows.encode("utf-8"))
+
+
+def _put_model(s3, key, seed=0):
+    X, y = _candles(200, seed=seed)
+    model = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=seed).fit(X, y)
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+    return model
+
+
+def _read_predictions(s3, key):
+    return np.load(io.BytesIO(s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()))
+
+
+def test_parse_manifest():
+    jobs = parse_manifest(json.dumps([{"product_id": "BTC-USD", "model_s3_key": "m.joblib", "input_s3_key": "in/btc/"}]))
+    assert jobs[0]["output_s3_key"] == "in/btc.predictions.npy"
+    with pytest.raises(ValueError):
+        parse_manifest("[]")
+    with pytest.raises(ValueError):
+        parse_manifest(json.dumps([{"product_id": "BTC-USD", "input_s3_key": "in/"}]))
+    with pytest.raises(ValueError):
+        parse_manifest(json.dumps([{"product_id": "BTC-USD", "model_s3_key": "m", "flat_model_s3_prefix": "f", "input_s3_key": "in/"}]))
+
+
+def test_load_manifest_from_s3(mock_aws_s3):
+    manifest = [{"product_id": "ETH-USD", "flat_model_s3_prefix": "f", "input_s3_key": "in/eth/", "output_s3_key": "out/eth.npy"}]
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="manifest.json", Body=json.dumps(manifest).encode("utf-8"))
+    assert load_manifest(mock_aws_s3, BUCKET, manifest_s3_key="manifest.json") == manifest
+    with pytest.raises(ValueError):
+        load_manifest(mock_aws_s3, BUCKET)
+
+
+def test_run_manifest(mock_aws_s3, tmp_path):
+    shared = _put_model(mock_aws_s3, "models/shared.joblib")
+    flat_source = _put_model(mock_aws_s3, "models/unused.joblib", seed=1)
+    FlatEnsemble.compile(flat_source).save(str(tmp_path / "flat"))
+    upload_flat_model(mock_aws_s3, BUCKET, "models/flat", str(tmp_path / "flat"))
+    inputs = {}
+    for product, seed in (("BTC-USD", 2), ("ETH-USD", 3), ("SOL-USD", 4)):
+        inputs[product] = _candles(40, seed=seed)
+        _put_input(mock_aws_s3, f"in/{product}/part-0.libsvm", *inputs[product])
+    jobs = parse_manifest(json.dumps([
+        {"product_id": "BTC-USD", "model_s3_key": "models/shared.joblib", "input_s3_key": "in/BTC-USD/"},
+        {"product_id": "ETH-USD", "model_s3_key": "models/shared.joblib", "input_s3_key": "in/ETH-USD/"},
+        {"product_id": "SOL-USD", "flat_model_s3_prefix": "models/flat", "input_s3_key": "in/SOL-USD/"},
+        {"product_id": "ADA-USD", "model_s3_key": "models/shared.joblib", "input_s3_key": "in/ADA-USD/"},
+        {"product_id": "XRP-USD", "model_s3_key": "models/missing.joblib", "input_s3_key": "in/BTC-USD/"},
+    ]))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = run_manifest(mock_aws_s3, BUCKET, jobs, str(tmp_path / "models"), 2, chunk_rows=16, executor=executor)
+    assert [result["product_id"] for result in results] == ["BTC-USD", "ETH-USD", "SOL-USD", "ADA-USD", "XRP-USD"]
+    for product, model in (("BTC-USD", shared), ("ETH-USD", shared), ("SOL-USD", flat_source)):
+        X, _ = inputs[product]
+        records = _read_predictions(mock_aws_s3, f"in/{product}.predictions.npy")
+        np.testing.assert_array_equal(records["prediction"], model.predict_proba(X)[:, 1])
+    # no input shards for ADA, no model for XRP; neither stops the other jobs
+    assert "error" in results[3] and "error" in results[4]
+    # the shared model was loaded once
+    assert len(multi._worker_models) == 2
@@ -0,0 +1,79 @@
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tasks.parallel as parallel
+from tasks.parallel import available_cpus, available_memory, memory_bounded_jobs, ordered_map, prefetch
+
+
+def test_available_cpus_override(monkeypatch):
+    monkeypatch.setenv("MAX_WORKERS", "3")
+    assert available_cpus() == 3
+
+
+def test_available_cpus_detected(monkeypatch):
+    monkeypatch.delenv("MAX_WORKERS", raising=False)
+    assert available_cpus() >= 1
+
+
+def test_ordered_map_keeps_order_and_bounds_in_flight():
+    submitted = []
+
+    def items():
+        for i in range(20):
+            submitted.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = ordered_map(executor, lambda x: x * x, items(), window=3)
+        assert next(results) == 0
+        assert len(submitted) == 3
+        assert [0] + list(results) == [i * i for i in range(20)]
+
+
+def test_prefetch_yields_in_order_and_reads_ahead():
+    produced = []
+
+    def items():
+        for i in range(5):
+            produced.append(i)
+            yield i
+
+    consumed = []
+    for item in prefetch(items(), depth=2):
+        time.sleep(0.05)
+        # the producer is already working on the following items
+        assert len(produced) > item + 1 or len(produced) == 5
+        consumed.append(item)
+    assert consumed == [0, 1, 2, 3, 4]
+
+
+def test_prefetch_raises_producer_errors_and_stops_early():
+    def failing():
+        yield 1
+        raise RuntimeError("read failed")
+
+    with pytest.raises(RuntimeError, match="read failed"):
+        list(prefetch(failing()))
+    assert next(iter(prefetch(iter(range(100)), depth=1))) == 0
+
+
+def test_available_memory_reads_the_cgroup_limit(monkeypatch, tmp_path):
+    (tmp_path / "v2.max").write_text("max\n")
+    (tmp_path / "v2.current").write_text("100\n")
+    (tmp_path / "v1.limit").write_text("1000\n")
+    (tmp_path / "v1.usage").write_text("400\n")
+    files = ((str(tmp_path / "v2.max"), str(tmp_path / "v2.current")), (str(tmp_path / "v1.limit"), str(tmp_path / "v1.usage")))
+    monkeypatch.setattr(parallel, "CGROUP_MEMORY_FILES", files)
+    assert available_memory() == 600
+    monkeypatch.setattr(parallel, "CGROUP_MEMORY_FILES", ())
+    assert available_memory() > 0
+
+
+def test_memory_bounded_jobs(monkeypatch):
+    monkeypatch.setattr(parallel, "available_memory", lambda: 1000)
+    assert memory_bounded_jobs(8, 300) == 3
+    assert memory_bounded_jobs(2, 300) == 2
+    assert memory_bounded_jobs(8, 5000) == 1
@@ -0,0 +1,68 @@
+import json
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from tasks.profiling import StageClock, StageProfiler, peak_rss_bytes
+
+
+def test_stage_records_wall_cpu_and_memory(caplog):
+    profiler = StageProfiler("unit", trace_memory=True)
+    with caplog.at_level(logging.INFO, logger="tasks.profiling"):
+        with profiler.stage("sleep"):
+            time.sleep(0.05)
+        with profiler.stage("allocate"):
+            block = np.ones(4 * 1024 * 1024)
+            del block
+    sleep, allocate = profiler.stages
+    assert sleep["stage"] == "sleep" and sleep["wall_seconds"] >= 0.05
+    assert sleep["cpu_seconds"] < sleep["wall_seconds"]
+    assert allocate["peak_traced_bytes"] >= 32 * 1024 * 1024
+    assert allocate["peak_rss_bytes"] <= peak_rss_bytes()
+    metrics = [json.loads(r.message) for r in caplog.records if r.message.startswith("{")]
+    assert [m["stage"] for m in metrics] == ["sleep", "allocate"]
+    assert all(m["metric"] == "stage_profile" and m["task"] == "unit" for m in metrics)
+    assert not tracemalloc.is_tracing()
+
+
+def test_stage_is_recorded_when_it_fails():
+    profiler = StageProfiler("unit", trace_memory=False)
+    with pytest.raises(RuntimeError):
+        with profiler.stage("broken"):
+            raise RuntimeError("fail")
+    assert profiler.stages[0]["stage"] == "broken"
+    assert "peak_traced_bytes" not in profiler.stages[0]
+
+
+def test_summary_and_stage_seconds(monkeypatch):
+    monkeypatch.setenv("PROFILE_TRACEMALLOC", "false")
+    profiler = StageProfiler("unit")
+    for _ in range(2):
+        with profiler.stage("download"):
+            pass
+    summary = profiler.log_summary()
+    assert summary["task"] == "unit"
+    assert len(summary["stages"]) == 2
+    assert profiler.stage_seconds("download") == pytest.approx(sum(s["wall_seconds"] for s in summary["stages"]))
+    json.dumps(summary)
+
+
+def test_stage_clock_sums_intervals():
+    clock = StageClock()
+
+    def slow_items():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    assert list(clock.iterate(slow_items())) == [0, 1, 2]
+    with clock.measure():
+        time.sleep(0.01)
+    assert clock.wall_seconds >= 0.04
+    profiler = StageProfiler("unit", trace_memory=False)
+    profiler.add_clock("download", clock)
+    assert profiler.stage_seconds("download") == pytest.approx(clock.wall_seconds, abs=1e-6)
+    assert profiler.stages[0]["peak_rss_bytes"] > 0
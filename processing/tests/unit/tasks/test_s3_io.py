@@ -0,0 +1,85 @@
+import os
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from tasks.s3_io import (
+    MIN_PART_SIZE,
+    MultipartWriter,
+    get_range,
+    iter_chunks,
+    iter_s3_lines,
+    line_aligned_ranges,
+    next_line_start,
+)
+
+BUCKET = os.environ.get("DATA_COLLECTION_BUCKET_NAME")
+
+
+def test_multipart_writer_small_object_uses_put_object(mock_aws_s3):
+    with MultipartWriter(mock_aws_s3, BUCKET, "small.txt") as writer:
+        writer.write("hello\n")
+        writer.write(b"world\n")
+    assert writer.upload_id is None
+    body = mock_aws_s3.get_object(Bucket=BUCKET, Key="small.txt")["Body"].read()
+    assert body == b"hello\nworld\n"
+
+
+def test_multipart_writer_uploads_parts(mock_aws_s3):
+    line = b"x" * 1023 + b"\n"
+    total = 2 * MIN_PART_SIZE + 4096
+    with MultipartWriter(mock_aws_s3, BUCKET, "large.txt", part_size=1) as writer:
+        for _ in range(total // len(line)):
+            writer.write(line)
+    assert writer.part_size == MIN_PART_SIZE
+    assert len(writer.parts) == 3
+    obj = mock_aws_s3.get_object(Bucket=BUCKET, Key="large.txt")
+    assert obj["ContentLength"] == total
+
+
+def test_multipart_writer_aborts_on_error(mock_aws_s3):
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(mock_aws_s3, BUCKET, "failed.txt") as writer:
+            writer.write(b"x" * MIN_PART_SIZE)
+            raise RuntimeError("conversion failed")
+    assert mock_aws_s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    assert "Contents" not in mock_aws_s3.list_objects_v2(Bucket=BUCKET, Prefix="failed.txt")
+
+
+def test_iter_s3_lines(mock_aws_s3):
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="lines.csv", Body=b"a,1\r\nb,2\nc,3")
+    assert list(iter_s3_lines(mock_aws_s3, BUCKET, "lines.csv", chunk_size=3)) == ["a,1", "b,2", "c,3"]
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.parametrize("range_size", [1, 7, 50, 10000])
+def test_line_aligned_ranges(mock_aws_s3, range_size):
+    body = b"".join(b"%d,%s\n" % (i, b"y" * (i % 13)) for i in range(40)) + b"tail-without-newline"
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="ranged.csv", Body=body)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        ranges = line_aligned_ranges(mock_aws_s3, BUCKET, "ranged.csv", len(body), range_size, executor=executor)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(body)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(body[start - 1:start] == b"\n" for start, _ in ranges[1:])
+    assert b"".join(get_range(mock_aws_s3, BUCKET, "ranged.csv", *r) for r in ranges) == body
+
+
+def test_next_line_start_long_line(mock_aws_s3):
+    body = b"x" * 1000 + b"\nnext\n"
+    mock_aws_s3.put_object(Bucket=BUCKET, Key="long.csv", Body=body)
+    assert next_line_start(mock_aws_s3, BUCKET, "long.csv", 10, len(body), probe_size=16) == 1001
+    assert next_line_start(mock_aws_s3, BUCKET, "long.csv", 1001, len(body)) == 1001
+    assert next_line_start(mock_aws_s3, BUCKET, "long.csv", 1003, len(body)) == len(body)
+
+
+def test_transfer_config_from_env(monkeypatch):
+    from tasks.s3_io import client_config, transfer_config
+    monkeypatch.setenv("TRANSFER_PART_SIZE", str(32 * 1024 * 1024))
+    monkeypatch.setenv("TRANSFER_MAX_CONCURRENCY", "8")
+    config = transfer_config()
+    assert config.multipart_chunksize == config.multipart_threshold == 32 * 1024 * 1024
+    assert config.max_concurrency == 8
+    assert client_config(concurrent_transfers=3).max_pool_connections == 24
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+from scipy import sparse
+
+from tasks.search import (
+    DEFAULT_SEARCH_SPACES,
+    halving_rounds,
+    parse_search_space,
+    run_search,
+    sample_candidates,
+    score_candidate,
+)
+
+BASE = {"max_depth": 3, "learning_rate": 0.3, "n_estimators": 10, "early_stopping_rounds": 3, "random_state": 0}
+SPACE = {"max_depth": [2, 3, 4], "learning_rate": [0.05, 0.3], "n_estimators": [5, 20]}
+
+
+def _dataset(n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + 0.5 * rng.normal(size=n_rows) > 0).astype(int)
+    return X, y
+
+
+def test_parse_search_space():
+    assert parse_search_space(None, "extra_trees") is DEFAULT_SEARCH_SPACES["extra_trees"]
+    assert parse_search_space('{"max_depth": [3, 5]}', "random_forest") == {"max_depth": [3, 5]}
+    with pytest.raises(ValueError):
+        parse_search_space('{"max_depth": 3}', "random_forest")
+
+
+@pytest.mark.parametrize("estimator", sorted(DEFAULT_SEARCH_SPACES))
+def test_sample_candidates_are_json_serializable(estimator):
+    candidates = sample_candidates(DEFAULT_SEARCH_SPACES[estimator], 5)
+    assert len(candidates) == 5
+    assert json.loads(json.dumps(candidates)) == candidates
+    assert all(isinstance(c["max_depth"], int) for c in candidates)
+
+
+def test_halving_rounds():
+    assert halving_rounds(1, 3) == 1
+    assert halving_rounds(3, 3) == 1
+    assert halving_rounds(20, 3) == 3
+
+
+def test_score_candidate_on_row_subset():
+    X, y = _dataset(300)
+    X_val, y_val = _dataset(100, seed=1)
+    score = score_candidate("random_forest", BASE, sparse.csr_matrix(X), y, X_val, y_val, rows=np.arange(120))
+    assert score["training_rows"] == 120
+    assert 0.5 < score["val_auc"] <= 1.0
+
+
+def test_random_search_leaderboard():
+    X, y = _dataset(400)
+    X_val, y_val = _dataset(200, seed=1)
+    leaderboard = run_search("hist_gradient_boosting", BASE, X, y, X_val, y_val, n_candidates=4, space=SPACE, n_jobs=2)
+    assert len(leaderboard) == 4
+    assert [entry["rank"] for entry in leaderboard] == [1, 2, 3, 4]
+    aucs = [entry["val_auc"] for entry in leaderboard]
+    assert aucs == sorted(aucs, reverse=True)
+    assert set(leaderboard[0]["hyperparameters"]) == set(SPACE)
+
+
+def test_halving_search_promotes_to_full_data():
+    X, y = _dataset(3000)
+    X_val, y_val = _dataset(500, seed=1)
+    leaderboard = run_search(
+        "random_forest", BASE, X, y, X_val, y_val, strategy="halving", n_candidates=9, factor=3, space=SPACE, n_jobs=2
+    )
+    assert len(leaderboard) == 9
+    assert leaderboard[0]["training_rows"] == 3000
+    assert [entry["training_rows"] for entry in leaderboard] == sorted((e["training_rows"] for e in leaderboard), reverse=True)
+    assert sum(entry["training_rows"] == 3000 for entry in leaderboard) == 3
+
+
+def test_run_search_rejects_unknown_strategy():
+    X, y = _dataset(50)
+    with pytest.raises(ValueError):
+        run_search("random_forest", BASE, X, y, X, y, strategy="grid")
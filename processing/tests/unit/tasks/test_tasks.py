@@ -1,5 +1,7 @@
 import os
 import sys
+import json
+import numpy as np
 import types
 import pytest
 from unittest.mock import patch, MagicMock
@@ -49,6 +51,278 @@ def test_csv_row_to_libsvm_invalid_label():
     line = fe.csv_row_to_libsvm(row, fe.CANDLE_FEATURE_KEYS, "trend", {"up": 1, "down": 0})
     assert line.startswith("0 ")
 
+def test_s3_csv_to_libsvm_streaming_matches_buffered(mock_aws_s3):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    rows = [f"{i},1.{i},2.{i},0.{i},1.5,{100 + i},{'up' if i % 2 else 'down'}" for i in range(2500)]
+    mock_aws_s3.put_object(Bucket=bucket, Key="data.csv", Body="\n".join(rows) + "\n\n1,2\n")
+    fe.s3_csv_to_libsvm(bucket, "data.csv", "buffered.libsvm", data_type="candle")
+    fe.s3_csv_to_libsvm_streaming(bucket, "data.csv", "streamed.libsvm", data_type="candle", chunk_rows=100)
+    buffered = mock_aws_s3.get_object(Bucket=bucket, Key="buffered.libsvm")["Body"].read()
+    streamed = mock_aws_s3.get_object(Bucket=bucket, Key="streamed.libsvm")["Body"].read()
+    assert streamed == buffered
+    assert streamed.count(b"\n") == 2501
+
+def _engine_output(engine, text, data_type):
+    feature_keys, label_col, label_map = fe.get_schema(data_type)
+    return fe.CONVERSION_ENGINES[engine](text, feature_keys, label_col, label_map)
+
+@pytest.mark.parametrize("data_type,rows", [
+    ("order", [f"{i}.5,{i * 2},0,0.01,{i}.49,{i % 3},0.001,1e-{i % 5},{'BUY' if i % 2 else 'SELL'}" for i in range(500)]),
+    ("candle", [f"{1700000000 + i},1.{i},2.{i},0.{i}, 1.5,{100 + i},{('up', 'down', 'flat')[i % 3]}" for i in range(500)]),
+])
+def test_vectorized_engine_matches_row_engine(data_type, rows):
+    text = "\n".join(rows) + "\n"
+    assert _engine_output("vectorized", text, data_type) == _engine_output("row", text, data_type)
+
+@pytest.mark.parametrize("text", [
+    "",
+    "\n\n",
+    "1,2,3,4,5,6,up\n\n\n7,8,9,10,11,12,down",
+    "start,low,high,open,close,volume,trend\n1,2,3,4,5,6,up\n",
+    "1,2,3,4,5,6,up\n1,2\n",
+    "1,2,3,4,5,6,up,extra\n",
+    '1,2,3,4,"5,5",6,up\n',
+    "1,2,3,4,5,6,up\r\n7,8,9,10,11,12,down\r\n",
+    "1,,3,4,5,,\n",
+])
+def test_vectorized_engine_matches_row_engine_on_irregular_input(text):
+    assert _engine_output("vectorized", text, "candle") == _engine_output("row", text, "candle")
+
+def test_iter_text_chunks_splits_on_line_boundaries():
+    text = "".join(f"{i},{i}\n" for i in range(1000))
+    chunks = list(fe.iter_text_chunks(text, chunk_bytes=100))
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(chunk.endswith("\n") for chunk in chunks)
+
+@pytest.mark.parametrize("engine", ["row", "vectorized"])
+def test_s3_csv_to_libsvm_engines_match(mock_aws_s3, engine):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    rows = [f"{i}.5,{i},0,0.1,{i}.4,1,0.01,2,{'BUY' if i % 2 else 'SELL'}" for i in range(300)]
+    mock_aws_s3.put_object(Bucket=bucket, Key="orders.csv", Body="\n".join(rows) + "\n")
+    fe.s3_csv_to_libsvm(bucket, "orders.csv", "orders.libsvm", data_type="order", engine="row")
+    fe.s3_csv_to_libsvm_streaming(bucket, "orders.csv", f"{engine}.libsvm", data_type="order", chunk_rows=64, engine=engine)
+    expected = mock_aws_s3.get_object(Bucket=bucket, Key="orders.libsvm")["Body"].read()
+    assert mock_aws_s3.get_object(Bucket=bucket, Key=f"{engine}.libsvm")["Body"].read() == expected
+
+def test_get_engine_unsupported():
+    with pytest.raises(ValueError):
+        fe.get_engine("bogus")
+
+def _put_segments(s3, bucket, prefix, n_segments, rows_per_segment=50):
+    for n in range(n_segments):
+        rows = [f"{n}{i},1.{i},2.{i},0.{i},1.5,{100 + i},{'up' if i % 2 else 'down'}" for i in range(rows_per_segment)]
+        s3.put_object(Bucket=bucket, Key=f"{prefix}/{1700000000 + n}.csv", Body="\n".join(rows) + "\n")
+    s3.put_object(Bucket=bucket, Key=f"{prefix}/model.json", Body="{}")
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_s3_prefix_to_libsvm_concatenated(mock_aws_s3, max_workers):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    _put_segments(mock_aws_s3, bucket, "coinbase/BTC-USD/candles", 5)
+    keys = fe.s3_prefix_to_libsvm(
+        bucket, "coinbase/BTC-USD/candles", "all.libsvm", data_type="candle", max_workers=max_workers, download_workers=3
+    )
+    assert keys == ["all.libsvm"]
+    expected = "".join(
+        fe.convert_csv_text(mock_aws_s3.get_object(Bucket=bucket, Key=f"coinbase/BTC-USD/candles/{1700000000 + n}.csv")["Body"].read().decode(), "candle")
+        for n in range(5)
+    )
+    assert mock_aws_s3.get_object(Bucket=bucket, Key="all.libsvm")["Body"].read().decode() == expected
+
+def test_s3_prefix_to_libsvm_sharded(mock_aws_s3):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    _put_segments(mock_aws_s3, bucket, "coinbase/BTC-USD/candles", 3)
+    keys = fe.s3_prefix_to_libsvm(
+        bucket, "coinbase/BTC-USD/candles/", "out", data_type="candle", output_layout="sharded", max_workers=2
+    )
+    assert keys == [f"out/{1700000000 + n}.libsvm" for n in range(3)]
+    shard = mock_aws_s3.get_object(Bucket=bucket, Key=keys[0])["Body"].read()
+    assert shard.count(b"\n") == 50
+
+def test_s3_prefix_to_libsvm_empty_prefix(mock_aws_s3):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    with pytest.raises(ValueError):
+        fe.s3_prefix_to_libsvm(bucket, "nothing/here", "out.libsvm")
+
+@pytest.mark.parametrize("output_layout", ["concatenated", "sharded"])
+def test_s3_prefix_to_libsvm_incremental(mock_aws_s3, output_layout):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    prefix = "coinbase/BTC-USD/candles"
+    _put_segments(mock_aws_s3, bucket, prefix, 3)
+    run = lambda: fe.s3_prefix_to_libsvm(
+        bucket, prefix, "out", data_type="candle", output_layout=output_layout, incremental=True, max_workers=1
+    )
+    run()
+    manifest = json.loads(mock_aws_s3.get_object(Bucket=bucket, Key="out.manifest.json")["Body"].read())
+    assert sorted(manifest["segments"]) == [f"{prefix}/{1700000000 + n}.csv" for n in range(3)]
+
+    with patch.object(fe, "convert_csv_text", wraps=fe.convert_csv_text) as convert:
+        run()
+        convert.assert_not_called()
+        mock_aws_s3.put_object(Bucket=bucket, Key=f"{prefix}/1700000001.csv", Body="1,2,3,4,5,6,up\n")
+        mock_aws_s3.delete_object(Bucket=bucket, Key=f"{prefix}/1700000002.csv")
+        mock_aws_s3.put_object(Bucket=bucket, Key=f"{prefix}/1700000003.csv", Body="7,8,9,10,11,12,down\n")
+        keys = run()
+        assert convert.call_count == 2
+
+    manifest = json.loads(mock_aws_s3.get_object(Bucket=bucket, Key="out.manifest.json")["Body"].read())
+    assert sorted(manifest["segments"]) == [f"{prefix}/{1700000000 + n}.csv" for n in (0, 1, 3)]
+    removed_shard = "out/1700000002.libsvm" if output_layout == "sharded" else "out.shards/1700000002.libsvm"
+    assert "Contents" not in mock_aws_s3.list_objects_v2(Bucket=bucket, Prefix=removed_shard)
+
+    full = fe.s3_prefix_to_libsvm(bucket, prefix, "full", data_type="candle", output_layout=output_layout, max_workers=1)
+    read = lambda key: mock_aws_s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+    assert [read(key) for key in keys] == [read(key) for key in full]
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_s3_csv_to_libsvm_ranged_matches_buffered(mock_aws_s3, monkeypatch, max_workers):
+    monkeypatch.setattr(fe, "MIN_RANGE_SIZE", 1)
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    rows = [f"{i},1.{i},2.{i},0.{i},1.5,{100 + i},{'up' if i % 2 else 'down'}" for i in range(2000)]
+    mock_aws_s3.put_object(Bucket=bucket, Key="large.csv", Body="\n".join(rows) + "\n")
+    fe.s3_csv_to_libsvm(bucket, "large.csv", "buffered.libsvm", data_type="candle")
+    fe.s3_csv_to_libsvm_ranged(
+        bucket, "large.csv", "ranged.libsvm", data_type="candle", range_size=4096, max_workers=max_workers
+    )
+    buffered = mock_aws_s3.get_object(Bucket=bucket, Key="buffered.libsvm")["Body"].read()
+    assert mock_aws_s3.get_object(Bucket=bucket, Key="ranged.libsvm")["Body"].read() == buffered
+
+def test_parse_numeric_chunk():
+    text = "start,open,high,low,close,volume,trend\n1,2,3,4,5,6,up\n7,8,,10,11,12,down\n1,2\n"
+    features, labels = fe.parse_numeric_chunk(text, "candle")
+    assert features.shape == (3, 6)
+    assert np.isnan(features[0]).all()
+    assert np.isnan(features[2, 2])
+    assert labels.tolist() == [0, 1, 0]
+
+def test_s3_series_to_libsvm(mock_aws_s3):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    prefix = "coinbase/BTC-USD/historical"
+    rows = [f"{1700000000 + 60 * i},{100 + i},{101 + i},{99 + i},{100.5 + i},{10 + i % 7},{'up' if i % 2 else 'down'}" for i in range(60)]
+    # newest-first segments with one overlapping candle
+    mock_aws_s3.put_object(Bucket=bucket, Key=f"{prefix}/a.csv", Body="\n".join(reversed(rows[30:])))
+    mock_aws_s3.put_object(Bucket=bucket, Key=f"{prefix}/b.csv", Body="\n".join(reversed(rows[:31])))
+    fe.s3_series_to_libsvm(bucket, prefix, "series.libsvm", data_type="candle", features=["return_1", "sma_20"])
+    lines = mock_aws_s3.get_object(Bucket=bucket, Key="series.libsvm")["Body"].read().decode().splitlines()
+    assert len(lines) == 60 - 19
+    first = lines[0].split(" ")
+    assert first[0] == "1"
+    assert first[1] == "1:1700001140.0"
+    assert first[7] == f"7:{119.5 / 118.5 - 1}"
+    assert float(first[8].split(":")[1]) == pytest.approx(np.mean([100.5 + i for i in range(20)]))
+
+def test_s3_series_to_libsvm_forward_labels_and_relabel(mock_aws_s3):
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    closes = [100, 101, 101, 99, 100, 104, 103, 103, 102, 105]
+    rows = [f"{1700000000 + 60 * i},1,1,1,{c},1,up" for i, c in enumerate(closes)]
+    mock_aws_s3.put_object(Bucket=bucket, Key="candles.csv", Body="\n".join(rows))
+    fe.s3_series_to_libsvm(
+        bucket, "candles.csv", "h.libsvm", data_type="candle", features=[], horizons=[1, 3], flat_threshold=0.001
+    )
+    read = lambda key: mock_aws_s3.get_object(Bucket=bucket, Key=key)["Body"].read().decode()
+    lines = read("h.libsvm").splitlines()
+    assert len(lines) == len(closes) - 3
+    assert [line.split(" ")[0] for line in lines] == ["1", "2", "0", "1", "1", "0", "2"]
+    columns, values = fe.read_labels(mock_aws_s3, bucket, "h.libsvm.labels.csv")
+    assert columns == ["forward_return_1", "forward_return_3", "label_1", "label_3"]
+    assert values[:, 3].tolist() == [0, 0, 1, 1, 1, 0, 1]
+
+    fe.s3_relabel_libsvm(bucket, "h.libsvm", "h3.libsvm", horizon=3, flat_threshold=0.001)
+    relabelled = read("h3.libsvm").splitlines()
+    assert [line.split(" ")[0] for line in relabelled] == ["0", "0", "1", "1", "1", "0", "1"]
+    assert [line.partition(" ")[2] for line in relabelled] == [line.partition(" ")[2] for line in lines]
+    assert read("h3.libsvm.labels.csv") == read("h.libsvm.labels.csv")
+    with pytest.raises(ValueError):
+        fe.s3_relabel_libsvm(bucket, "h.libsvm", "h15.libsvm", horizon=15)
+
+def test_s3_relabel_libsvm_rewrites_binary_labels(mock_aws_s3):
+    import io
+    from tasks.matrix_io import binary_paths
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    closes = [100, 101, 101, 99, 100, 104, 103, 103, 102, 105]
+    rows = [f"{1700000000 + 60 * i},1,1,1,{c},1,up" for i, c in enumerate(closes)]
+    mock_aws_s3.put_object(Bucket=bucket, Key="candles.csv", Body="\n".join(rows))
+    fe.s3_series_to_libsvm(
+        bucket, "candles.csv", "h.libsvm", data_type="candle", features=[], horizons=[1, 3],
+        flat_threshold=0.001, binary_output=True,
+    )
+    load = lambda key: np.load(io.BytesIO(mock_aws_s3.get_object(Bucket=bucket, Key=key)["Body"].read()))
+    horizon_3 = [0, 0, 1, 1, 1, 0, 1]
+
+    fe.s3_relabel_libsvm(bucket, "h.libsvm", "h3.libsvm", horizon=3, flat_threshold=0.001)
+    assert load(binary_paths("h3.libsvm")[1]).tolist() == horizon_3
+    np.testing.assert_array_equal(load(binary_paths("h3.libsvm")[0]), load(binary_paths("h.libsvm")[0]))
+
+    fe.s3_relabel_libsvm(bucket, "h.libsvm", "h.libsvm", horizon=3, flat_threshold=0.001)
+    assert load(binary_paths("h.libsvm")[1]).tolist() == horizon_3
+
+    # a source without matrices clears stale ones at the destination
+    mock_aws_s3.put_object(Bucket=bucket, Key="plain.libsvm", Body=mock_aws_s3.get_object(Bucket=bucket, Key="h.libsvm")["Body"].read())
+    mock_aws_s3.copy_object(Bucket=bucket, Key="plain.libsvm.labels.csv", CopySource={"Bucket": bucket, "Key": "h.libsvm.labels.csv"})
+    fe.s3_relabel_libsvm(bucket, "plain.libsvm", "h3.libsvm", horizon=1, flat_threshold=0.001)
+    listed = [obj["Key"] for obj in mock_aws_s3.list_objects_v2(Bucket=bucket, Prefix="h3.")["Contents"]]
+    assert not any(key.endswith(".npy") for key in listed)
+
+def test_s3_series_to_libsvm_unknown_feature(mock_aws_s3):
+    with pytest.raises(ValueError):
+        fe.s3_series_to_libsvm("bucket", "prefix", "out", data_type="candle", features=["bogus"])
+
+@pytest.mark.parametrize("mode", ["buffered", "stream"])
+def test_binary_output_matches_libsvm(mock_aws_s3, tmp_path, mode):
+    from sklearn.datasets import load_svmlight_file
+    from tasks.matrix_io import load_binary
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    rows = [f"{i}.25,{i},0,0.1,{i}.4,1,0.01,2,{'BUY' if i % 2 else 'SELL'}" for i in range(200)]
+    mock_aws_s3.put_object(Bucket=bucket, Key="orders.csv", Body="\n".join(rows) + "\n")
+    fe.FEATURE_ENGINEERING_MODES[mode](bucket, "orders.csv", "orders.libsvm", data_type="order", binary_output=True)
+    for key in ["orders.libsvm", "orders.X.npy", "orders.y.npy"]:
+        mock_aws_s3.download_file(bucket, key, str(tmp_path / key))
+    X, y = load_svmlight_file(str(tmp_path / "orders.libsvm"))
+    X_bin, y_bin = load_binary(str(tmp_path / "orders.libsvm"))
+    assert X_bin.dtype == np.float32
+    np.testing.assert_array_equal(X_bin, X.toarray().astype(np.float32))
+    np.testing.assert_array_equal(y_bin, y)
+
+def test_buffered_mode_profiles_stages(mock_aws_s3):
+    from tasks.profiling import StageProfiler
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    mock_aws_s3.put_object(Bucket=bucket, Key="orders.csv", Body="1.25,1,0,0.1,1.4,1,0.01,2,BUY\n")
+    profiler = StageProfiler("feature_engineering", trace_memory=False)
+    fe.s3_csv_to_libsvm(bucket, "orders.csv", "orders.libsvm", binary_output=True, profiler=profiler)
+    assert [stage["stage"] for stage in profiler.stages] == ["download", "convert", "upload", "binary"]
+
+def test_main_passes_the_profiler_to_the_mode(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "b")
+    monkeypatch.setenv("S3_CSV_KEY", "c")
+    monkeypatch.setenv("S3_LIBSVM_KEY", "l")
+    monkeypatch.setenv("FEATURE_ENGINEERING_MODE", "stream")
+    stream_mode = MagicMock()
+    monkeypatch.setitem(fe.FEATURE_ENGINEERING_MODES, "stream", stream_mode)
+    fe.main()
+    assert stream_mode.call_args.kwargs["profiler"].task == "feature_engineering"
+
+def test_main_binary_output_unsupported_mode(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "b")
+    monkeypatch.setenv("S3_CSV_KEY", "c")
+    monkeypatch.setenv("S3_LIBSVM_KEY", "l")
+    monkeypatch.setenv("FEATURE_ENGINEERING_MODE", "prefix")
+    monkeypatch.setenv("BINARY_OUTPUT", "true")
+    with patch.object(fe, "s3_prefix_to_libsvm") as prefix_mode, pytest.raises(SystemExit):
+        fe.main()
+    prefix_mode.assert_not_called()
+
+def test_get_schema_unsupported():
+    with pytest.raises(ValueError):
+        fe.get_schema("unknown")
+
+def test_main_unsupported_mode(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "b")
+    monkeypatch.setenv("S3_CSV_KEY", "c")
+    monkeypatch.setenv("S3_LIBSVM_KEY", "l")
+    monkeypatch.setenv("FEATURE_ENGINEERING_MODE", "bogus")
+    with pytest.raises(SystemExit):
+        fe.main()
+
 # --- predict_scikit.py ---
 import tasks.predict_scikit as pred
 
@@ -59,10 +333,62 @@ def test_download_model(mock_boto3_client):
     pred.download_model(s3, "bucket", "key", "local_path")
     s3.download_file.assert_called_once()
 
+def test_predict_start_prefetch(monkeypatch):
+    monkeypatch.delenv("MODEL_S3_KEY", raising=False)
+    assert pred.start_prefetch() is None
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.setenv("MODEL_S3_KEY", "model.joblib")
+    monkeypatch.setenv("INPUT_DATA_S3_KEY", "input.libsvm")
+    monkeypatch.delenv("DATASET_CACHE_DIR", raising=False)
+    with patch("tasks.predict_scikit.boto3.client") as mock_client, \
+            patch("tasks.predict_scikit.download_matrices") as mock_download:
+        futures = pred.start_prefetch()
+        futures["model"].result(timeout=5)
+        futures["input"].result(timeout=5)
+    mock_client.return_value.download_file.assert_called_once()
+    mock_download.assert_called_once()
+
+def test_predict_start_prefetch_flat_model(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.delenv("MODEL_S3_KEY", raising=False)
+    monkeypatch.setenv("FLAT_MODEL_S3_PREFIX", "k/trained_model/flat_model")
+    monkeypatch.delenv("INPUT_DATA_S3_KEY", raising=False)
+    with patch("tasks.predict_scikit.boto3.client"), \
+            patch("tasks.predict_scikit.download_flat_model") as mock_download:
+        pred.start_prefetch()["model"].result(timeout=5)
+    assert mock_download.call_args.args[2:] == ("k/trained_model/flat_model", pred.LOCAL_FLAT_MODEL_DIR)
+
+def test_predict_start_prefetch_skips_streamed_input(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.setenv("MODEL_S3_KEY", "model.joblib")
+    monkeypatch.setenv("INPUT_DATA_S3_KEY", "input/")
+    monkeypatch.setenv("PREDICTION_MODE", "stream")
+    monkeypatch.delenv("MODEL_CACHE_DIR", raising=False)
+    monkeypatch.delenv("FLAT_MODEL_S3_PREFIX", raising=False)
+    with patch("tasks.predict_scikit.boto3.client"):
+        assert list(pred.start_prefetch()) == ["model"]
+
+def test_predict_start_prefetch_manifest(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.setenv("MODEL_S3_KEY", "model.joblib")
+    monkeypatch.setenv("PREDICTION_MODE", "manifest")
+    assert pred.start_prefetch() is None
+
 @patch("tasks.predict_scikit.joblib.load")
 def test_load_model(mock_load):
     mock_load.return_value = "model"
     assert pred.load_model("path") == "model"
+    assert mock_load.call_args.kwargs["mmap_mode"] == "r"
+    pred.load_model("model.joblib", name="m/xgb_model.joblib.gz")
+    assert mock_load.call_args.kwargs["mmap_mode"] is None
+
+def test_predict_start_prefetch_skips_cached_model(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.setenv("MODEL_S3_KEY", "model.joblib")
+    monkeypatch.delenv("INPUT_DATA_S3_KEY", raising=False)
+    monkeypatch.setenv("MODEL_CACHE_DIR", str(tmp_path))
+    with patch("tasks.predict_scikit.boto3.client"):
+        assert pred.start_prefetch() == {}
 
 @patch("tasks.predict_scikit.load_svmlight_file")
 def test_load_input_data(mock_load):
@@ -115,13 +441,128 @@ def test_get_config_env(monkeypatch):
     config = train.get_config()
     assert config["bucket"] == "b"
 
+def test_get_config_training_mode(monkeypatch):
+    for name, value in {"S3_BUCKET": "b", "S3_KEY": "k", "PROVIDER": "p", "PRODUCT_ID": "pid", "CORRELATION_ID": "cid"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("TRAINING_MODE", "incremental")
+    monkeypatch.setenv("INCREMENTAL_CLASSES", "0,1,2")
+    # the orchestrator passes unset settings as empty strings
+    monkeypatch.setenv("INCREMENTAL_EPOCHS", "")
+    monkeypatch.setenv("INCREMENTAL_TREES_PER_CHUNK", "")
+    config = train.get_config()
+    assert config["incremental"]["classes"] == [0, 1, 2]
+    assert config["incremental"]["n_features"] is None
+    assert (config["incremental"]["epochs"], config["incremental"]["trees_per_chunk"]) == (1, 10)
+    monkeypatch.setenv("TRAINING_MODE", "streaming")
+    with pytest.raises(ValueError):
+        train.get_config()
+    monkeypatch.setenv("TRAINING_MODE", "full")
+    monkeypatch.setenv("ESTIMATOR", "hist_gradient_boosting")
+    assert train.get_config()["estimator"] == "hist_gradient_boosting"
+    monkeypatch.setenv("ESTIMATOR", "xgboost")
+    with pytest.raises(ValueError):
+        train.get_config()
+    monkeypatch.setenv("ESTIMATOR", "random_forest")
+    monkeypatch.setenv("SEARCH_STRATEGY", "grid")
+    with pytest.raises(ValueError):
+        train.get_config()
+
+def test_run_incremental_training(mock_aws_s3):
+    from tasks.profiling import StageProfiler
+    bucket = os.environ["DATA_COLLECTION_BUCKET_NAME"]
+    rng = np.random.RandomState(0)
+    for split, n_rows in (("train", 300), ("validation", 100)):
+        X = rng.normal(size=(n_rows, 2))
+        rows = "".join(f"{int(a > 0)} 1:{a} 2:{b}\n" for a, b in X)
+        mock_aws_s3.put_object(Bucket=bucket, Key=f"k/{split}/part-0.libsvm", Body=rows.encode("utf-8"))
+    config = {
+        "bucket": bucket,
+        "s3_key": "k",
+        "hyperparams": {"random_state": 0},
+        "incremental": {"estimator": "sgd", "chunk_rows": 64, "epochs": 3, "trees_per_chunk": 1, "classes": [0, 1], "n_features": None},
+    }
+    profiler = StageProfiler("train_scikit", trace_memory=False)
+    model, metrics, feature_count, training_samples = train.run_incremental_training(mock_aws_s3, config, profiler=profiler)
+    assert [stage["stage"] for stage in profiler.stages] == ["download", "parse", "fit", "evaluate"]
+    assert (feature_count, training_samples) == (2, 300)
+    assert metrics["validation_samples"] == 100
+    assert metrics["val_accuracy"] > 0.9
+
+def test_run_hyperparameter_search(monkeypatch):
+    monkeypatch.setenv("MAX_WORKERS", "2")
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(300, 3))
+    y = (X[:, 0] > 0).astype(int)
+    config = {
+        "estimator": "random_forest",
+        "hyperparams": {"n_estimators": 10, "max_depth": 3, "random_state": 0},
+        "search": {"strategy": "random", "candidates": 3, "factor": 3, "space": '{"max_depth": [2, 4], "n_estimators": [5, 10]}'},
+    }
+    leaderboard = train.run_hyperparameter_search(config, X, y, X, y)
+    assert len(leaderboard) == 3 and leaderboard[0]["rank"] == 1
+    json.dumps(leaderboard)
+
+def test_run_walk_forward_validation(monkeypatch):
+    monkeypatch.setenv("MAX_WORKERS", "2")
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(400, 3))
+    y = (X[:, 0] > 0).astype(int)
+    config = {
+        "estimator": "hist_gradient_boosting",
+        "hyperparams": {"n_estimators": 10, "max_depth": 3, "learning_rate": 0.3, "random_state": 0},
+        "walk_forward": {"splits": 4, "window": "sliding", "gap": 2, "max_train_size": None},
+    }
+    result = train.run_walk_forward_validation(config, X, y)
+    assert len(result["folds"]) == 4
+    assert result["auc"]["mean"] > 0.9
+    json.dumps(result)
+
+def test_start_prefetch_skips_incremental(monkeypatch):
+    monkeypatch.delenv("DATASET_CACHE_DIR", raising=False)
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.setenv("S3_KEY", "key")
+    monkeypatch.setenv("TRAINING_MODE", "incremental")
+    assert train.start_prefetch() is None
+
 @patch("tasks.train_scikit.boto3.client")
 def test_download_data(mock_boto3_client):
     s3 = MagicMock()
     mock_boto3_client.return_value = s3
-    s3.download_file.side_effect = lambda b, k, f: None
+    s3.download_file.side_effect = lambda b, k, f, **kwargs: None
     train.download_data(s3, "bucket", "key")
 
+def test_download_data_is_concurrent_and_tuned(monkeypatch):
+    import threading
+    monkeypatch.setenv("TRANSFER_MAX_CONCURRENCY", "4")
+    both_started = threading.Barrier(2, timeout=5)
+    configs = []
+
+    def download_file(bucket, key, path, Config=None):
+        if key.endswith(".libsvm"):
+            raise AssertionError("binary matrices were found")
+        configs.append(Config)
+        if key.endswith(".X.npy"):
+            both_started.wait()
+
+    s3 = MagicMock()
+    s3.download_file.side_effect = download_file
+    assert train.download_data(s3, "bucket", "key") == ("train.libsvm", "validation.libsvm")
+    assert all(config.max_concurrency == 4 for config in configs)
+
+def test_start_prefetch(monkeypatch):
+    monkeypatch.delenv("DATASET_CACHE_DIR", raising=False)
+    monkeypatch.delenv("S3_BUCKET", raising=False)
+    assert train.start_prefetch() is None
+    monkeypatch.setenv("S3_BUCKET", "bucket")
+    monkeypatch.setenv("S3_KEY", "key")
+    with patch("tasks.train_scikit.boto3.client") as mock_client, \
+            patch("tasks.train_scikit.download_matrices") as mock_download:
+        future = train.start_prefetch()
+        assert future.result(timeout=5) == ("train.libsvm", "validation.libsvm")
+    assert mock_download.call_count == 2
+    monkeypatch.setenv("DATASET_CACHE_DIR", "/tmp/cache")
+    assert train.start_prefetch() is None
+
 @patch("tasks.train_scikit.load_svmlight_file")
 def test_load_data(mock_load):
     import numpy as np
@@ -134,6 +575,15 @@ def test_load_data(mock_load):
     assert X_train_out.shape == (2, 2)
     assert y_val_out.shape == (1,)
 
+def test_load_data_prefers_binary(tmp_path, monkeypatch):
+    for name in ("train", "validation"):
+        np.save(str(tmp_path / f"{name}.X.npy"), np.ones((4, 2), dtype=np.float32))
+        np.save(str(tmp_path / f"{name}.y.npy"), np.array([0, 1, 0, 1], dtype=np.int32))
+    monkeypatch.setattr(train, "load_svmlight_file", MagicMock(side_effect=AssertionError("parsed libsvm")))
+    X_train, y_train, X_val, y_val = train.load_data(str(tmp_path / "train.libsvm"), str(tmp_path / "validation.libsvm"))
+    assert isinstance(X_train, np.memmap) and X_train.shape == (4, 2)
+    assert y_val.tolist() == [0, 1, 0, 1]
+
 def test_train_model(monkeypatch):
     class DummyModel:
         def __init__(self, **kwargs): pass
@@ -141,6 +591,19 @@ def test_train_model(monkeypatch):
     model = train.train_model([1], [2], [3], [4], {}, DummyModel)
     assert hasattr(model, "fit")
 
+def test_train_model_accepts_instances():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(200, 3))
+    y = (X[:, 0] > 0).astype(int)
+    hyperparams = {"n_estimators": 30, "max_depth": 3, "learning_rate": 0.5, "early_stopping_rounds": 5, "random_state": 0}
+    for name in ("random_forest", "hist_gradient_boosting"):
+        estimator = train.create_estimator(name, hyperparams)
+        model = train.train_model(X, y, X, y, hyperparams, estimator)
+        assert model is estimator
+        metrics = train.evaluate_model(model, X, y, X, y)
+        assert metrics["val_accuracy"] > 0.9
+        assert 0 < metrics["best_iteration"] <= 30
+
 def test_evaluate_model():
     import numpy as np
     class DummyModel:
@@ -154,6 +617,19 @@ def test_evaluate_model():
     metrics = train.evaluate_model(model, X, y, X, y)
     assert "train_accuracy" in metrics
 
+def test_evaluate_model_samples_training_rows():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(1000, 3))
+    y = (X[:, 0] > 0).astype(int)
+    model = train.create_estimator("random_forest", {"n_estimators": 10, "max_depth": 3, "n_jobs": 1})
+    model.fit(X, y)
+    full = train.evaluate_model(model, X, y, X[:200], y[:200])
+    sampled = train.evaluate_model(model, X, y, X[:200], y[:200], train_sample_size=100)
+    assert (full["train_samples_scored"], sampled["train_samples_scored"]) == (1000, 100)
+    assert sampled["val_auc"] == full["val_auc"]
+    assert sampled["confusion_matrix"] == full["confusion_matrix"]
+    assert len(sampled["threshold_curve"]) == len(train.CURVE_THRESHOLDS)
+
 @patch("tasks.train_scikit.joblib.dump")
 @patch("tasks.train_scikit.boto3.client")
 def test_save_and_upload_model(mock_boto3_client, mock_dump):
@@ -163,6 +639,32 @@ def test_save_and_upload_model(mock_boto3_client, mock_dump):
     train.save_and_upload_model(s3, model, "bucket", "key", model_version="1")
     s3.upload_file.assert_called_once()
 
+@patch("tasks.train_scikit.joblib.dump")
+def test_save_and_upload_model_compressed(mock_dump):
+    s3 = MagicMock()
+    key = train.save_and_upload_model(s3, MagicMock(), "bucket", "key", model_version="2", artifact_format="compressed")
+    assert key == "key/trained_model/xgb_model_v2.joblib.gz"
+    assert mock_dump.call_args.kwargs["compress"] == ("gzip", 3)
+
+@patch("tasks.train_scikit.joblib.dump")
+def test_save_and_upload_model_profiles_stages(mock_dump):
+    from tasks.profiling import StageProfiler
+    profiler = StageProfiler("train_scikit", trace_memory=False)
+    train.save_and_upload_model(MagicMock(), MagicMock(), "bucket", "key", profiler=profiler)
+    assert [stage["stage"] for stage in profiler.stages] == ["serialize", "upload"]
+
+def test_export_flat_model(tmp_path, monkeypatch):
+    from sklearn.ensemble import RandomForestClassifier
+    monkeypatch.chdir(tmp_path)
+    X = np.random.RandomState(0).normal(size=(100, 3))
+    model = RandomForestClassifier(n_estimators=3, max_depth=3, random_state=0).fit(X, (X[:, 0] > 0).astype(int))
+    s3 = MagicMock()
+    prefix = train.export_flat_model(s3, model, "bucket", "key", model_version="3")
+    assert prefix == "key/trained_model/flat_model_v3"
+    uploaded = sorted(call.args[2] for call in s3.upload_file.call_args_list)
+    assert "key/trained_model/flat_model_v3/meta.json" in uploaded
+    assert len(uploaded) == 8
+
 @patch("tasks.train_scikit.boto3.client")
 def test_save_and_upload_results(mock_boto3_client, tmp_path):
     s3 = MagicMock()
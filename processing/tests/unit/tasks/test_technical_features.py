@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import tasks.technical_features as tf
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    close = 30000 + np.cumsum(rng.normal(0, 50, 500))
+    high = close + rng.uniform(0, 40, 500)
+    low = close - rng.uniform(0, 40, 500)
+    volume = rng.uniform(1, 100, 500)
+    return {"close": close, "high": high, "low": low, "volume": volume}
+
+
+def _naive_ema(x, alpha):
+    out = [x[0]]
+    for value in x[1:]:
+        out.append(alpha * value + (1 - alpha) * out[-1])
+    return np.array(out)
+
+
+def test_rolling_mean_and_std_match_naive(series):
+    close = series["close"]
+    mean = tf.rolling_mean(close, 20)
+    std = tf.rolling_std(close, 20)
+    assert np.isnan(mean[:19]).all() and np.isnan(std[:19]).all()
+    for t in range(19, len(close)):
+        window = close[t - 19:t + 1]
+        assert mean[t] == pytest.approx(window.mean(), rel=1e-9)
+        assert std[t] == pytest.approx(window.std(), rel=1e-6)
+
+
+def test_ema_matches_recursion(series):
+    close = series["close"]
+    np.testing.assert_allclose(tf.ema(close, 12), _naive_ema(close, 2 / 13), rtol=1e-10)
+
+
+def test_returns(series):
+    close = series["close"]
+    out = tf.returns(close, 5)
+    assert np.isnan(out[:5]).all()
+    np.testing.assert_allclose(out[5:], close[5:] / close[:-5] - 1)
+
+
+def test_rsi_matches_naive(series):
+    close = series["close"]
+    delta = np.diff(close, prepend=close[0])
+    gain = _naive_ema(np.maximum(delta, 0), 1 / 14)
+    loss = _naive_ema(np.maximum(-delta, 0), 1 / 14)
+    out = tf.rsi(close, 14)
+    assert np.isnan(out[:14]).all()
+    np.testing.assert_allclose(out[14:], (100 - 100 / (1 + gain[14:] / loss[14:])), rtol=1e-9)
+    assert ((out[14:] >= 0) & (out[14:] <= 100)).all()
+
+
+def test_rsi_without_losses_is_100():
+    out = tf.rsi(np.arange(1.0, 40.0), 14)
+    assert (out[14:] == 100).all()
+
+
+def test_atr_matches_naive(series):
+    high, low, close = series["high"], series["low"], series["close"]
+    true_range = [high[0] - low[0]] + [
+        max(high[t] - low[t], abs(high[t] - close[t - 1]), abs(low[t] - close[t - 1]))
+        for t in range(1, len(close))
+    ]
+    out = tf.atr(high, low, close, 14)
+    assert np.isnan(out[:13]).all()
+    np.testing.assert_allclose(out[13:], _naive_ema(np.array(true_range), 1 / 14)[13:], rtol=1e-9)
+
+
+def test_bollinger_width_and_volume_zscore(series):
+    close, volume = series["close"], series["volume"]
+    window = close[-20:]
+    assert tf.bollinger_width(close, 20)[-1] == pytest.approx(4 * window.std() / window.mean(), rel=1e-6)
+    window = volume[-20:]
+    assert tf.volume_zscore(volume, 20)[-1] == pytest.approx((volume[-1] - window.mean()) / window.std(), rel=1e-6)
+    assert (tf.volume_zscore(np.ones(50), 20)[19:] == 0).all()
+
+
+def test_short_series_is_all_nan():
+    out = tf.rolling_std(np.arange(5.0), 20)
+    assert out.shape == (5,) and np.isnan(out).all()
+
+
+def test_compute_features(series):
+    names = tf.resolve_features("candle")
+    matrix = tf.compute_features(series, names)
+    assert matrix.shape == (500, len(names))
+    assert not np.isnan(matrix[30:]).any()
+
+
+def test_resolve_features_errors():
+    assert tf.resolve_features("order") == []
+    assert tf.resolve_features("order", ["rsi_14"]) == ["rsi_14"]
+    with pytest.raises(ValueError):
+        tf.resolve_features("candle", ["not_a_feature"])
+    with pytest.raises(ValueError):
+        tf.resolve_features("unknown")
+    with pytest.raises(ValueError):
+        tf.compute_features({"open": np.ones(3)}, ["rsi_14"])
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from scipy import sparse
+from sklearn.model_selection import TimeSeriesSplit
+
+from tasks.walk_forward import fold_bytes, run_walk_forward, score_fold, walk_forward_folds
+
+HYPERPARAMS = {"n_estimators": 10, "max_depth": 3, "random_state": 0}
+
+
+def _series(n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.normal(size=(n_rows, 3))
+    y = (X[:, 0] + 0.3 * rng.normal(size=n_rows) > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("gap,max_train_size", [(0, None), (3, None), (2, 40)])
+def test_expanding_folds_match_time_series_split(gap, max_train_size):
+    folds = walk_forward_folds(103, 4, gap=gap, max_train_size=max_train_size)
+    expected = TimeSeriesSplit(n_splits=4, gap=gap, max_train_size=max_train_size).split(np.zeros(103))
+    for (train, test), (train_index, test_index) in zip(folds, expected):
+        assert list(range(103)[train]) == train_index.tolist()
+        assert list(range(103)[test]) == test_index.tolist()
+
+
+def test_sliding_folds_keep_a_fixed_window():
+    folds = walk_forward_folds(60, 5, window="sliding")
+    assert {train.stop - train.start for train, _ in folds} == {10}
+    assert [test.start for _, test in folds] == [10, 20, 30, 40, 50]
+
+
+def test_walk_forward_folds_errors():
+    with pytest.raises(ValueError):
+        walk_forward_folds(100, 3, window="random")
+    with pytest.raises(ValueError):
+        walk_forward_folds(3, 5)
+    with pytest.raises(ValueError):
+        walk_forward_folds(20, 3, gap=5)
+
+
+def test_fold_slices_are_views():
+    X, _ = _series(50)
+    train, test = walk_forward_folds(50, 4)[0]
+    assert np.shares_memory(X[train], X) and np.shares_memory(X[test], X)
+
+
+def test_score_fold_single_class_has_no_auc():
+    X, y = _series(40)
+    y = y.copy()
+    y[30:] = 1
+    score = score_fold("random_forest", HYPERPARAMS, X, y, slice(0, 30), slice(30, 40))
+    assert score["auc"] is None
+    assert score["train_rows"] == [0, 30]
+
+
+def test_run_walk_forward_in_parallel():
+    X, y = _series(600)
+    folds = walk_forward_folds(600, 3)
+    result = run_walk_forward("random_forest", HYPERPARAMS, sparse.csr_matrix(X), y, folds, n_jobs=2)
+    assert len(result["folds"]) == 3
+    assert [fold["test_rows"] for fold in result["folds"]] == [[150, 300], [300, 450], [450, 600]]
+    assert result["auc"]["mean"] > 0.8
+    assert result["accuracy"]["std"] >= 0
+
+
+def test_fold_bytes_bounds_the_largest_training_set():
+    X = sparse.csr_matrix(np.ones((120, 3)))
+    folds = walk_forward_folds(120, 5, "sliding", max_train_size=30)
+    assert fold_bytes(X, folds) == 30 * 3 * 8
+    assert fold_bytes(X, walk_forward_folds(120, 5)) == 100 * 3 * 8
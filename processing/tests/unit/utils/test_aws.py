@@ -0,0 +1,35 @@
+import pytest
+
+from utils import aws
+
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    aws.reset_clients()
+    yield
+    aws.reset_clients()
+
+
+def test_get_client_reuses_client_per_service_and_region():
+    s3 = aws.get_client("s3")
+    assert aws.get_client("s3") is s3
+    assert aws.get_client("s3", "us-west-2") is not s3
+    assert aws.get_client("ecs") is not s3
+
+
+def test_get_client_keys_on_config_overrides():
+    s3 = aws.get_client("s3")
+    tuned = aws.get_client("s3", read_timeout=120)
+    assert tuned is not s3
+    assert aws.get_client("s3", read_timeout=120) is tuned
+    assert tuned.meta.config.read_timeout == 120
+
+
+def test_get_client_tunes_pool_and_retries():
+    config = aws.get_client("sqs").meta.config
+    assert config.max_pool_connections == aws.Env.AWS_MAX_POOL_CONNECTIONS
+    assert config.retries["mode"] == "adaptive"
+
+
+def test_get_resource_is_shared():
+    assert aws.get_resource("dynamodb") is aws.get_resource("dynamodb")
@@ -0,0 +1,77 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pytest
+from urllib3.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+import utils.http_session as http_session
+from utils.api_client import AssistantClient
+
+
+def test_build_session_configures_pool_and_retries():
+    session = http_session.build_session(pool_size=4, max_retries=2, backoff_factor=0.1)
+    adapter = session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert 503 in adapter.max_retries.status_forcelist
+    assert 429 in adapter.max_retries.status_forcelist
+    assert adapter.max_retries.is_retry("GET", 503)
+    assert not adapter.max_retries.is_retry("POST", 503)
+
+
+def test_jitter_retry_stays_within_backoff():
+    retry = http_session.JitterRetry(total=5, backoff_factor=1)
+    for _ in range(3):
+        retry = retry.increment(method="POST", url="/notifications")
+    for _ in range(20):
+        assert 0 <= retry.get_backoff_time() <= 4
+
+
+def test_get_session_is_shared():
+    assert http_session.get_session() is http_session.get_session()
+
+
+@patch("utils.api_client.generate_oauth_token", return_value="token")
+def test_send_message_uses_shared_session(mock_token, requests_mock, monkeypatch):
+    monkeypatch.setattr(AssistantClient, "domain", "https://assistant.example.com")
+    requests_mock.post("https://assistant.example.com/notifications", json={"ok": True})
+    client = AssistantClient(correlation_id="cid")
+    assert client.send_message("hello", "general") == {"ok": True}
+    assert requests_mock.last_request.headers["Authorization"] == "Bearer token"
+    assert requests_mock.last_request.json() == {"message": "hello", "webhook_channel": "general"}
+
+
+def test_post_is_only_retried_before_it_reaches_the_server():
+    retry = http_session.build_session(max_retries=2).get_adapter("https://example.com").max_retries
+    assert retry.increment(method="POST", url="/", error=ConnectTimeoutError()).total == 1
+    assert retry.increment(method="GET", url="/", error=ReadTimeoutError(None, "/", "timed out")).total == 1
+    with pytest.raises(ReadTimeoutError):
+        retry.increment(method="POST", url="/", error=ReadTimeoutError(None, "/", "timed out"))
+
+
+def test_post_is_retried_after_a_429():
+    statuses = [429, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = http_session.build_session(max_retries=2, backoff_factor=0)
+        response = session.post(f"http://127.0.0.1:{server.server_port}/notifications", json={"message": "hello"})
+        assert response.status_code == 200 and statuses == []
+    finally:
+        server.shutdown()
+    retry = session.get_adapter("http://").max_retries
+    assert retry.is_retry("POST", 503, has_retry_after=True)
+    assert not retry.is_retry("POST", 500)
@@ -0,0 +1,56 @@
+import threading
+import boto3
+
+from botocore.config import Config
+from utils.common import Env
+
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+
+def build_config(**overrides):
+    """
+    Builds the botocore config shared by every client in this service.
+    :param overrides: Extra botocore Config options, e.g. read_timeout.
+    """
+    return Config(
+        max_pool_connections=Env.AWS_MAX_POOL_CONNECTIONS,
+        retries={"max_attempts": Env.AWS_MAX_ATTEMPTS, "mode": "adaptive"},
+        **overrides,
+    )
+
+
+def _get_or_create(cache, factory, service_name, region_name, overrides):
+    region_name = region_name or Env.REGION
+    key = (service_name, region_name, tuple(sorted(overrides.items())))
+    instance = cache.get(key)
+    if instance is None:
+        # boto3's default session is not thread safe, creation is serialized
+        with _lock:
+            instance = cache.get(key)
+            if instance is None:
+                instance = factory(
+                    service_name,
+                    region_name=region_name,
+                    config=build_config(**overrides),
+                )
+                cache[key] = instance
+    return instance
+
+
+def get_client(service_name, region_name=None, **overrides):
+    """Returns the client for (service, region, config), created on first use and reused afterwards."""
+    return _get_or_create(_clients, boto3.client, service_name, region_name, overrides)
+
+
+def get_resource(service_name, region_name=None, **overrides):
+    """Returns the resource for (service, region, config), created on first use and reused afterwards."""
+    return _get_or_create(_resources, boto3.resource, service_name, region_name, overrides)
+
+
+def reset_clients():
+    """Drops every cached client, used by tests that swap AWS mocks."""
+    with _lock:
+        _clients.clear()
+        _resources.clear()
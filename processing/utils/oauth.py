@@ -1,57 +1,106 @@
-import boto3
-import requests
+import threading
 
 from datetime import datetime, timedelta
-from functions.utils.common import Env
-from functions.utils.logger import logger
+from utils.common import Env
+from utils.logger import logger
+from utils.http_session import get_session, default_timeout
+from utils.aws import get_resource
 
 CACHE_TTL = 3600 * 12  # 12 hours
+REFRESH_MARGIN = 300  # refresh tokens 5 minutes before they expire
 
-dynamodb = boto3.resource("dynamodb", Env.REGION)
-cache_table = dynamodb.Table(Env.CACHE_TABLE_NAME)
 
+def get_cache_table():
+    return get_resource("dynamodb").Table(Env.CACHE_TABLE_NAME)
 
-def get_cached_token(cache_key):
-    dynamodb = boto3.resource("dynamodb", Env.REGION)
-    cache_table = dynamodb.Table(Env.CACHE_TABLE_NAME)
+
+class TokenCache:
+    """In-process token cache that sits in front of the DynamoDB cache table.
+
+    Entries are considered stale ``refresh_margin`` seconds before they expire so
+    tokens get refreshed before a request can be sent with an expired one. Tokens that
+    live no longer than twice the margin are refreshed halfway through their lifetime
+    instead, or they would never count as fresh.
+    """
+
+    def __init__(self, refresh_margin=REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        entry = self._entries.get(cache_key)
+        if entry and self.is_fresh(entry[1], entry[2]):
+            return entry[0]
+        return None
+
+    def set(self, cache_key, token, expiration, ttl=None):
+        self._entries[cache_key] = (token, expiration, ttl)
+
+    def margin(self, ttl=None):
+        """Seconds before expiry a token lasting ttl seconds is refreshed."""
+        return self.refresh_margin if ttl is None else min(self.refresh_margin, ttl // 2)
+
+    def is_fresh(self, expiration, ttl=None):
+        return datetime.utcnow() + timedelta(seconds=self.margin(ttl)) < expiration
+
+    def lock_for(self, cache_key):
+        """Returns the lock used to make sure only one caller refreshes a key."""
+        with self._lock:
+            return self._locks.setdefault(cache_key, threading.Lock())
+
+    def clear(self):
+        self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def get_cached_item(cache_key):
+    """Returns the (token, expiration, ttl) stored in DynamoDB, or (None, None, None)."""
     try:
-        response = cache_table.get_item(Key={"cache_key": cache_key})
+        response = get_cache_table().get_item(Key={"cache_key": cache_key})
 
         if "Item" in response:
             item = response["Item"]
             expiration = datetime.fromisoformat(item["expiration"])
             if datetime.utcnow() < expiration:
-                return item["token"]
+                # items written before the ttl was stored fall back to the full margin
+                ttl = int(item["ttl"]) if "ttl" in item else None
+                return item["token"], expiration, ttl
     except Exception as e:
         logger.error(
             "GET_CACHE_TOKEN_ERROR", message=f"Error getting cached token: {e}"
         )
-    return None
+    return None, None, None
+
+
+def get_cached_token(cache_key):
+    token, _, _ = get_cached_item(cache_key)
+    return token
 
 
 def set_cached_token(cache_key, token, ttl):
-    dynamodb = boto3.resource("dynamodb", Env.REGION)
-    cache_table = dynamodb.Table(Env.CACHE_TABLE_NAME)
-    expiration = (datetime.utcnow() + timedelta(seconds=ttl)).isoformat()
+    expiration = datetime.utcnow() + timedelta(seconds=ttl)
     try:
-        cache_table.put_item(
-            Item={"cache_key": cache_key, "token": token, "expiration": expiration}
+        get_cache_table().put_item(
+            Item={
+                "cache_key": cache_key,
+                "token": token,
+                "expiration": expiration.isoformat(),
+                "ttl": ttl,
+            }
         )
     except Exception as e:
         logger.error(
             "SET_CACHE_TOKEN_ERROR", message=f"Error setting cached token: {e}"
         )
+    return expiration
 
 
-def generate_oauth_token(
-    client_id, client_secret, audience, grant_type="client_credentials"
-):
-    cache_key = f"trader_oauth_token_{client_id}_{audience}"
-    cached_token = get_cached_token(cache_key)
-
-    if cached_token:
-        return cached_token
-
+def request_oauth_token(client_id, client_secret, audience, grant_type):
+    """Requests a new token from the OAuth provider, returns (token, ttl)."""
     url = Env.AUTH0_OAUTH_URL
     headers = {"content-type": "application/json"}
     payload = {
@@ -61,10 +110,38 @@ def generate_oauth_token(
         "grant_type": grant_type,
     }
 
-    response = requests.post(url, json=payload, headers=headers)
+    response = get_session().post(
+        url, json=payload, headers=headers, timeout=default_timeout()
+    )
     response.raise_for_status()
-    token = response.json().get("access_token")
+    body = response.json()
+    ttl = min(int(body.get("expires_in") or CACHE_TTL), CACHE_TTL)
+    return body.get("access_token"), ttl
 
-    # Cache the token with a TTL of 3600 seconds (1 hour)
-    set_cached_token(cache_key, token, ttl=CACHE_TTL)
-    return token
+
+def generate_oauth_token(
+    client_id, client_secret, audience, grant_type="client_credentials"
+):
+    cache_key = f"trader_oauth_token_{client_id}_{audience}"
+
+    # Warm containers serve the token from memory without any network call
+    token = token_cache.get(cache_key)
+    if token:
+        return token
+
+    with token_cache.lock_for(cache_key):
+        # Another caller may have refreshed the token while we were waiting
+        token = token_cache.get(cache_key)
+        if token:
+            return token
+
+        token, expiration, ttl = get_cached_item(cache_key)
+        if token and token_cache.is_fresh(expiration, ttl):
+            token_cache.set(cache_key, token, expiration, ttl)
+            return token
+
+        token, ttl = request_oauth_token(client_id, client_secret, audience, grant_type)
+        expiration = set_cached_token(cache_key, token, ttl=ttl)
+        token_cache.set(cache_key, token, expiration, ttl)
+        logger.info("OAUTH_TOKEN_REFRESHED", cache_key=cache_key, expiration=expiration.isoformat())
+        return token